@@ -24,9 +24,9 @@ if config.config_file_name is not None:
 target_metadata = db_model.Base.metadata
 
 DB_STRING_TEMPLATE = 'postgresql+psycopg2://{0}:{1}@{2}:5432'
-DB_STRING = DB_STRING_TEMPLATE.format(os.environ.get('POSTGRES_USER'),
-                                      os.environ.get('POSTGRES_PASSWORD'),
-                                      os.environ.get('DB_HOST', 'localhost'))
+DB_STRING = os.environ.get('DB_STRING') or DB_STRING_TEMPLATE.format(os.environ.get('POSTGRES_USER'),
+                                                                     os.environ.get('POSTGRES_PASSWORD'),
+                                                                     os.environ.get('DB_HOST', 'localhost'))
 
 config.set_main_option('sqlalchemy.url', DB_STRING)
 
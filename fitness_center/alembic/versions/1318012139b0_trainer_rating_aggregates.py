@@ -0,0 +1,48 @@
+"""trainer rating aggregates
+
+Revision ID: 1318012139b0
+Revises: 752e2bd95a05
+Create Date: 2026-10-18 15:16:40.209163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1318012139b0'
+down_revision: Union[str, None] = '752e2bd95a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('trainer_rating',
+    sa.Column('trainer', sa.Integer(), nullable=False),
+    sa.Column('points_count', sa.Integer(), nullable=False),
+    sa.Column('points_sum', sa.Integer(), nullable=False),
+    sa.Column('hist_0', sa.Integer(), nullable=False),
+    sa.Column('hist_20', sa.Integer(), nullable=False),
+    sa.Column('hist_40', sa.Integer(), nullable=False),
+    sa.Column('hist_60', sa.Integer(), nullable=False),
+    sa.Column('hist_80', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['trainer'], ['trainer.id'], ),
+    sa.PrimaryKeyConstraint('trainer')
+    )
+    # aggregates of existing ratings
+    rating = sa.table('rating', sa.column('id', sa.Integer), sa.column('trainer', sa.Integer),
+                      sa.column('points', sa.Integer))
+    hist = [sa.func.sum(sa.case((rating.c.points.between(bucket, bucket + 19), 1), else_=0))
+            for bucket in (0, 20, 40, 60)]
+    hist.append(sa.func.sum(sa.case((rating.c.points >= 80, 1), else_=0)))
+    aggregates = (sa.select(rating.c.trainer, sa.func.count(rating.c.id), sa.func.sum(rating.c.points), *hist)
+                  .group_by(rating.c.trainer))
+    columns = ['trainer', 'points_count', 'points_sum', 'hist_0', 'hist_20', 'hist_40', 'hist_60', 'hist_80']
+    trainer_rating = sa.table('trainer_rating', *[sa.column(el, sa.Integer) for el in columns])
+    op.execute(trainer_rating.insert().from_select(columns, aggregates))
+
+
+def downgrade() -> None:
+    op.drop_table('trainer_rating')
@@ -0,0 +1,85 @@
+"""backfill native date time columns
+
+Revision ID: 22cc737f9f06
+Revises: cb78a6282848
+Create Date: 2026-10-18 15:08:14.725116
+
+"""
+import datetime as dt
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '22cc737f9f06'
+down_revision: Union[str, None] = 'cb78a6282848'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+reservation = sa.table('reservation', sa.column('id', sa.Integer),
+                       sa.column('date', sa.String), sa.column('time', sa.String),
+                       sa.column('native_date', sa.Date), sa.column('native_time', sa.Time))
+trainer_schedule = sa.table('trainer_schedule', sa.column('id', sa.Integer),
+                            sa.column('date', sa.String), sa.column('start_time', sa.String),
+                            sa.column('end_time', sa.String), sa.column('native_date', sa.Date),
+                            sa.column('native_start_time', sa.Time), sa.column('native_end_time', sa.Time))
+
+# string column -> native column
+COLUMNS = {reservation: {'date': 'native_date', 'time': 'native_time'},
+           trainer_schedule: {'date': 'native_date', 'start_time': 'native_start_time',
+                              'end_time': 'native_end_time'}}
+
+
+def to_native(value):
+    """Convert '2024-06-10' date or '17-30' ('17:30') time string into native value."""
+    if len(value) == 10:
+        return dt.date.fromisoformat(value)
+    return dt.time(int(value[:2]), int(value[3:5]))
+
+
+def to_string(value):
+    """Convert native date/time into string format used before."""
+    if isinstance(value, dt.date):
+        return value.isoformat()
+    return value.strftime('%H-%M')
+
+
+def copy_columns(table, columns, convert):
+    """Copy converted values between table columns in id ordered batches, every batch is committed."""
+    conn = op.get_bind()
+    update = (table.update().where(table.c.id == sa.bindparam('_id'))
+              .values({dst: sa.bindparam(f'_{dst}') for dst in columns.values()}))
+    last_id = 0
+    while True:
+        with op.get_context().autocommit_block():
+            rows = conn.execute(sa.select(table.c.id, *[table.c[src] for src in columns])
+                                .where(table.c.id > last_id).order_by(table.c.id).limit(BATCH_SIZE)).all()
+            if not rows:
+                break
+            params = [{'_id': row.id, **{f'_{dst}': convert(getattr(row, src)) for src, dst in columns.items()}}
+                      for row in rows]
+            conn.execute(update, params)
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    for table, columns in COLUMNS.items():
+        copy_columns(table, columns, to_native)
+
+
+def downgrade() -> None:
+    for table, columns in COLUMNS.items():
+        copy_columns(table, {dst: src for src, dst in columns.items()}, to_string)
+    # string columns are restored as not nullable after data is copied back
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.alter_column('date', existing_type=sa.String(length=10), nullable=False)
+        batch_op.alter_column('time', existing_type=sa.String(length=10), nullable=False)
+    with op.batch_alter_table('trainer_schedule') as batch_op:
+        batch_op.alter_column('date', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('start_time', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('end_time', existing_type=sa.String(length=50), nullable=False)
@@ -0,0 +1,30 @@
+"""reservation reminders
+
+Revision ID: 5c1e9a7d3b42
+Revises: 1318012139b0
+Create Date: 2026-10-18 18:42:11.503127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d3b42'
+down_revision: Union[str, None] = '1318012139b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.add_column(sa.Column('reminded', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_reservation_reminder', 'reservation', ['reminded', 'date', 'time'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reservation_reminder', table_name='reservation')
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.drop_column('reminded')
@@ -0,0 +1,53 @@
+"""drop string date time columns
+
+Revision ID: 648014211b68
+Revises: 22cc737f9f06
+Create Date: 2026-10-18 15:08:16.440652
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '648014211b68'
+down_revision: Union[str, None] = '22cc737f9f06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.drop_column('date')
+        batch_op.drop_column('time')
+        batch_op.alter_column('native_date', new_column_name='date', existing_type=sa.Date(), nullable=False)
+        batch_op.alter_column('native_time', new_column_name='time', existing_type=sa.Time(), nullable=False)
+    with op.batch_alter_table('trainer_schedule') as batch_op:
+        batch_op.drop_column('date')
+        batch_op.drop_column('start_time')
+        batch_op.drop_column('end_time')
+        batch_op.alter_column('native_date', new_column_name='date', existing_type=sa.Date(), nullable=False)
+        batch_op.alter_column('native_start_time', new_column_name='start_time', existing_type=sa.Time(),
+                              nullable=False)
+        batch_op.alter_column('native_end_time', new_column_name='end_time', existing_type=sa.Time(), nullable=False)
+
+
+def downgrade() -> None:
+    # string columns are filled back by backfill revision downgrade
+    with op.batch_alter_table('trainer_schedule') as batch_op:
+        batch_op.alter_column('date', new_column_name='native_date', existing_type=sa.Date(), nullable=True)
+        batch_op.alter_column('start_time', new_column_name='native_start_time', existing_type=sa.Time(),
+                              nullable=True)
+        batch_op.alter_column('end_time', new_column_name='native_end_time', existing_type=sa.Time(), nullable=True)
+    with op.batch_alter_table('trainer_schedule') as batch_op:
+        batch_op.add_column(sa.Column('date', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('start_time', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('end_time', sa.String(length=50), nullable=True))
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.alter_column('date', new_column_name='native_date', existing_type=sa.Date(), nullable=True)
+        batch_op.alter_column('time', new_column_name='native_time', existing_type=sa.Time(), nullable=True)
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.add_column(sa.Column('date', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('time', sa.String(length=10), nullable=True))
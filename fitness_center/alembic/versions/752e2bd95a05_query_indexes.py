@@ -0,0 +1,50 @@
+"""query indexes
+
+Revision ID: 752e2bd95a05
+Revises: 648014211b68
+Create Date: 2026-10-18 15:09:56.185313
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '752e2bd95a05'
+down_revision: Union[str, None] = '648014211b68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+rating = sa.table('rating', sa.column('id', sa.Integer), sa.column('trainer', sa.Integer),
+                  sa.column('user', sa.Integer))
+
+
+def upgrade() -> None:
+    op.create_index('ix_reservation_trainer_date', 'reservation', ['trainer', 'date', 'time', 'service'])
+    op.create_index('ix_reservation_user_date_time', 'reservation', ['user', 'date', 'time', 'id'])
+    op.create_index('ix_trainer_schedule_trainer_date', 'trainer_schedule', ['trainer', 'date'])
+    op.create_index('ix_trainer_capacity_trainer_service', 'trainer_capacity', ['trainer', 'service', 'max_attendees'])
+    op.create_index('ix_trainer_capacity_service_trainer', 'trainer_capacity', ['service', 'trainer'])
+    op.create_index('ix_trainer_fitness_center', 'trainer', ['fitness_center'])
+    op.create_index('ix_service_fitness_center', 'service', ['fitness_center'])
+
+    # only the latest rating of user for trainer is kept before unique constraint creation
+    latest = sa.select(sa.func.max(rating.c.id)).group_by(rating.c.trainer, rating.c.user)
+    op.execute(rating.delete().where(rating.c.id.not_in(latest)))
+    with op.batch_alter_table('rating') as batch_op:
+        batch_op.create_unique_constraint('uq_rating_trainer_user', ['trainer', 'user'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('rating') as batch_op:
+        batch_op.drop_constraint('uq_rating_trainer_user', type_='unique')
+    op.drop_index('ix_service_fitness_center', table_name='service')
+    op.drop_index('ix_trainer_fitness_center', table_name='trainer')
+    op.drop_index('ix_trainer_capacity_service_trainer', table_name='trainer_capacity')
+    op.drop_index('ix_trainer_capacity_trainer_service', table_name='trainer_capacity')
+    op.drop_index('ix_trainer_schedule_trainer_date', table_name='trainer_schedule')
+    op.drop_index('ix_reservation_user_date_time', table_name='reservation')
+    op.drop_index('ix_reservation_trainer_date', table_name='reservation')
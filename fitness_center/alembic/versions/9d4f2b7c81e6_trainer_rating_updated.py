@@ -0,0 +1,28 @@
+"""trainer rating updated
+
+Revision ID: 9d4f2b7c81e6
+Revises: 5c1e9a7d3b42
+Create Date: 2026-10-18 21:05:37.218904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f2b7c81e6'
+down_revision: Union[str, None] = '5c1e9a7d3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('trainer_rating') as batch_op:
+        batch_op.add_column(sa.Column('updated', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('trainer_rating') as batch_op:
+        batch_op.drop_column('updated')
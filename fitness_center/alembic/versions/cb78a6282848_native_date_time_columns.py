@@ -0,0 +1,37 @@
+"""native date time columns
+
+Revision ID: cb78a6282848
+Revises: bef0c0fd6f24
+Create Date: 2026-10-18 15:08:12.804417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cb78a6282848'
+down_revision: Union[str, None] = 'bef0c0fd6f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # native columns are filled by backfill revision and replace string columns afterwards
+    op.add_column('reservation', sa.Column('native_date', sa.Date(), nullable=True))
+    op.add_column('reservation', sa.Column('native_time', sa.Time(), nullable=True))
+    op.add_column('trainer_schedule', sa.Column('native_date', sa.Date(), nullable=True))
+    op.add_column('trainer_schedule', sa.Column('native_start_time', sa.Time(), nullable=True))
+    op.add_column('trainer_schedule', sa.Column('native_end_time', sa.Time(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('trainer_schedule') as batch_op:
+        batch_op.drop_column('native_end_time')
+        batch_op.drop_column('native_start_time')
+        batch_op.drop_column('native_date')
+    with op.batch_alter_table('reservation') as batch_op:
+        batch_op.drop_column('native_time')
+        batch_op.drop_column('native_date')
@@ -1,19 +1,47 @@
 """Fitness center application."""
-import secrets
 import datetime as dt
+import os
+import secrets
 from functools import wraps
-from itertools import groupby
-
-from flask import Flask, flash, redirect, render_template, request, session
 
-import db_model
+from flask import (Flask, Response, flash, jsonify, make_response, redirect, render_template, request, session,
+                   stream_template)
+import availability
+import booking
+import db_orm
+import dispatch
+import metrics
+import pages
+import queries
+import ratings
+import records
+import refdata
 from db_orm import Db
 from utils import send_email
 
 app = Flask(__name__, template_folder='templates')
 
-app.secret_key = secrets.token_bytes(16)
-delta = 15  # 15 min delta to divide schedule according services duration into slots
+# the same key is needed by all workers and after reload, otherwise random key of process (sessions are lost)
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_bytes(16)
+availability_cache, page_cache = pages.availability_cache, pages.page_cache
+
+# return request scoped db session to pool after each request
+app.teardown_appcontext(db_orm.remove_session)
+
+
+def metrics_gauges():
+    """Db pool and caches gauges for /metrics."""
+    gauges = {f'fc_db_pool_{key}': value for key, value in db_orm.pool_stats().items() if key != 'pool'}
+    for name, current_cache in (('availability', availability_cache), ('pages', page_cache)):
+        stats = current_cache.stats()
+        gauges.update({f'fc_cache_{name}_{key}': stats[key] for key in ('size', 'hits', 'misses', 'evictions')})
+    gauges['fc_cache_pages_bytes_served'] = page_cache.bytes_served
+    gauges.update({f'fc_dispatch_{key}': value for key, value in dispatch.dispatcher.stats().items()})
+    return gauges
+
+
+# per endpoint latency, sql statements count and time, slow queries and N+1 on /metrics
+metrics.init_app(app, db_orm.engine, gauges=metrics_gauges)
 
 
 def auth(func):
@@ -28,77 +56,60 @@ def auth(func):
     return wrapper
 
 
-def convert_db_query_data(query_data):
-    """Convert query row/rows data to dict or list of dicts."""
-    if query_data is None:
+def reference_data():
+    """Actual snapshot of fitness centers, services and trainers."""
+    return refdata.get(Db().session)
+
+
+def cached_page(etag, render):
+    """Render page or take it from page cache, authenticated users always get freshly rendered page."""
+    if session.get('user_id') is not None:
+        return render()
+    return page_cache.get_or_render(pages.page_key(request.path, request.query_string.decode(), etag), render)
+
+
+def conditional_response(etag, last_modified, render, cached=False):
+    """Return 304 if client has actual page version, otherwise render page with ETag and Last-Modified headers.
+
+    cached - take page from page cache for anonymous users.
+    """
+    if pages.not_modified(request.if_none_match, request.if_modified_since, etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = make_response(cached_page(etag, render) if cached else render())
+    return pages.set_version_headers(response, etag, last_modified)
+
+
+def trainer_ratings(trainer_ids):
+    """Rating count and average of trainers -> {trainer_id: (count, avg)}."""
+    if not trainer_ids:
         return {}
-    elif type(query_data) is list:
-        return [el._asdict() for el in query_data]
-    return query_data._asdict()
+    return pages.rating_map(Db().session.execute(queries.trainer_ratings(trainer_ids)).all())
 
 
-def get_trainer_free_slots(date_str, service_id, trainer_id):
+def get_trainer_free_slots(date, service_id, trainer_id):
     """Get trainer free slots for certain date and certain service."""
-    # trainer schedule
-    db = Db()
-    columns = (db_model.TrainerSchedule.start_time, db_model.TrainerSchedule.end_time)
-    data = db.session.query(*columns).filter(db_model.TrainerSchedule.date == date_str,
-                                             db_model.TrainerSchedule.trainer == trainer_id).first()
-    schedule_data = convert_db_query_data(data)
-
-    # trainer capacity
-    columns = (db_model.TrainerCapacity.service, db_model.TrainerCapacity.max_attendees)
-    data = db.session.query(*columns).filter(db_model.TrainerCapacity.trainer == trainer_id).all()
-    capacity_data = convert_db_query_data(data)
-
-    # reservations
-    columns = (db_model.Reservation.time.label('reservation.time'),
-               db_model.Service.duration.label('service.duration'),
-               db_model.Service.id.label('service.id'))
-    data = db.session.query(*columns).join(db_model.Service).filter(db_model.Reservation.date == date_str,
-                                                                    db_model.Reservation.trainer == trainer_id).all()
-    reservation_data = convert_db_query_data(data)
-
-    # service duration
-    data = db.session.query(db_model.Service.duration).filter(db_model.Service.id == service_id).first()
-    service_data = convert_db_query_data(data)
-
-    # fill time slots according trainer schedule and time delta
-    time_slots = []
-    curr_time = dt.datetime.strptime(schedule_data['start_time'], '%H-%M')
-    end_time = dt.datetime.strptime(schedule_data['end_time'], '%H-%M')
-    while curr_time < end_time:
-        time_slots.append(curr_time)
-        curr_time += dt.timedelta(minutes=delta)
-
-    # for not yet reserved slots we make assumption that as minimum one reservation possible
-    max_capacity = [1] * len(time_slots)
-    attendees = [0] * len(time_slots)
-    for curr_r in reservation_data:
-        r_start_time = dt.datetime.strptime(curr_r['reservation.time'], '%H-%M')
-        slots_num = int(curr_r['service.duration'] / delta)
-        idx = time_slots.index(r_start_time)
-        for i in range(idx, idx + slots_num):
-            # we can't do reservation for slots used already by other services
-            if curr_r['service.id'] != service_id:
-                max_capacity[i] = 0
-            else:
-                attendees[i] += 1
-                capacity_filter = [el['max_attendees'] for el in capacity_data if el['service'] == curr_r['service.id']]
-                max_capacity[i] = capacity_filter[0]
-
-    # free slots -> max_attendees - attendees > 0
-    allowed_attendees = [max_capacity[idx] - attendees[idx] for idx, _ in enumerate(time_slots)]
-
-    # we need to exclude time if service does not fit certain slots group by duration
-    # for example we can't reserve 17-30 -> 17-45 -> 18-00 ( end time) if service duration = 45 min
-    z_num = service_data['duration'] / delta - 1  # num of slots to be zeroed
-    tmp = [list(group) for k, group in groupby(allowed_attendees, lambda x: x == 0)]
-    result = [lst[i] if len(lst) > z_num and i <= len(lst) - z_num - 1 else 0 for lst in tmp for i, _ in enumerate(lst)]
-
-    # final result that we will convert to json
-    free_slots = [time_val.strftime('%H-%M') for idx, time_val in enumerate(time_slots) if result[idx] != 0]
-    return free_slots
+    if (free_slots := pages.cached_free_slots(trainer_id, date, service_id)) is not None:
+        return free_slots
+    # reservations changed during query invalidate the day, so slots computed from stale rows are not cached
+    generation = pages.free_slots_generation(trainer_id, date)
+    # schedule, capacity, reservations and service duration in one round trip
+    rows = Db().session.execute(availability.inputs_query(service_id, [date], trainer_id=trainer_id)).all()
+    return pages.trainer_free_slots(rows, trainer_id, date, service_id, generation)
+
+
+def get_service_free_slots(service_id, dates, fc_id=None):
+    """Get free slots of all trainers offering service for certain dates -> {trainer: {date: [slots]}}."""
+    generation = pages.free_slots_generation()
+    rows = Db().session.execute(availability.inputs_query(service_id, dates, fc_id=fc_id)).all()
+    return pages.service_free_slots(rows, service_id, generation)
+
+
+def get_user_reservations(user_id, when='all', after=None, limit=pages.reservations_page_size):
+    """Get page of user reservations -> (rows, next page cursor or None)."""
+    # one extra row shows that next page exists
+    query = queries.user_reservations(user_id, when=when, after=after).limit(limit + 1)
+    return pages.split_page(Db().session.execute(query).all(), limit)
 
 
 @app.get('/')
@@ -117,10 +128,9 @@ def login():
     elif request.method == 'POST':
         form_dict = request.form.to_dict()
         form_login = form_dict['login']
-        db = Db()
-        data = db.session.query(db_model.User).filter_by(login=form_dict['login']).first()
-        if data.password == form_dict['password']:
-            session['user_id'] = data.id
+        data = Db().session.execute(queries.user_by_login(form_login)).scalars().first()
+        if (user_id := pages.login_user_id(data, form_dict['password'])) is not None:
+            session['user_id'] = user_id
             return redirect('/user')
         flash('Login unsuccessful. Please check your username and password.', 'error')
         app.logger.warning(f'{form_login} failed to log in')
@@ -140,17 +150,11 @@ def logout():
 def user():
     """User operations."""
     if request.method == 'GET':
-        db = Db()
-        columns = (db_model.User.name, db_model.User.login, db_model.User.birth_date,
-                   db_model.User.phone, db_model.User.email)
-        data = db.session.query(*columns).filter_by(id=session.get('user_id')).first()
-        return render_template('user.html', result=convert_db_query_data(data))
+        data = Db().session.execute(queries.user_profile(session.get('user_id'))).first()
+        return render_template('user.html', result=records.convert(data))
     if request.method == 'POST':
-        form_dict = request.form.to_dict()
         db = Db()
-        (db.session.query(db_model.User).filter(db_model.User.id == session.get('user_id')).update(
-            {'name': form_dict.get('name'), 'login': form_dict.get('login'), 'birth_date': form_dict.get('birth_date'),
-             'phone': form_dict.get('phone'), 'email': form_dict.get('email')}))
+        db.session.execute(queries.update_user(session.get('user_id'), request.form.to_dict()))
         db.session.commit()
         return render_template('congratulation.html', text='User data updated', return_page='/user')
 
@@ -160,10 +164,8 @@ def user():
 def user_funds():
     """Funds operations for certain user."""
     if request.method == 'GET':
-        db = Db()
-        data = db.session.query(db_model.User.id, db_model.User.name, db_model.User.funds).filter_by(
-            id=session.get('user_id')).first()
-        return render_template('user_funds.html', result=convert_db_query_data(data))
+        data = Db().session.execute(queries.user_funds(session.get('user_id'))).first()
+        return render_template('user_funds.html', result=records.convert(data))
     return 'user funds endpoint'
 
 
@@ -172,8 +174,8 @@ def user_funds():
 def user_pre_reservations():
     """Check free slot select endpoint."""
     form_dict = request.form.to_dict()
-    free_slots = get_trainer_free_slots(date_str=form_dict['date'], service_id=int(form_dict['service']),
-                                        trainer_id=int(form_dict['trainer']))
+    free_slots = get_trainer_free_slots(date=dt.date.fromisoformat(form_dict['date']),
+                                        service_id=int(form_dict['service']), trainer_id=int(form_dict['trainer']))
     return render_template('pre_reservation.html', form_data=form_dict, free_slots=free_slots)
 
 
@@ -182,22 +184,34 @@ def user_pre_reservations():
 def user_reservations():
     """User operations with reservations."""
     if request.method == 'GET':
-        db = Db()
-        columns = (db_model.Reservation.id, db_model.Reservation.date, db_model.Reservation.time,
-                   db_model.Trainer.name.label('trainer.name'),
-                   db_model.Service.name.label('service.name'),
-                   db_model.User.name.label('user.name'))
-        data = (db.session.query(*columns).join(db_model.User).join(db_model.Service).join(db_model.Trainer)).filter(
-            db_model.User.id == session.get('user_id')).all()
-        return render_template('reservations.html', result=convert_db_query_data(data))
+        when, limit, page = pages.reservations_params(request.args)
+        try:
+            if request.args.get('format') == 'json':
+                data, page['next'] = get_user_reservations(session.get('user_id'), when=when,
+                                                           after=request.args.get('after'), limit=limit)
+                return jsonify(pages.reservations_json(data, page))
+            query = queries.user_reservations(session.get('user_id'), when=when, after=request.args.get('after'))
+        except ValueError:
+            return redirect(f'/user/reservations?when={when}')
+        # rows are rendered while they are fetched, next page link is known after the last row
+        rows = Db().session.execute(query.limit(limit + 1), execution_options={'yield_per': pages.stream_batch_size})
+        return stream_template('reservations.html', when=when, page=page,
+                               result=records.iter_records(pages.paginate_reservations(rows, limit, page),
+                                                           records.query_keys(query)))
     if request.method == 'POST':
         form_dict = request.form.to_dict()
         db = Db()
-        new_reservation = db_model.Reservation(trainer=form_dict['trainer'], user=session.get('user_id'),
-                                               service=form_dict['service'], date=form_dict['date'],
-                                               time=form_dict['start_time'])
-        db.session.add(new_reservation)
-        db.session.commit()
+        trainer_id, service_id = int(form_dict['trainer']), int(form_dict['service'])
+        date = dt.date.fromisoformat(form_dict['date'])
+        try:
+            booking.book(db.session, user_id=session.get('user_id'), trainer_id=trainer_id, service_id=service_id,
+                         date=date, start_time=availability.parse_time(form_dict['start_time']))
+        except booking.BookingError as exc:
+            # slot was taken meanwhile, show actual free slots
+            pages.invalidate_free_slots(trainer_id, date)
+            free_slots = get_trainer_free_slots(date=date, service_id=service_id, trainer_id=trainer_id)
+            return render_template('pre_reservation.html', form_data=form_dict, free_slots=free_slots, err=exc), 409
+        pages.invalidate_free_slots(trainer_id, date)
         return render_template('congratulation.html', text='New reservation created', return_page='/user/reservations')
 
 
@@ -206,14 +220,8 @@ def user_reservations():
 def user_reservation(reservation_id):
     """Show/modify with certain reservation."""
     if request.method == 'GET':
-        db = Db()
-        columns = (db_model.Reservation.id, db_model.Reservation.date, db_model.Reservation.time,
-                   db_model.Trainer.name.label('trainer.name'),
-                   db_model.Service.name.label('service.name'),
-                   db_model.User.name.label('user.name'))
-        data = (db.session.query(*columns).join(db_model.User).join(db_model.Service).join(db_model.Trainer)).filter(
-            db_model.User.id == session.get('user_id'), db_model.Reservation.id == reservation_id).first()
-        return render_template('reservation.html', result=convert_db_query_data(data))
+        data = Db().session.execute(queries.user_reservation(session.get('user_id'), reservation_id)).first()
+        return render_template('reservation.html', result=records.convert(data))
     return f'user reservation "{reservation_id}" endpoint'
 
 
@@ -222,9 +230,11 @@ def user_reservation(reservation_id):
 def user_reservation_delete(reservation_id):
     """Delete certain reservation."""
     if request.method == 'GET':
-        db = Db()
-        db.session.query(db_model.Reservation).filter_by(id=reservation_id, user=session.get('user_id')).delete()
-        db.session.commit()
+        db, user_id = Db(), session.get('user_id')
+        if reservation := db.session.execute(queries.reservation_slot(user_id, reservation_id)).first():
+            db.session.execute(queries.delete_reservation(user_id, reservation_id))
+            db.session.commit()
+            pages.invalidate_free_slots(reservation.trainer, reservation.date)
         return redirect('/user/reservations')
 
 
@@ -233,13 +243,8 @@ def user_reservation_delete(reservation_id):
 def user_checkout():
     """Checkout list operations."""
     if request.method == 'GET':
-        db = Db()
-        columns = (db_model.User.id, db_model.User.name,
-                   db_model.Service.name.label('service.name'),
-                   db_model.ServicesBalance.amount)
-        data = (db.session.query(*columns).join(db_model.User).join(db_model.Service)).filter(
-            db_model.User.id == session.get('user_id')).all()
-        return render_template('user_checkout.html', result=convert_db_query_data(data))
+        return stream_template('user_checkout.html', result=records.stream(
+            queries.user_checkout(session.get('user_id')), pages.stream_batch_size, session=Db().session))
     if request.method == 'POST':
         return 'user_checkout_endpoint'
 
@@ -247,56 +252,42 @@ def user_checkout():
 @app.get('/fitness_center')
 def fitness_centers():
     """Info for all fitness centers."""
-    db = Db()
-    columns = (db_model.FitnessCenter.id, db_model.FitnessCenter.address,
-               db_model.FitnessCenter.name, db_model.FitnessCenter.contacts)
-    data = db.session.query(*columns).all()
-    return render_template('fitness_centers.html', result=convert_db_query_data(data))
+    ref = reference_data()
+    return conditional_response(ref.etag, ref.modified,
+                                lambda: render_template('fitness_centers.html', result=pages.fitness_centers_data(ref)),
+                                cached=True)
 
 
 @app.get('/fitness_center/<int:fc_id>')
 def fitness_center(fc_id):
     """Certain fitness center info."""
-    db = Db()
-    columns = (db_model.FitnessCenter.id, db_model.FitnessCenter.address,
-               db_model.FitnessCenter.name, db_model.FitnessCenter.contacts)
-    data = db.session.query(*columns).filter_by(id=fc_id).first()
-    return render_template('fitness_center.html', result=convert_db_query_data(data), fc_id=fc_id)
+    ref = reference_data()
+    return conditional_response(ref.etag, ref.modified,
+                                lambda: render_template('fitness_center.html', result=pages.fitness_center_data(
+                                    ref, fc_id), fc_id=fc_id))
 
 
 @app.get('/fitness_center/<int:fc_id>/trainer')
 def fitness_center_trainers(fc_id):
     """Trainers info for certain fitness centers."""
-    db = Db()
-    columns = (db_model.Trainer.id.label('trainer.id'),
-               db_model.FitnessCenter.name.label('fitness_center.name'),
-               db_model.Trainer.name.label('trainer.name'),
-               db_model.Trainer.age.label('trainer.age'),
-               db_model.Trainer.sex.label('trainer.sex'))
-    data = (db.session.query(*columns).join(db_model.FitnessCenter)).filter(
-        db_model.Trainer.fitness_center == fc_id).all()
-    return render_template('trainers.html', result=convert_db_query_data(data), fc_id=fc_id)
+    ref = reference_data()
+    rating = trainer_ratings(ref.trainers_by_fc.get(fc_id, ()))
+    return conditional_response(pages.trainers_version(ref, rating), pages.trainers_modified(ref, rating),
+                                lambda: render_template('trainers.html', result=pages.trainers_data(ref, fc_id, rating),
+                                                        fc_id=fc_id),
+                                cached=True)
 
 
 @app.get('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>')
 def fitness_center_trainer(fc_id, trainer_id):
     """Certain trainer info."""
-    db = Db()
-    columns = (db_model.FitnessCenter.name.label('fitness_center.name'),
-               db_model.Trainer.name.label('trainer.name'),
-               db_model.Trainer.age.label('trainer.age'),
-               db_model.Trainer.sex.label('trainer.sex'))
-    data = (db.session.query(*columns).join(db_model.FitnessCenter)).filter(
-        db_model.Trainer.fitness_center == fc_id, db_model.Trainer.id).first()
-
-    # service selection for reservation
-    columns = (db_model.TrainerCapacity.service.label('service.id'),
-               db_model.Service.name.label('service.name'))
-    service_data = (db.session.query(*columns).join(db_model.Service).join(db_model.Trainer)).filter(
-        db_model.TrainerCapacity.trainer == trainer_id, db_model.Trainer.fitness_center == fc_id).all()
-
-    return render_template('trainer.html', result=convert_db_query_data(data),
-                           service=convert_db_query_data(service_data), trainer=trainer_id, fc_id=fc_id)
+    ref = reference_data()
+    trainer = pages.fc_trainer(ref, fc_id, trainer_id)
+    rating = trainer_ratings([trainer_id]) if trainer else {}
+    data, service_data = pages.trainer_data(ref, fc_id, trainer, rating)
+    return conditional_response(pages.trainers_version(ref, rating), pages.trainers_modified(ref, rating),
+                                lambda: render_template('trainer.html', result=data, service=service_data,
+                                                        trainer=trainer_id, fc_id=fc_id))
 
 
 @app.route('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>/rating', methods=['GET', 'POST'])
@@ -305,81 +296,57 @@ def fitness_center_trainer_rating(fc_id, trainer_id):
     """Trainer rating operations."""
     if request.method == 'GET':
         db = Db()
-        columns = (db_model.Rating.points.label('rating.points'),
-                   db_model.Trainer.name.label('trainer.name'),
-                   db_model.Rating.text.label('rating.text'),
-                   db_model.User.name.label('user.name'),
-                   db_model.User.id.label('user.id'))
-        rows_data = (db.session.query(*columns)
-                     .join(db_model.User, db_model.User.id == db_model.Rating.user, isouter=True)
-                     .join(db_model.Trainer, db_model.Trainer.id == db_model.Rating.trainer, isouter=True)
-                     .filter(db_model.Trainer.fitness_center == fc_id, db_model.Trainer.id == trainer_id)).all()
-        data = convert_db_query_data(rows_data)
-
-        # default values
-        rating_values = {'points': 100, 'text': '', 'fc_id': fc_id, 'trainer_id': trainer_id}
-        # if rating record from current user exist in db we change defaults to values from db
-        if curr_user_rating := [el for el in data if el['user.id'] == session.get('user_id')]:
-            rating_values['points'] = curr_user_rating[0]['rating.points']
-            rating_values['text'] = curr_user_rating[0]['rating.text']
-        return render_template('rating.html', result=data, defaults=rating_values, fc_id=fc_id)
+        # if rating record from current user exist in db form defaults are taken from it
+        current = db.session.execute(queries.user_trainer_rating(fc_id, trainer_id, session.get('user_id'))).first()
+        # ratings list is rendered while rows are fetched
+        return stream_template('rating.html', fc_id=fc_id, defaults=pages.rating_defaults(fc_id, trainer_id, current),
+                               result=records.stream(queries.trainer_rating_list(fc_id, trainer_id),
+                                                     pages.stream_batch_size, session=db.session))
     if request.method == 'POST':
         form_dict = request.form.to_dict()
-        db = Db()
-        columns = (db_model.Rating.id.label('rating.id'), db_model.User.id.label('user.id'))
-        rows_data = (db.session.query(*columns)
-                     .join(db_model.User, db_model.User.id == db_model.Rating.user, isouter=True)
-                     .join(db_model.Trainer, db_model.Trainer.id == db_model.Rating.trainer, isouter=True)
-                     .filter(db_model.Trainer.fitness_center == fc_id, db_model.Trainer.id == trainer_id,
-                             db_model.User.id == session.get('user_id'))).all()
-        select_data = convert_db_query_data(rows_data)
-
-        # if rating record exists do update , if not exists -> insert
-        if select_data:
-            (db.session.query(db_model.Rating)
-             .filter(db_model.Rating.trainer == trainer_id, db_model.Rating.user == session.get('user_id'))
-             .update({'trainer': trainer_id, 'user': session.get('user_id'), 'points': form_dict['points'],
-                      'text': form_dict['text']}))
-            db.session.commit()
-        else:
-            new_rating = db_model.Rating(trainer=trainer_id, user=session.get('user_id'),
-                                         points=form_dict['points'], text=form_dict['text'])
-            db.session.add(new_rating)
-            db.session.commit()
+        ratings.upsert_rating(Db().session, trainer_id=trainer_id, user_id=session.get('user_id'),
+                              points=int(form_dict['points']), text=form_dict['text'])
         return render_template('congratulation.html', text='Rating was added',
                                return_page=f'/fitness_center/{fc_id}/trainer/{trainer_id}/rating')
 
 
+@app.get('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>/rating/summary')
+def fitness_center_trainer_rating_summary(fc_id, trainer_id):
+    """Trainer rating aggregates (count, sum, average, histogram)."""
+    data = Db().session.execute(queries.trainer_rating_summary(fc_id, trainer_id)).scalars().first()
+    return jsonify(trainer=trainer_id, **ratings.summary(data))
+
+
 @app.get('/fitness_center/<int:fc_id>/services')
 def fitness_center_services(fc_id):
     """Services for certain fitness center."""
-    db = Db()
-    columns = (db_model.Service.id.label('service.id'),
-               db_model.Service.name.label('service.name'),
-               db_model.Service.description, db_model.Service.duration, db_model.Service.price,
-               db_model.FitnessCenter.name.label('fitness_center.name'))
-    data = (db.session.query(*columns).join(db_model.FitnessCenter)).filter(
-        db_model.Service.fitness_center == fc_id).all()
-    return render_template('services.html', result=convert_db_query_data(data), fc_id=fc_id)
+    ref = reference_data()
+    return conditional_response(ref.etag, ref.modified,
+                                lambda: render_template('services.html', result=pages.services_data(ref, fc_id),
+                                                        fc_id=fc_id),
+                                cached=True)
 
 
 @app.get('/fitness_center/<int:fc_id>/services/<int:service_id>')
 def fitness_center_service(fc_id, service_id):
     """Certain service info."""
-    db = Db()
-    columns = (db_model.Service.name.label('service.name'),
-               db_model.Service.description, db_model.Service.duration, db_model.Service.price,
-               db_model.FitnessCenter.name.label('fitness_center.name'))
-    data = (db.session.query(*columns).join(db_model.FitnessCenter)).filter(
-        db_model.Service.fitness_center == fc_id, db_model.Service.id == service_id).first()
-
-    # trainer selection for reservation
-    columns = (db_model.TrainerCapacity.trainer.label('trainer.id'),
-               db_model.Trainer.name.label('trainer.name'))
-    trainer_data = (db.session.query(*columns).join(db_model.Trainer)).filter(
-        db_model.TrainerCapacity.service == service_id, db_model.Trainer.fitness_center == fc_id).all()
-    return render_template('service.html', result=convert_db_query_data(data),
-                           trainer=convert_db_query_data(trainer_data), service=service_id, fc_id=fc_id)
+    ref = reference_data()
+    data, trainer_data = pages.service_data(ref, fc_id, service_id)
+    return conditional_response(ref.etag, ref.modified,
+                                lambda: render_template('service.html', result=data, trainer=trainer_data,
+                                                        service=service_id, fc_id=fc_id))
+
+
+@app.get('/fitness_center/<int:fc_id>/services/<int:service_id>/availability')
+def fitness_center_service_availability(fc_id, service_id):
+    """Free slots of all service trainers for date range (date_from, date_to query args, one week by default)."""
+    try:
+        dates = pages.availability_dates(request.args)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    free_slots = get_service_free_slots(service_id, dates, fc_id=fc_id)
+    return jsonify(service=service_id, date_from=dates[0].isoformat(), date_to=dates[-1].isoformat(),
+                   trainers=free_slots)
 
 
 @app.get('/register')
@@ -393,25 +360,34 @@ def register_post():
     """Do registration."""
     try:
         form_dict = request.form.to_dict()
-        email = form_dict.get('email')
         db = Db()
-        user_exists = db.session.query(db_model.User).filter(db_model.User.login == form_dict['login']).first()
-        if user_exists is None:
-            new_user = db_model.User(name=form_dict['name'], login=form_dict['login'], password=form_dict['password'],
-                                     birth_date=form_dict['birth_date'], phone=form_dict['phone'],
-                                     email=form_dict['email'])
-            db.session.add(new_user)
+        if db.session.execute(queries.login_exists(form_dict['login'])).first() is None:
+            db.session.add(pages.new_user(form_dict))
+            if email := form_dict.get('email'):
+                # published in background after commit, request does not wait for broker
+                dispatch.delay_on_commit(db.session, send_email, email, pages.registration_subject,
+                                         pages.registration_text)
             db.session.commit()
-            if email:
-                subject = 'Registration completed successfully!'
-                text = '\nSuccessful registration in our fitness center.'
-                send_email.delay(email, subject, text)
             return render_template('congratulation.html', text='New user account was created', return_page='/login')
         return render_template('register.html', err='Error: login already exists')
     except Exception as g_exc:
         return render_template('register.html', err=g_exc)
 
 
+@app.get('/db/pool')
+@auth
+def db_pool():
+    """Db connection pool stats."""
+    return jsonify(db_orm.pool_stats())
+
+
+@app.get('/cache/stats')
+@auth
+def cache_stats():
+    """Application caches stats."""
+    return jsonify(availability=availability_cache.stats(), pages=page_cache.stats())
+
+
 @app.get('/fitness_center/<int:fc_id>/loyalty_programs')
 def fitness_center_loyalty(fc_id):
     """Loyalty program."""
@@ -421,4 +397,7 @@ def fitness_center_loyalty(fc_id):
 if __name__ == '__main__':
     host = '0.0.0.0'
     port = 8080
+    db_orm.init_db()
+    refdata.refresh(Db().session)
+    db_orm.remove_session()
     app.run(host=host, port=port, debug=True)
@@ -0,0 +1,405 @@
+"""Fitness center application, async (ASGI) variant with the same models and templates.
+
+Run: uvicorn app_async:app --port 8080
+Queries (queries.py), page data and versions (pages.py) are shared with app.py, sync code (booking, rating upsert,
+reference data load) runs in async session via run_sync.
+"""
+import datetime as dt
+import os
+import secrets
+from functools import wraps
+
+from quart import Quart, Response, flash, g, jsonify, make_response, redirect, render_template, request, session
+
+import availability
+import booking
+import db_async
+import dispatch
+import pages
+import queries
+import ratings
+import records
+import refdata
+from utils import send_email
+
+app = Quart(__name__, template_folder='templates')
+
+# the same key is needed by all workers and after reload, otherwise random key of process (sessions are lost)
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_bytes(16)
+availability_cache, page_cache = pages.availability_cache, pages.page_cache
+
+
+def db_session():
+    """Request scoped async db session."""
+    if 'db_session' not in g:
+        g.db_session = db_async.session_factory()
+    return g.db_session
+
+
+@app.teardown_appcontext
+async def close_session(exc=None):
+    """Return request session connection back to pool."""
+    if (db := g.pop('db_session', None)) is not None:
+        await db.close()
+
+
+def auth(func):
+    """Auth decorator."""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        if session.get('user_id') is None:
+            return redirect('/login')
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+async def reference_data():
+    """Actual snapshot of fitness centers, services and trainers."""
+    return await db_session().run_sync(refdata.get)
+
+
+async def cached_page(etag, render):
+    """Render page or take it from page cache, authenticated users always get freshly rendered page."""
+    if session.get('user_id') is not None:
+        return await render()
+    key = pages.page_key(request.path, request.query_string.decode(), etag)
+    if (page := page_cache.get(key)) is None:
+        page = await render()
+        page_cache.set(key, page)
+    return page
+
+
+async def conditional_response(etag, last_modified, render, cached=False):
+    """Return 304 if client has actual page version, otherwise render page with ETag and Last-Modified headers.
+
+    cached - take page from page cache for anonymous users.
+    """
+    if pages.not_modified(request.if_none_match, request.if_modified_since, etag, last_modified):
+        response = Response('', status=304)
+    else:
+        response = await make_response(await cached_page(etag, render) if cached else await render())
+    return pages.set_version_headers(response, etag, last_modified)
+
+
+async def trainer_ratings(trainer_ids):
+    """Rating count and average of trainers -> {trainer_id: (count, avg)}."""
+    if not trainer_ids:
+        return {}
+    return pages.rating_map((await db_session().execute(queries.trainer_ratings(trainer_ids))).all())
+
+
+async def get_trainer_free_slots(date, service_id, trainer_id):
+    """Get trainer free slots for certain date and certain service."""
+    if (free_slots := pages.cached_free_slots(trainer_id, date, service_id)) is not None:
+        return free_slots
+    # reservations changed during query invalidate the day, so slots computed from stale rows are not cached
+    generation = pages.free_slots_generation(trainer_id, date)
+    # schedule, capacity, reservations and service duration in one round trip
+    rows = (await db_session().execute(availability.inputs_query(service_id, [date], trainer_id=trainer_id))).all()
+    return pages.trainer_free_slots(rows, trainer_id, date, service_id, generation)
+
+
+async def get_service_free_slots(service_id, dates, fc_id=None):
+    """Get free slots of all trainers offering service for certain dates -> {trainer: {date: [slots]}}."""
+    generation = pages.free_slots_generation()
+    rows = (await db_session().execute(availability.inputs_query(service_id, dates, fc_id=fc_id))).all()
+    return pages.service_free_slots(rows, service_id, generation)
+
+
+async def get_user_reservations(user_id, when='all', after=None, limit=pages.reservations_page_size):
+    """Get page of user reservations -> (rows, next page cursor or None)."""
+    # one extra row shows that next page exists
+    query = queries.user_reservations(user_id, when=when, after=after).limit(limit + 1)
+    return pages.split_page((await db_session().execute(query)).all(), limit)
+
+
+@app.get('/')
+async def start():
+    """Start page."""
+    return redirect('/fitness_center')
+
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    """Login."""
+    if request.method == 'GET':
+        if session.get('user_id'):
+            return redirect('/user')
+        return await render_template('login.html')
+    elif request.method == 'POST':
+        form_dict = (await request.form).to_dict()
+        form_login = form_dict['login']
+        data = (await db_session().execute(queries.user_by_login(form_login))).scalars().first()
+        if (user_id := pages.login_user_id(data, form_dict['password'])) is not None:
+            session['user_id'] = user_id
+            return redirect('/user')
+        await flash('Login unsuccessful. Please check your username and password.', 'error')
+        app.logger.warning(f'{form_login} failed to log in')
+    return redirect('/login')
+
+
+@app.get('/logout')
+@auth
+async def logout():
+    """Logout."""
+    session.pop('user_id', None)
+    return redirect('/login')
+
+
+@app.route('/user', methods=['GET', 'POST'])
+@auth
+async def user():
+    """User operations."""
+    if request.method == 'GET':
+        data = (await db_session().execute(queries.user_profile(session.get('user_id')))).first()
+        return await render_template('user.html', result=records.convert(data))
+    if request.method == 'POST':
+        db = db_session()
+        await db.execute(queries.update_user(session.get('user_id'), (await request.form).to_dict()))
+        await db.commit()
+        return await render_template('congratulation.html', text='User data updated', return_page='/user')
+
+
+@app.route('/user/funds', methods=['GET', 'POST'])
+@auth
+async def user_funds():
+    """Funds operations for certain user."""
+    if request.method == 'GET':
+        data = (await db_session().execute(queries.user_funds(session.get('user_id')))).first()
+        return await render_template('user_funds.html', result=records.convert(data))
+    return 'user funds endpoint'
+
+
+@app.route('/user/pre_reservation', methods=['POST'])
+@auth
+async def user_pre_reservations():
+    """Check free slot select endpoint."""
+    form_dict = (await request.form).to_dict()
+    free_slots = await get_trainer_free_slots(date=dt.date.fromisoformat(form_dict['date']),
+                                              service_id=int(form_dict['service']),
+                                              trainer_id=int(form_dict['trainer']))
+    return await render_template('pre_reservation.html', form_data=form_dict, free_slots=free_slots)
+
+
+@app.route('/user/reservations', methods=['GET', 'POST'])
+@auth
+async def user_reservations():
+    """User operations with reservations."""
+    if request.method == 'GET':
+        when, limit, page = pages.reservations_params(request.args)
+        try:
+            data, page['next'] = await get_user_reservations(session.get('user_id'), when=when,
+                                                             after=request.args.get('after'), limit=limit)
+        except ValueError:
+            return redirect(f'/user/reservations?when={when}')
+        if request.args.get('format') == 'json':
+            return jsonify(pages.reservations_json(data, page))
+        return await render_template('reservations.html', result=records.convert(data), when=when, page=page)
+    if request.method == 'POST':
+        form_dict = (await request.form).to_dict()
+        trainer_id, service_id = int(form_dict['trainer']), int(form_dict['service'])
+        date = dt.date.fromisoformat(form_dict['date'])
+        user_id, start_time = session.get('user_id'), availability.parse_time(form_dict['start_time'])
+        try:
+            await db_session().run_sync(lambda sync_session: booking.book(
+                sync_session, user_id=user_id, trainer_id=trainer_id, service_id=service_id, date=date,
+                start_time=start_time))
+        except booking.BookingError as exc:
+            # slot was taken meanwhile, show actual free slots
+            pages.invalidate_free_slots(trainer_id, date)
+            free_slots = await get_trainer_free_slots(date=date, service_id=service_id, trainer_id=trainer_id)
+            return await render_template('pre_reservation.html', form_data=form_dict, free_slots=free_slots,
+                                         err=exc), 409
+        pages.invalidate_free_slots(trainer_id, date)
+        return await render_template('congratulation.html', text='New reservation created',
+                                     return_page='/user/reservations')
+
+
+@app.route('/user/reservations/<int:reservation_id>', methods=['GET', 'POST'])
+@auth
+async def user_reservation(reservation_id):
+    """Show/modify with certain reservation."""
+    if request.method == 'GET':
+        data = (await db_session().execute(queries.user_reservation(session.get('user_id'), reservation_id))).first()
+        return await render_template('reservation.html', result=records.convert(data))
+    return f'user reservation "{reservation_id}" endpoint'
+
+
+@app.route('/user/reservations/<int:reservation_id>/delete', methods=['GET'])
+@auth
+async def user_reservation_delete(reservation_id):
+    """Delete certain reservation."""
+    if request.method == 'GET':
+        db, user_id = db_session(), session.get('user_id')
+        if reservation := (await db.execute(queries.reservation_slot(user_id, reservation_id))).first():
+            await db.execute(queries.delete_reservation(user_id, reservation_id))
+            await db.commit()
+            pages.invalidate_free_slots(reservation.trainer, reservation.date)
+        return redirect('/user/reservations')
+
+
+@app.route('/user/checkout', methods=['GET', 'POST'])
+@auth
+async def user_checkout():
+    """Checkout list operations."""
+    if request.method == 'GET':
+        data = (await db_session().execute(queries.user_checkout(session.get('user_id')))).all()
+        return await render_template('user_checkout.html', result=records.convert(data))
+    if request.method == 'POST':
+        return 'user_checkout_endpoint'
+
+
+@app.get('/fitness_center')
+async def fitness_centers():
+    """Info for all fitness centers."""
+    ref = await reference_data()
+    return await conditional_response(ref.etag, ref.modified,
+                                      lambda: render_template('fitness_centers.html',
+                                                              result=pages.fitness_centers_data(ref)),
+                                      cached=True)
+
+
+@app.get('/fitness_center/<int:fc_id>')
+async def fitness_center(fc_id):
+    """Certain fitness center info."""
+    ref = await reference_data()
+    return await conditional_response(ref.etag, ref.modified,
+                                      lambda: render_template('fitness_center.html', fc_id=fc_id,
+                                                              result=pages.fitness_center_data(ref, fc_id)))
+
+
+@app.get('/fitness_center/<int:fc_id>/trainer')
+async def fitness_center_trainers(fc_id):
+    """Trainers info for certain fitness centers."""
+    ref = await reference_data()
+    rating = await trainer_ratings(ref.trainers_by_fc.get(fc_id, ()))
+    return await conditional_response(pages.trainers_version(ref, rating), pages.trainers_modified(ref, rating),
+                                      lambda: render_template('trainers.html', fc_id=fc_id,
+                                                              result=pages.trainers_data(ref, fc_id, rating)),
+                                      cached=True)
+
+
+@app.get('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>')
+async def fitness_center_trainer(fc_id, trainer_id):
+    """Certain trainer info."""
+    ref = await reference_data()
+    trainer = pages.fc_trainer(ref, fc_id, trainer_id)
+    rating = await trainer_ratings([trainer_id]) if trainer else {}
+    data, service_data = pages.trainer_data(ref, fc_id, trainer, rating)
+    return await conditional_response(pages.trainers_version(ref, rating), pages.trainers_modified(ref, rating),
+                                      lambda: render_template('trainer.html', result=data, service=service_data,
+                                                              trainer=trainer_id, fc_id=fc_id))
+
+
+@app.route('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>/rating', methods=['GET', 'POST'])
+@auth
+async def fitness_center_trainer_rating(fc_id, trainer_id):
+    """Trainer rating operations."""
+    if request.method == 'GET':
+        db = db_session()
+        # if rating record from current user exist in db form defaults are taken from it
+        current = (await db.execute(queries.user_trainer_rating(fc_id, trainer_id, session.get('user_id')))).first()
+        data = records.convert((await db.execute(queries.trainer_rating_list(fc_id, trainer_id))).all())
+        return await render_template('rating.html', result=data, fc_id=fc_id,
+                                     defaults=pages.rating_defaults(fc_id, trainer_id, current))
+    if request.method == 'POST':
+        form_dict = (await request.form).to_dict()
+        user_id = session.get('user_id')
+        await db_session().run_sync(lambda sync_session: ratings.upsert_rating(
+            sync_session, trainer_id=trainer_id, user_id=user_id, points=int(form_dict['points']),
+            text=form_dict['text']))
+        return await render_template('congratulation.html', text='Rating was added',
+                                     return_page=f'/fitness_center/{fc_id}/trainer/{trainer_id}/rating')
+
+
+@app.get('/fitness_center/<int:fc_id>/trainer/<int:trainer_id>/rating/summary')
+async def fitness_center_trainer_rating_summary(fc_id, trainer_id):
+    """Trainer rating aggregates (count, sum, average, histogram)."""
+    data = (await db_session().execute(queries.trainer_rating_summary(fc_id, trainer_id))).scalars().first()
+    return jsonify(trainer=trainer_id, **ratings.summary(data))
+
+
+@app.get('/fitness_center/<int:fc_id>/services')
+async def fitness_center_services(fc_id):
+    """Services for certain fitness center."""
+    ref = await reference_data()
+    return await conditional_response(ref.etag, ref.modified,
+                                      lambda: render_template('services.html', fc_id=fc_id,
+                                                              result=pages.services_data(ref, fc_id)),
+                                      cached=True)
+
+
+@app.get('/fitness_center/<int:fc_id>/services/<int:service_id>')
+async def fitness_center_service(fc_id, service_id):
+    """Certain service info."""
+    ref = await reference_data()
+    data, trainer_data = pages.service_data(ref, fc_id, service_id)
+    return await conditional_response(ref.etag, ref.modified,
+                                      lambda: render_template('service.html', result=data, trainer=trainer_data,
+                                                              service=service_id, fc_id=fc_id))
+
+
+@app.get('/fitness_center/<int:fc_id>/services/<int:service_id>/availability')
+async def fitness_center_service_availability(fc_id, service_id):
+    """Free slots of all service trainers for date range (date_from, date_to query args, one week by default)."""
+    try:
+        dates = pages.availability_dates(request.args)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    free_slots = await get_service_free_slots(service_id, dates, fc_id=fc_id)
+    return jsonify(service=service_id, date_from=dates[0].isoformat(), date_to=dates[-1].isoformat(),
+                   trainers=free_slots)
+
+
+@app.get('/register')
+async def register_get():
+    """Registration info."""
+    return await render_template('register.html')
+
+
+@app.post('/register')
+async def register_post():
+    """Do registration."""
+    try:
+        form_dict = (await request.form).to_dict()
+        db = db_session()
+        if (await db.execute(queries.login_exists(form_dict['login']))).first() is None:
+            db.add(pages.new_user(form_dict))
+            if email := form_dict.get('email'):
+                # published in background after commit, event loop does not wait for broker
+                dispatch.delay_on_commit(db.sync_session, send_email, email, pages.registration_subject,
+                                         pages.registration_text)
+            await db.commit()
+            return await render_template('congratulation.html', text='New user account was created',
+                                         return_page='/login')
+        return await render_template('register.html', err='Error: login already exists')
+    except Exception as g_exc:
+        return await render_template('register.html', err=g_exc)
+
+
+@app.get('/db/pool')
+@auth
+async def db_pool():
+    """Db connection pool stats."""
+    return jsonify(db_async.pool_stats())
+
+
+@app.get('/cache/stats')
+@auth
+async def cache_stats():
+    """Application caches stats."""
+    return jsonify(availability=availability_cache.stats(), pages=page_cache.stats())
+
+
+@app.get('/fitness_center/<int:fc_id>/loyalty_programs')
+async def fitness_center_loyalty(fc_id):
+    """Loyalty program."""
+    return f'fitness_center "{fc_id}" loyalty endpoint'
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('app_async:app', host='0.0.0.0', port=8080)
@@ -0,0 +1,138 @@
+"""Trainer availability engine.
+
+Schedule and reservations are handled as integer minute offsets from midnight.
+Occupancy for a day is built with difference arrays turned into prefix sums, so
+the cost is O(slots + reservations) per trainer/day instead of O(slots * reservations).
+"""
+import datetime as dt
+from array import array
+from itertools import accumulate
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import aliased
+
+import db_model
+
+DELTA = 15  # 15 min delta to divide schedule according services duration into slots
+
+
+def to_minutes(time_str):
+    """Convert 'HH-MM' (or 'HH:MM') time string into minutes from midnight."""
+    return int(time_str[:2]) * 60 + int(time_str[3:5])
+
+
+def time_minutes(time_val):
+    """Convert native time into minutes from midnight."""
+    return time_val.hour * 60 + time_val.minute
+
+
+def from_minutes(minutes):
+    """Convert minutes from midnight into 'HH-MM' time string."""
+    return f'{minutes // 60:02d}-{minutes % 60:02d}'
+
+
+def parse_time(time_str):
+    """Convert 'HH-MM' (or 'HH:MM') time string into native time."""
+    return dt.time(int(time_str[:2]), int(time_str[3:5]))
+
+
+def free_slots(schedule, reservations, capacity, service_id, duration, delta=DELTA):
+    """Get free start times (minutes) for one trainer day.
+
+    schedule - (start, end) minutes of trainer working time
+    reservations - iterable of (start, service_id, duration) minutes
+    capacity - dict service_id -> max attendees for this trainer
+    """
+    start, end = schedule
+    slots_num = max((end - start) // delta, 0)
+    if not slots_num:
+        return []
+    # occupancy counters as difference arrays (one extra cell for closing index)
+    attendees = array('i', bytes(4 * (slots_num + 1)))
+    blocked = array('i', bytes(4 * (slots_num + 1)))
+    for r_start, r_service, r_duration in reservations:
+        idx = (r_start - start) // delta
+        last = min(idx + r_duration // delta, slots_num)
+        idx = max(idx, 0)
+        if idx >= last:
+            continue
+        # we can't do reservation for slots used already by other services
+        counters = attendees if r_service == service_id else blocked
+        counters[idx] += 1
+        counters[last] -= 1
+
+    # for not yet reserved slots we make assumption that as minimum one reservation possible
+    max_attendees = capacity.get(service_id, 1)
+    busy = array('i', bytes(4 * (slots_num + 1)))  # prefix sum of not available slots
+    total = 0
+    for idx, curr_attendees, curr_blocked in zip(range(slots_num), accumulate(attendees), accumulate(blocked)):
+        if curr_blocked or (curr_attendees and curr_attendees >= max_attendees):
+            total += 1
+        busy[idx + 1] = total
+
+    # service must fit into sequence of free slots -> window of service slots has no busy slots
+    window = max(-(-duration // delta), 1)
+    return [start + idx * delta for idx in range(slots_num - window + 1) if busy[idx + window] == busy[idx]]
+
+
+def free_slots_bulk(schedules, reservations, capacities, service_id, duration, delta=DELTA):
+    """Get free start times for many trainers/days in one call.
+
+    schedules - dict (trainer_id, date) -> (start, end) minutes
+    reservations - dict (trainer_id, date) -> list of (start, service_id, duration) minutes
+    capacities - dict trainer_id -> dict service_id -> max attendees
+    Returns dict (trainer_id, date) -> list of free start minutes.
+    """
+    return {key: free_slots(schedule, reservations.get(key, ()), capacities.get(key[0], {}), service_id, duration,
+                            delta=delta)
+            for key, schedule in schedules.items()}
+
+
+def inputs_query(service_id, dates, trainer_id=None, fc_id=None):
+    """Single query with all availability inputs for trainers offering service on certain dates.
+
+    One row per reservation of trainer day (or one row without reservation data for free day),
+    schedule, capacity and service duration are repeated in every row. Rows are ordered by trainer day and
+    schedule start, so the earliest schedule of trainer day comes first.
+    """
+    service = aliased(db_model.Service)
+    r_service = aliased(db_model.Service)
+    schedule = db_model.TrainerSchedule
+    capacity = db_model.TrainerCapacity
+    reservation = db_model.Reservation
+    columns = (schedule.id.label('schedule_id'), schedule.trainer.label('trainer'), schedule.date.label('date'),
+               schedule.start_time.label('start_time'), schedule.end_time.label('end_time'),
+               capacity.max_attendees.label('max_attendees'), service.duration.label('duration'),
+               reservation.time.label('reservation_time'), reservation.service.label('reservation_service'),
+               r_service.duration.label('reservation_duration'))
+    query = (select(*columns).select_from(schedule)
+             .join(capacity, and_(capacity.trainer == schedule.trainer, capacity.service == service_id))
+             .join(service, service.id == capacity.service)
+             .outerjoin(reservation, and_(reservation.trainer == schedule.trainer, reservation.date == schedule.date))
+             .outerjoin(r_service, r_service.id == reservation.service)
+             .where(schedule.date.in_(list(dates))))
+    if trainer_id is not None:
+        query = query.where(schedule.trainer == trainer_id)
+    if fc_id is not None:
+        query = query.where(service.fitness_center == fc_id)
+    return query.order_by(schedule.trainer, schedule.date, schedule.start_time, schedule.id)
+
+
+def collect_inputs(rows, service_id):
+    """Convert inputs query rows into (duration, schedules, reservations, capacities) for free_slots_bulk."""
+    duration = None
+    schedules, reservations, capacities, schedule_ids = {}, {}, {}, {}
+    for row in rows:
+        key = (row.trainer, row.date)
+        # only first (the earliest) schedule record of trainer day is used
+        if schedule_ids.setdefault(key, row.schedule_id) != row.schedule_id:
+            continue
+        duration = row.duration
+        capacities[row.trainer] = {service_id: row.max_attendees}
+        if key not in schedules:
+            schedules[key] = (time_minutes(row.start_time), time_minutes(row.end_time))
+            reservations[key] = []
+        if row.reservation_time is not None:
+            reservations[key].append((time_minutes(row.reservation_time), row.reservation_service,
+                                      row.reservation_duration))
+    return duration, schedules, reservations, capacities
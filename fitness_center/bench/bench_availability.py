@@ -0,0 +1,105 @@
+"""Benchmark availability engine against previous list based free slots search.
+
+Usage: python bench/bench_availability.py [trainers] [days]
+"""
+import datetime as dt
+import os
+import random
+import sys
+import timeit
+from itertools import groupby
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import availability  # noqa: E402
+
+DELTA = availability.DELTA
+SERVICES = {1: 60, 2: 45, 3: 30, 4: 90, 5: 15}
+CAPACITY = {1: 5, 2: 16, 3: 1, 4: 10, 5: 3}
+
+
+def legacy_free_slots(schedule_data, capacity_data, reservation_data, service_data, service_id):
+    """Previous implementation of app.get_trainer_free_slots (without db queries)."""
+    time_slots = []
+    curr_time = dt.datetime.strptime(schedule_data['start_time'], '%H-%M')
+    end_time = dt.datetime.strptime(schedule_data['end_time'], '%H-%M')
+    while curr_time < end_time:
+        time_slots.append(curr_time)
+        curr_time += dt.timedelta(minutes=DELTA)
+
+    max_capacity = [1] * len(time_slots)
+    attendees = [0] * len(time_slots)
+    for curr_r in reservation_data:
+        r_start_time = dt.datetime.strptime(curr_r['reservation.time'], '%H-%M')
+        slots_num = int(curr_r['service.duration'] / DELTA)
+        idx = time_slots.index(r_start_time)
+        for i in range(idx, idx + slots_num):
+            if curr_r['service.id'] != service_id:
+                max_capacity[i] = 0
+            else:
+                attendees[i] += 1
+                capacity_filter = [el['max_attendees'] for el in capacity_data if el['service'] == curr_r['service.id']]
+                max_capacity[i] = capacity_filter[0]
+
+    allowed_attendees = [max_capacity[idx] - attendees[idx] for idx, _ in enumerate(time_slots)]
+    z_num = service_data['duration'] / DELTA - 1
+    tmp = [list(group) for k, group in groupby(allowed_attendees, lambda x: x == 0)]
+    result = [lst[i] if len(lst) > z_num and i <= len(lst) - z_num - 1 else 0 for lst in tmp for i, _ in enumerate(lst)]
+    return [time_val.strftime('%H-%M') for idx, time_val in enumerate(time_slots) if result[idx] != 0]
+
+
+def dense_day(rnd, start=6 * 60, end=23 * 60):
+    """Generate densely booked trainer day, services of one kind do not overlap with others."""
+    reservations = []
+    curr = start
+    while curr < end:
+        service_id = rnd.choice(list(SERVICES))
+        duration = SERVICES[service_id]
+        if curr + duration > end:
+            break
+        # group sessions are booked by several members, up to capacity
+        for _ in range(rnd.randint(1, CAPACITY[service_id])):
+            reservations.append((curr, service_id, duration))
+        curr += duration + rnd.choice((0, 0, DELTA, 2 * DELTA))
+    return (start, end), reservations
+
+
+def legacy_inputs(schedule, reservations):
+    """Convert generated day into db-like dicts used by previous implementation."""
+    schedule_data = {'start_time': availability.from_minutes(schedule[0]),
+                     'end_time': availability.from_minutes(schedule[1])}
+    capacity_data = [{'service': key, 'max_attendees': val} for key, val in CAPACITY.items()]
+    reservation_data = [{'reservation.time': availability.from_minutes(r_start), 'service.duration': r_duration,
+                         'service.id': r_service} for r_start, r_service, r_duration in reservations]
+    return schedule_data, capacity_data, reservation_data
+
+
+def main(trainers=50, days=7):
+    """Run benchmark."""
+    rnd = random.Random(42)
+    schedules, reservations = {}, {}
+    for trainer_id in range(trainers):
+        for day in range(days):
+            schedules[(trainer_id, day)], reservations[(trainer_id, day)] = dense_day(rnd)
+    capacities = {trainer_id: CAPACITY for trainer_id in range(trainers)}
+    legacy_data = {key: legacy_inputs(schedules[key], reservations[key]) for key in schedules}
+    print(f'{len(schedules)} trainer days, {sum(len(el) for el in reservations.values())} reservations')
+
+    for service_id, duration in SERVICES.items():
+        def run_legacy():
+            return {key: legacy_free_slots(*data, {'duration': duration}, service_id)
+                    for key, data in legacy_data.items()}
+
+        def run_engine():
+            result = availability.free_slots_bulk(schedules, reservations, capacities, service_id, duration)
+            return {key: [availability.from_minutes(el) for el in val] for key, val in result.items()}
+
+        assert run_legacy() == run_engine(), f'Results differ for service {service_id}'
+        legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=5))
+        engine_time = min(timeit.repeat(run_engine, number=1, repeat=5))
+        print(f'service {service_id} ({duration:>2} min): legacy {legacy_time * 1000:8.2f} ms, '
+              f'engine {engine_time * 1000:8.2f} ms, x{legacy_time / engine_time:.1f}')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:3]])
@@ -0,0 +1,77 @@
+"""Registration latency with slow and unreachable broker: inline publishing vs post-commit background dispatch.
+
+Usage: python bench/bench_dispatch.py [registrations] [broker delay ms]
+Database is taken from DB_STRING (schema at alembic head), broker is in-memory with publish delay added.
+Inline publishing is the previous behaviour (send_email.delay in the request after commit).
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import kombu
+from kombu.exceptions import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import dispatch  # noqa: E402
+import utils  # noqa: E402
+from load_sync_async import percentile_ms  # noqa: E402
+
+broker = {'delay': 0.0, 'down': False}
+original_publish = kombu.Producer.publish
+
+
+def slow_publish(self, *args, **kwargs):
+    """Publish with broker latency or failure."""
+    time.sleep(broker['delay'])
+    if broker['down']:
+        raise OperationalError('Broker is unreachable')
+    return original_publish(self, *args, **kwargs)
+
+
+def inline_submit(name, args=(), kwargs=None):
+    """Previous behaviour: publish in request."""
+    utils.app.tasks[name].apply_async(args, kwargs)
+
+
+def register(client, count):
+    """Register users with email -> (latencies, failed registrations)."""
+    latencies, failed = [], 0
+    for _ in range(count):
+        login = f'bench_{uuid.uuid4().hex[:12]}'
+        data = {'name': 'Bench', 'login': login, 'password': login, 'birth_date': '2005-01-01', 'phone': '123',
+                'email': f'{login}@example.com'}
+        start = time.perf_counter()
+        response = client.post('/register', data=data)
+        latencies.append(time.perf_counter() - start)
+        failed += 'Congratulations' not in response.get_data(as_text=True)
+    return latencies, failed
+
+
+def main(count=50, delay_ms=200):
+    """Run benchmark."""
+    utils.app.conf.broker_url = 'memory://'
+    utils.app.conf.task_always_eager = False
+    kombu.Producer.publish = slow_publish
+    dispatch.dispatcher = dispatch.Dispatcher(utils.app, retries=1, retry_delay=0.1,
+                                              spool_dir=tempfile.mkdtemp(prefix='fc_dispatch_'))
+    background_submit = dispatch.dispatcher.submit
+    client = app.app.test_client()
+    print(f'{count} registrations, broker delay {delay_ms} ms, db: {os.environ.get("DB_STRING", "default")}')
+    for down in (False, True):
+        broker.update(delay=delay_ms / 1000, down=down)
+        for name, submit in (('inline', inline_submit), ('background', background_submit)):
+            dispatch.dispatcher.submit = submit
+            latencies, failed = register(client, count)
+            dispatch.dispatcher.flush()
+            print(f'broker {"down" if down else "slow"}, {name:<10}: p50 {percentile_ms(latencies, 0.5):8.2f} ms, '
+                  f'p99 {percentile_ms(latencies, 0.99):8.2f} ms, failed registrations {failed}')
+    dispatch.dispatcher.close()
+    print(f'dispatcher: {dispatch.dispatcher.stats()}')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:3]])
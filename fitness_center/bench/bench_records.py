@@ -0,0 +1,81 @@
+"""Benchmark records conversion against previous per row dict conversion (convert_db_query_data).
+
+Usage: python bench/bench_records.py [rows]
+"""
+import datetime as dt
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Template  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import db_model  # noqa: E402
+import db_orm  # noqa: E402
+import records  # noqa: E402
+
+# the same loops as in list templates (reservations.html, trainers.html, ...)
+TABLE = Template('''<table><tr>{% for key in result[0].keys() %}<th>{{ key }}</th>{% endfor %}</tr>
+{% for row in result %}<tr>{% for key, value in row.items() %}<td>{{ value }}</td>{% endfor %}</tr>{% endfor %}
+</table>''')
+
+
+def legacy_convert(query_data):
+    """Previous implementation of app.convert_db_query_data."""
+    if query_data is None:
+        return {}
+    elif type(query_data) is list:
+        return [el._asdict() for el in query_data]
+    return query_data._asdict()
+
+
+def access(result):
+    """Read all values like templates do."""
+    return sum(1 for row in result for _ in row.items())
+
+
+def load_rows(rows):
+    """Query reservations with dotted labels from temporary in-memory db."""
+    engine = create_engine('sqlite://')
+    db_orm.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(db_model.FitnessCenter(id=1, address='Bench 1', name='Bench', contacts='0'))
+    session.add(db_model.User(id=1, name='user', login='user', password='pwd', phone='0', email=''))
+    session.add(db_model.Service(id=1, name='service', duration=60, description='', price=0, fitness_center=1,
+                                 max_attendees=1))
+    session.add(db_model.Trainer(id=1, name='trainer', fitness_center=1, sex='M'))
+    start = dt.date(2024, 1, 1)
+    session.add_all([db_model.Reservation(trainer=1, user=1, service=1, date=start + dt.timedelta(days=idx // 40),
+                                          time=dt.time(8 + idx % 40 // 4, idx % 4 * 15)) for idx in range(rows)])
+    session.commit()
+    columns = (db_model.Reservation.id, db_model.Reservation.date, db_model.Reservation.time,
+               db_model.Trainer.name.label('trainer.name'),
+               db_model.Service.name.label('service.name'),
+               db_model.User.name.label('user.name'))
+    data = (session.query(*columns).join(db_model.User).join(db_model.Service).join(db_model.Trainer)).all()
+    session.close()
+    return data
+
+
+def main(rows=20000):
+    """Run benchmark."""
+    data = load_rows(rows)
+    assert [dict(el.items()) for el in records.convert(data)] == legacy_convert(data)
+    assert TABLE.render(result=records.convert(data)) == TABLE.render(result=legacy_convert(data))
+    print(f'{len(data)} rows')
+    for name, run_legacy, run_records in (
+            ('convert', lambda: legacy_convert(data), lambda: records.convert(data)),
+            ('convert + access', lambda: access(legacy_convert(data)), lambda: access(records.convert(data))),
+            ('convert + render', lambda: TABLE.render(result=legacy_convert(data)),
+             lambda: TABLE.render(result=records.convert(data)))):
+        legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=5))
+        records_time = min(timeit.repeat(run_records, number=1, repeat=5))
+        print(f'{name:<17}: legacy {legacy_time * 1000:8.2f} ms, records {records_time * 1000:8.2f} ms, '
+              f'x{legacy_time / records_time:.1f}')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:2]])
@@ -0,0 +1,95 @@
+"""Private memory of gunicorn worker before and after it reloads reference data snapshot.
+
+Usage: python bench/bench_refdata_rss.py [trainers]
+Seeded SQLite database from DB_STRING is copied and filled with synthetic reference data (trainers / 10 fitness
+centers, a service per 2 trainers), server is started with one worker and short REFDATA_TTL. Private memory of
+worker (Private_Clean + Private_Dirty of /proc/<pid>/smaps_rollup, Linux only) is reported after start, when snapshot
+loaded by master is shared, after expired snapshot was reloaded without data changes and after reload of changed
+data (new snapshot is built in worker memory).
+"""
+import http.client
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from load_sync_async import APP_DIR, HOST, wait_port
+
+PORT = 18084
+REFDATA_TTL = 3  # seconds
+
+
+def make_db(path, trainers):
+    """Copy of DB_STRING sqlite db with synthetic reference data."""
+    shutil.copy(os.environ['DB_STRING'].replace('sqlite:///', '', 1), path)
+    con = sqlite3.connect(path)
+    centers = max(trainers // 10, 1)
+    con.executemany('insert into fitness_center (address, name, contacts) values (?, ?, ?)',
+                    [(f'Bench street {idx}', f'Bench center {idx}', f'{idx:09}') for idx in range(centers)])
+    fc_ids = [row[0] for row in con.execute("select id from fitness_center where name like 'Bench center %'")]
+    con.executemany('insert into trainer (name, fitness_center, age, sex) values (?, ?, ?, ?)',
+                    [(f'Bench trainer {idx}', fc_ids[idx % centers], 20 + idx % 40, 'female')
+                     for idx in range(trainers)])
+    con.executemany('insert into service (name, description, duration, price, fitness_center, max_attendees) '
+                    'values (?, ?, ?, ?, ?, ?)',
+                    [(f'Bench service {idx}', f'Bench service {idx} description', 60, 10, fc_ids[idx % centers], 10)
+                     for idx in range(trainers // 2)])
+    con.execute("insert into trainer_capacity (service, trainer, max_attendees) "
+                "select s.id, t.id, 5 from service s join trainer t on t.fitness_center = s.fitness_center "
+                "where s.name like 'Bench service %' and t.id % 2 = s.id % 2")
+    con.commit()
+    con.close()
+
+
+def private_kb(pid):
+    """Memory pages of process not shared with other processes, KiB."""
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        return sum(int(line.split()[1]) for line in f if line.startswith(('Private_Clean:', 'Private_Dirty:')))
+
+
+def get(path='/fitness_center'):
+    """Send request to server."""
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=30)
+    conn.request('GET', path)
+    conn.getresponse().read()
+    conn.close()
+
+
+def main(trainers=20000):
+    """Run benchmark."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'refdata.sqlite')
+        make_db(db_path, trainers)
+        env = {**os.environ, 'DB_STRING': f'sqlite:///{db_path}', 'WEB_BIND': f'{HOST}:{PORT}', 'WEB_WORKERS': '1',
+               'REFDATA_TTL': str(REFDATA_TTL)}
+        proc = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'wsgi:app'],
+                                cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_port(PORT, proc)
+            with open(f'/proc/{proc.pid}/task/{proc.pid}/children') as f:
+                worker = int(f.read().split()[0])
+            result = {}
+            for step in ('start', 'unchanged', 'changed'):
+                if step == 'changed':
+                    with sqlite3.connect(db_path) as con:
+                        con.execute("update trainer set age = age + 1 where name = 'Bench trainer 0'")
+                if step != 'start':
+                    # expired snapshot is reloaded by worker on request
+                    time.sleep(REFDATA_TTL + 1)
+                for _ in range(10):
+                    get()
+                result[step] = private_kb(worker)
+            master = private_kb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait()
+    print(f'{trainers} trainers, private memory: master {master} KiB, worker {result["start"]} KiB at start, '
+          f'{result["unchanged"]} KiB after reload of unchanged data, {result["changed"]} KiB after reload of '
+          f'changed data')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:2]])
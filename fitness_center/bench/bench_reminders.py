@@ -0,0 +1,69 @@
+"""Reminder scan on large reservation table: first scan of a day and repeated scans.
+
+Usage: python bench/bench_reminders.py [reservations per day] [days]
+Temporary sqlite database is created, bulk email tasks are only counted (not published).
+"""
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import db_model  # noqa: E402
+import db_orm  # noqa: E402
+import dispatch  # noqa: E402
+import reminders  # noqa: E402
+
+START = dt.datetime(2024, 6, 10, 8, 0)
+USERS = 1000
+
+
+def fill(engine, per_day, days):
+    """Reference rows, users and reservations spread evenly over days."""
+    db_orm.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(db_model.FitnessCenter), [{'id': 1, 'address': 'Street 1', 'name': 'FC', 'contacts': '1'}])
+        conn.execute(insert(db_model.Service), [{'id': 1, 'name': 'Yoga', 'duration': 60, 'description': 'Yoga',
+                                                 'price': 10, 'fitness_center': 1, 'max_attendees': 10}])
+        conn.execute(insert(db_model.Trainer), [{'id': 1, 'name': 'Anna', 'fitness_center': 1, 'sex': 'female'}])
+        conn.execute(insert(db_model.User), [{'id': idx, 'name': f'User {idx}', 'login': f'user{idx}',
+                                              'password': 'x', 'phone': '1', 'email': f'user{idx}@example.com'}
+                                             for idx in range(1, USERS + 1)])
+        step = 24 * 3600 / per_day
+        for day in range(days):
+            rows = []
+            for idx in range(per_day):
+                start = START + dt.timedelta(days=day, seconds=int(idx * step))
+                rows.append({'trainer': 1, 'user': idx % USERS + 1, 'service': 1, 'date': start.date(),
+                             'time': start.time()})
+            conn.execute(insert(db_model.Reservation), rows)
+
+
+def main(per_day=100000, days=7):
+    """Run benchmark."""
+    tasks = []
+    dispatch.dispatcher.submit = lambda name, args=(), kwargs=None: tasks.append(len(args[0]))
+    path = os.path.join(tempfile.mkdtemp(prefix='fc_reminders_'), 'bench.sqlite')
+    engine = create_engine(f'sqlite:///{path}')
+    start = time.perf_counter()
+    fill(engine, per_day, days)
+    print(f'{per_day * days} reservations ({days} days) created in {time.perf_counter() - start:.1f} s')
+    now = START
+    with Session(engine) as session:
+        for name in ('first scan', 'repeated scan', 'scan 5 min later', 'scan next day'):
+            start = time.perf_counter()
+            reminded = reminders.remind_due(session, now)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<16}: {reminded:>7} reminded in {elapsed * 1000:9.1f} ms, '
+                  f'{len(tasks)} bulk tasks so far')
+            now += dt.timedelta(minutes=5) if name != 'scan 5 min later' else dt.timedelta(days=1)
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:3]])
@@ -0,0 +1,56 @@
+"""Email throughput: connection per message (previous send_email) vs pooled sessions and bulk sending.
+
+Usage: python bench/bench_smtp.py [messages] [connect delay ms] [rtt ms]
+Local SMTP stand-in emulates handshake (EHLO, STARTTLS, LOGIN) with connect delay and network with reply rtt.
+"""
+import os
+import smtplib
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+# SMTP stand-in is a test helper
+sys.path.insert(0, os.path.join(os.path.dirname(APP_DIR), 'test'))
+
+import mail  # noqa: E402
+from smtp_sink import SmtpSink  # noqa: E402
+
+
+def legacy_send(server, messages):
+    """Previous send_email: new session for every message."""
+    for message in messages:
+        with smtplib.SMTP('127.0.0.1', server.port) as client:
+            client.ehlo()
+            client.send_message(message)
+
+
+def main(count=500, connect_delay_ms=50, rtt_ms=1):
+    """Run benchmark."""
+    server = SmtpSink(connect_delay=connect_delay_ms / 1000, rtt=rtt_ms / 1000).start()
+    messages = [mail.make_message(f'user{idx}@example.com', 'Reminder', 'Your training starts soon.',
+                                  'fc@example.com') for idx in range(count)]
+    print(f'{count} messages, connect delay {connect_delay_ms} ms, rtt {rtt_ms} ms')
+    cases = [('connection per message', lambda pool: legacy_send(server, messages)),
+             ('pooled session', lambda pool: pool.send_messages(messages))]
+    cases += [(f'bulk, concurrency {concurrency}', lambda pool, concurrency=concurrency:
+               pool.send_bulk(messages, concurrency)) for concurrency in (4, 8)]
+    base = None
+    for name, send in cases:
+        pool = mail.SmtpPool(host='127.0.0.1', port=server.port, user=None, starttls=False, size=8,
+                             max_messages=count)
+        server.messages.clear()
+        connections = server.connections
+        start = time.perf_counter()
+        send(pool)
+        elapsed = time.perf_counter() - start
+        pool.close()
+        assert len(server.messages) == count
+        base = base or elapsed
+        print(f'{name:<24}: {count / elapsed:8.1f} msg/s (x{base / elapsed:.1f}), '
+              f'{server.connections - connections} connections')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:4]])
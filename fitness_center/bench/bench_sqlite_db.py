@@ -0,0 +1,181 @@
+"""Benchmark db_utils.exec_db_query against previous implementation on mixed rating operations.
+
+Usage: python bench/bench_sqlite_db.py [operations]
+Both implementations run the same operations (60% single selects, 15% list selects, 15% updates, 5% inserts,
+5% deletes) on their own temporary sqlite database with the same initial data.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+import db_model  # noqa: E402
+import db_orm  # noqa: E402
+import db_utils  # noqa: E402
+
+USERS = 1000
+TRAINERS = 100
+RATINGS = 10000
+
+
+class LegacySqliteDb:
+    """Previous implementation of db_utils.SqliteDb: values formatted into sql, connection per instance."""
+
+    def __init__(self, db_path):
+        """Init."""
+        con = sqlite3.connect(db_path)
+        con.row_factory = self.dict_factory
+        self.con = con
+        self.cur = con.cursor()
+
+    @staticmethod
+    def dict_factory(cursor, row):
+        """Convert rows into dict."""
+        return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+    def exec_query(self, query, single=True, commit=False):
+        """Execute DB query."""
+        try:
+            self.cur.execute(query)
+            if commit:
+                self.con.commit()
+            return self.cur.fetchone() if single else self.cur.fetchall()
+        except Exception:
+            return {} if single else []
+
+    def select(self, select_data, join_data=None, where_data=None, single=True, join_type='join'):
+        """Create and execute select query according provided select, join and where dicts."""
+        fields_str = ', '.join([f'{itm} as "{itm}"' for itm in list(select_data.values())[0]])
+        select_str = f'select {fields_str} from {list(select_data.keys())[0]}'
+        if join_data is not None:
+            join_str = ' '.join([f'{join_type} {k} on {v}' for k, v in join_data.items()])
+            select_str += f' {join_str}'
+        if where_data is not None:
+            select_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
+        return self.exec_query(query=select_str, single=single)
+
+    def insert(self, insert_data):
+        """Create and execute insert query according provided insert data."""
+        insert_fields = ', '.join(list(insert_data.values())[0].keys())
+        values_str = ', '.join([f'"{itm}"' for itm in list(insert_data.values())[0].values()])
+        insert_str = f'insert into {list(insert_data.keys())[0]} ({insert_fields}) values ({values_str})'
+        return self.exec_query(query=insert_str, commit=True)
+
+    def update(self, update_data, where_data=None):
+        """Create and execute update query according provided update data."""
+        update_str = f'update {list(update_data.keys())[0]} set '
+        set_pairs = ', '.join([f'{column}="{value}"' for column, value in list(update_data.values())[0].items()])
+        update_str += set_pairs
+        if where_data is not None:
+            update_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
+        return self.exec_query(query=update_str, commit=True)
+
+    def delete(self, delete_data, where_data=None):
+        """Create and execute delete query according provided delete data."""
+        delete_str = f'delete from {delete_data}'
+        if where_data is not None:
+            delete_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
+        return self.exec_query(query=delete_str, commit=True)
+
+    def __del__(self):
+        """Teardown."""
+        self.con.close()
+
+
+def legacy_exec_db_query(**kwargs):
+    """Previous implementation of db_utils.exec_db_query."""
+    db = LegacySqliteDb(kwargs['db_path'])
+    if select_data := kwargs.get('select_data'):
+        return db.select(select_data=select_data, join_data=kwargs.get('join_data'), single=kwargs.get('single', True),
+                         where_data=kwargs.get('where_data'), join_type=kwargs.get('join_type', 'join'))
+    elif insert_data := kwargs.get('insert_data'):
+        db.insert(insert_data=insert_data)
+    elif update_data := kwargs.get('update_data'):
+        db.update(update_data=update_data, where_data=kwargs.get('where_data'))
+    elif delete_data := kwargs.get('delete_data'):
+        db.delete(delete_data=delete_data, where_data=kwargs.get('where_data'))
+
+
+def rating(rating_id, points):
+    """Rating row, trainer and user pair is unique (one rating of trainer per user)."""
+    return {'id': rating_id, 'trainer': (rating_id - 1) // USERS + 1, 'user': (rating_id - 1) % USERS + 1,
+            'points': points, 'text': f'Rating {rating_id}'}
+
+
+def make_db(path):
+    """Schema, users, trainers and ratings."""
+    engine = create_engine(f'sqlite:///{path}')
+    db_orm.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(db_model.FitnessCenter), [{'id': 1, 'address': 'Street 1', 'name': 'FC', 'contacts': '1'}])
+        conn.execute(insert(db_model.Trainer), [{'id': idx, 'name': f'Trainer {idx}', 'fitness_center': 1,
+                                                 'sex': 'female'} for idx in range(1, TRAINERS + 1)])
+        conn.execute(insert(db_model.User), [{'id': idx, 'name': f'User {idx}', 'login': f'user{idx}',
+                                              'password': 'x', 'phone': '1', 'email': f'user{idx}@example.com'}
+                                             for idx in range(1, USERS + 1)])
+        conn.execute(insert(db_model.Rating), [rating(idx, idx % 5 + 1) for idx in range(1, RATINGS + 1)])
+    engine.dispose()
+
+
+def make_operations(count, seed=1):
+    """Mixed exec_db_query arguments."""
+    rnd = random.Random(seed)
+    operations, next_id = [], RATINGS + 1
+    for _ in range(count):
+        kind = rnd.random()
+        rating_id = rnd.randint(1, next_id - 1)
+        if kind < 0.6:
+            operations.append({'select_data': {'rating': ('rating.points', 'rating.text', 'user.name')},
+                               'join_data': {'user': 'user.id = rating.user'}, 'where_data': {'rating.id': rating_id}})
+        elif kind < 0.75:
+            operations.append({'select_data': {'rating': ('id', 'points', 'text')}, 'single': False,
+                               'where_data': {'trainer': rnd.randint(1, TRAINERS), 'points': rnd.randint(1, 5)}})
+        elif kind < 0.9:
+            operations.append({'update_data': {'rating': {'points': rnd.randint(1, 5)}},
+                               'where_data': {'id': rating_id}})
+        elif kind < 0.95:
+            values = rating(next_id, 5)
+            del values['id']
+            operations.append({'insert_data': {'rating': values}})
+            next_id += 1
+        else:
+            operations.append({'delete_data': 'rating', 'where_data': {'id': rating_id}})
+    return operations
+
+
+def run(exec_db_query, path, operations):
+    """Run operations -> (seconds, rows fetched)."""
+    fetched = 0
+    start = time.perf_counter()
+    for kwargs in operations:
+        result = exec_db_query(db_path=path, **kwargs)
+        if isinstance(result, list):
+            fetched += len(result)
+        elif result:
+            fetched += 1
+    return time.perf_counter() - start, fetched
+
+
+def main(count=100000):
+    """Run benchmark."""
+    operations = make_operations(count)
+    directory = tempfile.mkdtemp(prefix='fc_sqlite_db_')
+    print(f'{count} operations, sqlite {sqlite3.sqlite_version}')
+    results = {}
+    for name, exec_db_query in (('previous', legacy_exec_db_query), ('bound params', db_utils.exec_db_query)):
+        path = os.path.join(directory, f'{name.replace(" ", "_")}.sqlite')
+        make_db(path)
+        elapsed, fetched = results[name] = run(exec_db_query, path, operations)
+        print(f'{name:<13}: {elapsed:7.2f} s, {count / elapsed:8.0f} ops/s, {fetched} rows fetched')
+    db_utils.close_connections()
+    print(f'speedup: {results["previous"][0] / results["bound params"][0]:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:2]])
@@ -0,0 +1,56 @@
+"""Throughput of production server (gunicorn, wsgi.py) with different number of workers.
+
+Usage: python bench/bench_workers.py [max workers] [concurrency] [seconds]
+Database is taken from DB_STRING, workers count is doubled from 1 to max workers, threads per worker from
+WEB_THREADS. The same requests as in load_sync_async.py are sent.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from load_sync_async import APP_DIR, HOST, client, percentile_ms, wait_port
+
+PORT = 18083
+
+
+def run(workers, concurrency, seconds):
+    """Load server with certain workers count -> (requests/sec, p99 ms, errors)."""
+    env = {**os.environ, 'WEB_BIND': f'{HOST}:{PORT}', 'WEB_WORKERS': str(workers)}
+    proc = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'wsgi:app'],
+                            cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(PORT, proc)
+        # warm up caches and connection pools of all workers
+        client(PORT, time.perf_counter() + 1, [], [])
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(PORT, deadline, latencies, errors))
+                   for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+    return len(latencies) / elapsed, percentile_ms(latencies, 0.99), len(errors)
+
+
+def main(max_workers=8, concurrency=32, seconds=10):
+    """Run benchmark."""
+    print(f'{os.cpu_count()} cpu, {concurrency} connections, {seconds} s per run, '
+          f'db: {os.environ.get("DB_STRING", "default")}')
+    workers, base = 1, None
+    while workers <= max_workers:
+        rps, p99, errors = run(workers, concurrency, seconds)
+        base = base or rps
+        print(f'{workers:>2} workers: {rps:8.1f} req/s (x{rps / base:.2f}), p99 {p99:7.2f} ms, errors {errors}')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:4]])
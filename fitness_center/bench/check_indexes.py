@@ -0,0 +1,80 @@
+"""Check with EXPLAIN that hot queries do not scan whole tables (postgres or sqlite from DB_STRING).
+
+Usage: python bench/check_indexes.py
+"""
+import datetime as dt
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+
+import availability  # noqa: E402
+import db_model  # noqa: E402
+import db_orm  # noqa: E402
+import reminders  # noqa: E402
+
+DATE = dt.date(2024, 6, 10)
+
+
+def hot_queries():
+    """Hot queries -> tables which must be accessed by index."""
+    reservation = db_model.Reservation
+    capacity = db_model.TrainerCapacity
+    rating = db_model.Rating
+    return {
+        'availability inputs': (availability.inputs_query(4, [DATE], trainer_id=1),
+                                {'trainer_schedule', 'reservation', 'trainer_capacity'}),
+        'availability inputs batch': (availability.inputs_query(4, [DATE], fc_id=1),
+                                      {'reservation', 'trainer_capacity'}),
+        'user reservations': (select(reservation.id, reservation.date, reservation.time)
+                              .where(reservation.user == 1).order_by(reservation.date, reservation.time,
+                                                                     reservation.id), {'reservation'}),
+        'service trainers': (select(capacity.trainer).where(capacity.service == 4), {'trainer_capacity'}),
+        'trainer services': (select(capacity.service).where(capacity.trainer == 1), {'trainer_capacity'}),
+        'user trainer rating': (select(rating.id).where(rating.trainer == 1, rating.user == 1), {'rating'}),
+        'fitness center trainers': (select(db_model.Trainer.id).where(db_model.Trainer.fitness_center == 1),
+                                    {'trainer'}),
+        'fitness center services': (select(db_model.Service.id).where(db_model.Service.fitness_center == 1),
+                                    {'service'}),
+        'due reminders': (reminders.due_query(dt.datetime.combine(DATE, dt.time(8))), {'reservation'}),
+    }
+
+
+def pg_scanned_tables(conn, sql):
+    """Tables with sequential scan in postgres plan."""
+    # tiny dev tables are always cheaper to scan, so we check that index can be used at all
+    conn.exec_driver_sql('set enable_seqscan = off')
+    plan = conn.exec_driver_sql(f'explain (format json) {sql}').scalar()
+    nodes, scanned = [plan[0]['Plan']], set()
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scanned.add(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scanned
+
+
+def sqlite_scanned_tables(conn, sql):
+    """Tables with full scan in sqlite plan."""
+    plan = conn.exec_driver_sql(f'explain query plan {sql}').all()
+    return {row[3].split()[1] for row in plan if row[3].startswith('SCAN ')}
+
+
+def main():
+    """Run check."""
+    failed = []
+    with db_orm.engine.connect() as conn:
+        scanned_tables = sqlite_scanned_tables if conn.dialect.name == 'sqlite' else pg_scanned_tables
+        for name, (query, tables) in hot_queries().items():
+            sql = query.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+            scanned = scanned_tables(conn, sql) & tables
+            print(f'{"FAIL" if scanned else "OK":<4} {name}{": full scan of " + ", ".join(scanned) if scanned else ""}')
+            if scanned:
+                failed.append(name)
+    assert not failed, f'Queries without index: {", ".join(failed)}'
+
+
+if __name__ == '__main__':
+    main()
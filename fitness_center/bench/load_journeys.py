@@ -0,0 +1,204 @@
+"""Load test replaying user journeys of test/test_app.py against running server.
+
+Usage: python bench/load_journeys.py [--url URL] [--users N] [--iterations N] [--threshold 0.25]
+                                     [--baseline bench/load_baseline.json] [--save-baseline]
+Every virtual user registers, logs in, checks free slots, reserves, lists reservations, rates trainer, deletes
+the reservation and logs out, iterations times. Throughput and latency percentiles are reported per endpoint,
+exit code is 1 if throughput, p95 latency or error rate regressed more than threshold against stored baseline.
+Baseline depends on machine and database, save it with --save-baseline on the machine where checks are run and
+start every run on a fresh copy of the same database (journeys add users and ratings).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+from load_sync_async import percentile_ms
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_baseline.json')
+request_timeout = 30
+# the same data as test/test_app.py scenarios
+FC_ID = 1
+TRAINER_ID = 1
+DATE = '2024-06-10'
+SERVICES = (5, 3, 4)
+RATING = {'points': '100', 'text': 'Perfect'}
+ERROR_RATE_MARGIN = 0.01  # allowed increase of endpoint error rate
+LATENCY_SLACK_MS = 5  # absolute p95 slack, fast endpoints are noisy
+SLOT_RE = re.compile(r'<option value="([^"]+)">')
+
+
+class Stats:
+    """Latencies and errors per endpoint."""
+
+    def __init__(self):
+        """Init."""
+        self.latencies = {}
+        self.errors = {}
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, latency, ok):
+        """Add request result."""
+        with self._lock:
+            self.latencies.setdefault(name, []).append(latency)
+            self.errors[name] = self.errors.get(name, 0) + (not ok)
+
+    def skip(self):
+        """Journey without free slot, reservation steps were skipped."""
+        with self._lock:
+            self.skipped += 1
+
+    def report(self, elapsed):
+        """Results {'rps': total requests/sec, 'endpoints': {name: {count, rps, p50, p95, p99, errors}}}."""
+        endpoints = {name: {'count': len(latencies), 'rps': round(len(latencies) / elapsed, 2),
+                            'p50': round(percentile_ms(latencies, 0.5), 2),
+                            'p95': round(percentile_ms(latencies, 0.95), 2),
+                            'p99': round(percentile_ms(latencies, 0.99), 2), 'errors': self.errors[name]}
+                     for name, latencies in sorted(self.latencies.items())}
+        total = sum(el['count'] for el in endpoints.values())
+        return {'rps': round(total / elapsed, 2), 'requests': total, 'skipped': self.skipped, 'endpoints': endpoints}
+
+
+def call(session, stats, name, url, expected=(200,), data=None, params=None):
+    """Send request, name is 'METHOD /endpoint', redirects are not followed to time endpoint itself."""
+    method = name.split(' ', 1)[0]
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, data=data, params=params, allow_redirects=False,
+                                   timeout=request_timeout)
+    except requests.RequestException:
+        stats.add(name, time.perf_counter() - start, False)
+        return None
+    stats.add(name, time.perf_counter() - start, response.status_code in expected)
+    return response
+
+
+def journey(base_url, stats, service_id):
+    """One user journey of test_app.py scenarios with a new user."""
+    session = requests.Session()
+    login = f'load_{uuid.uuid4().hex[:12]}'
+    user = {'name': 'Load', 'funds': 100, 'login': login, 'password': login, 'birth_date': '2005-01-01',
+            'phone': '123', 'email': ''}
+    call(session, stats, 'GET /register', f'{base_url}/register')
+    call(session, stats, 'POST /register', f'{base_url}/register', data=user)
+    call(session, stats, 'POST /login', f'{base_url}/login', expected=(302,),
+         data={'login': login, 'password': login})
+    call(session, stats, 'GET /user', f'{base_url}/user')
+    form = {'date': DATE, 'service': service_id, 'trainer': TRAINER_ID}
+    response = call(session, stats, 'POST /user/pre_reservation', f'{base_url}/user/pre_reservation', data=form)
+    slots = SLOT_RE.findall(response.text) if response is not None else []
+    reserved = False
+    if slots:
+        # 409 - slot was taken by another user meanwhile, expected under concurrency
+        response = call(session, stats, 'POST /user/reservations', f'{base_url}/user/reservations',
+                        expected=(200, 409), data={**form, 'start_time': random.choice(slots)})
+        reserved = response is not None and response.status_code == 200
+    else:
+        stats.skip()
+    response = call(session, stats, 'GET /user/reservations?format=json', f'{base_url}/user/reservations',
+                    params={'format': 'json', 'limit': 10})
+    reservations = response.json()['result'] if response is not None and response.status_code == 200 else []
+    call(session, stats, 'GET /user/reservations', f'{base_url}/user/reservations')
+    rating_url = f'{base_url}/fitness_center/{FC_ID}/trainer/{TRAINER_ID}/rating'
+    call(session, stats, 'GET /fitness_center/<id>/trainer/<id>/rating', rating_url)
+    call(session, stats, 'POST /fitness_center/<id>/trainer/<id>/rating', rating_url, data=RATING)
+    if reserved and reservations:
+        call(session, stats, 'GET /user/reservations/<id>', f'{base_url}/user/reservations/{reservations[0]["id"]}')
+        call(session, stats, 'GET /user/reservations/<id>/delete',
+             f'{base_url}/user/reservations/{reservations[0]["id"]}/delete', expected=(302,))
+    call(session, stats, 'GET /logout', f'{base_url}/logout', expected=(302,))
+    session.close()
+
+
+def virtual_user(base_url, stats, idx, iterations):
+    """Run journeys one after another."""
+    for iteration in range(iterations):
+        journey(base_url, stats, SERVICES[(idx + iteration) % len(SERVICES)])
+
+
+def run(base_url, users, iterations):
+    """Run concurrent virtual users -> report."""
+    # warm up caches and connection pools
+    journey(base_url, Stats(), SERVICES[0])
+    stats = Stats()
+    threads = [threading.Thread(target=virtual_user, args=(base_url, stats, idx, iterations)) for idx in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.report(time.perf_counter() - start)
+
+
+def compare(result, baseline, threshold):
+    """Regressions of result against baseline, threshold is allowed relative degradation."""
+    regressions = []
+    if result['rps'] < baseline['rps'] * (1 - threshold):
+        regressions.append(f'throughput {result["rps"]} req/s < baseline {baseline["rps"]} req/s')
+    for name, base in baseline['endpoints'].items():
+        if (current := result['endpoints'].get(name)) is None:
+            regressions.append(f'{name}: no requests')
+            continue
+        if current['p95'] > base['p95'] * (1 + threshold) + LATENCY_SLACK_MS:
+            regressions.append(f'{name}: p95 {current["p95"]} ms > baseline {base["p95"]} ms')
+        if current['errors'] / current['count'] > base['errors'] / base['count'] + ERROR_RATE_MARGIN:
+            regressions.append(f'{name}: errors {current["errors"]}/{current["count"]} > '
+                               f'baseline {base["errors"]}/{base["count"]}')
+    return regressions
+
+
+def print_report(result):
+    """Print results table."""
+    print(f'{"endpoint":<48} {"count":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    for name, el in result['endpoints'].items():
+        print(f'{name:<48} {el["count"]:>6} {el["rps"]:>8.1f} {el["p50"]:>8.2f} {el["p95"]:>8.2f} '
+              f'{el["p99"]:>8.2f} {el["errors"]:>6}')
+    print(f'total: {result["requests"]} requests, {result["rps"]:.1f} req/s, '
+          f'{result["skipped"]} journeys without free slot')
+
+
+def main():
+    """Run load test and check regressions."""
+    parser = argparse.ArgumentParser(description='Load test of user journeys.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='server url')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=10, help='journeys per user')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative degradation')
+    args = parser.parse_args()
+
+    print(f'{args.url}: {args.users} users, {args.iterations} journeys each')
+    result = run(args.url.rstrip('/'), args.users, args.iterations)
+    print_report(result)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'users': args.users, 'iterations': args.iterations, **result}, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'No baseline {args.baseline}, run with --save-baseline')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline['users'], baseline['iterations']) != (args.users, args.iterations):
+        print(f'Warning: baseline was taken with {baseline["users"]} users, {baseline["iterations"]} journeys each')
+    if regressions := compare(result, baseline, args.threshold):
+        print(f'Regressions (threshold {args.threshold:.0%}):')
+        for el in regressions:
+            print(f'  {el}')
+        return 1
+    print(f'No regressions (threshold {args.threshold:.0%})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Load test of sync (WSGI, threaded werkzeug server) and async (ASGI, uvicorn) apps on the same database.
+
+Usage: python bench/load_sync_async.py [concurrency] [seconds]
+Database is taken from DB_STRING (schema at alembic head), both apps are started as separate processes,
+single process each. Reports requests/sec, p50 and p99 latency per app.
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+SERVERS = {
+    'sync': [sys.executable, '-c', 'import sys; from werkzeug.serving import run_simple; import app; '
+                                   'run_simple(sys.argv[1], int(sys.argv[2]), app.app, threaded=True)'],
+    'async': [sys.executable, '-m', 'uvicorn', 'app_async:app', '--log-level', 'warning', '--no-access-log',
+              '--host'],
+}
+PORTS = {'sync': 18081, 'async': 18082}
+# anonymous journey: catalog pages (reference data, page cache) and db bound json endpoints
+PATHS = ['/fitness_center', '/fitness_center/1', '/fitness_center/1/trainer', '/fitness_center/1/trainer/1',
+         '/fitness_center/1/services', '/fitness_center/1/services/4',
+         '/fitness_center/1/services/4/availability?date_from=2024-06-10',
+         '/fitness_center/1/trainer/1/rating/summary']
+
+
+def wait_port(port, proc):
+    """Wait until server process accepts connections."""
+    for _ in range(100):
+        try:
+            socket.create_connection((HOST, port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def start_server(name):
+    """Start app server process."""
+    port = PORTS[name]
+    command = SERVERS[name] + [HOST, str(port)] if name == 'sync' else SERVERS[name] + [HOST, '--port', str(port)]
+    proc = subprocess.Popen(command, cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_port(port, proc)
+    return proc
+
+
+def percentile_ms(latencies, pct):
+    """Latency percentile in ms."""
+    latencies = sorted(latencies)
+    return latencies[min(int(len(latencies) * pct), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+
+def client(port, deadline, latencies, errors):
+    """Send requests over keep-alive connection until deadline."""
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    idx = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[idx % len(PATHS)]
+        idx += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(exc)
+            conn.close()
+            conn = http.client.HTTPConnection(HOST, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(name, concurrency, seconds):
+    """Load one app -> (requests/sec, p50 ms, p99 ms, errors)."""
+    proc = start_server(name)
+    try:
+        # warm up caches and connection pool
+        client(PORTS[name], time.perf_counter() + 1, [], [])
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(PORTS[name], deadline, latencies, errors))
+                   for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+    return len(latencies) / elapsed, percentile_ms(latencies, 0.5), percentile_ms(latencies, 0.99), len(errors)
+
+
+def main(concurrency=32, seconds=10):
+    """Run load test."""
+    print(f'{concurrency} connections, {seconds} s per app, db: {os.environ.get("DB_STRING", "default")}')
+    for name in SERVERS:
+        rps, p50, p99, errors = run(name, concurrency, seconds)
+        print(f'{name:<5}: {rps:8.1f} req/s, p50 {p50:7.2f} ms, p99 {p99:7.2f} ms, errors {errors}')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:3]])
@@ -0,0 +1,111 @@
+"""Concurrent booking stress test, checks that no slot is overbooked and reports bookings/sec.
+
+Usage: python bench/stress_booking.py [threads] [attempts per thread]
+Database is taken from STRESS_DB_STRING (schema is created there), temporary sqlite file by default.
+"""
+import datetime as dt
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import availability  # noqa: E402
+import booking  # noqa: E402
+import db_model  # noqa: E402
+import db_orm  # noqa: E402
+
+DATES = [dt.date(2024, 6, 10) + dt.timedelta(days=idx) for idx in range(5)]
+TRAINERS = 20
+SERVICES = {1: (60, 5), 2: (30, 1), 3: (45, 3)}  # id -> (duration, trainer capacity)
+START, END = 9 * 60, 18 * 60
+
+
+def seed(session_factory):
+    """Create fitness center with trainers, services and working days."""
+    session = session_factory()
+    session.add(db_model.FitnessCenter(id=1, address='Stress 1', name='Stress', contacts='0'))
+    session.add_all([db_model.User(id=idx, name=f'user{idx}', login=f'user{idx}', password='pwd', phone='0', email='')
+                     for idx in range(1, 101)])
+    for service_id, (duration, capacity) in SERVICES.items():
+        session.add(db_model.Service(id=service_id, name=f'service{service_id}', duration=duration,
+                                     description='stress', price=0, fitness_center=1, max_attendees=capacity))
+    for trainer_id in range(1, TRAINERS + 1):
+        session.add(db_model.Trainer(id=trainer_id, name=f'trainer{trainer_id}', fitness_center=1, sex='M'))
+        session.add_all([db_model.TrainerSchedule(trainer=trainer_id, date=date, start_time=dt.time(9),
+                                                  end_time=dt.time(18)) for date in DATES])
+        for service_id, (_, capacity) in SERVICES.items():
+            session.add(db_model.TrainerCapacity(trainer=trainer_id, service=service_id, max_attendees=capacity))
+    session.commit()
+    session.close()
+
+
+def worker(session_factory, attempts, seed_num, stats):
+    """Book random slots."""
+    rnd = random.Random(seed_num)
+    session = session_factory()
+    for _ in range(attempts):
+        start = rnd.randrange(START, END, availability.DELTA)
+        try:
+            booking.book(session, user_id=rnd.randint(1, 100), trainer_id=rnd.randint(1, TRAINERS),
+                         service_id=rnd.choice(list(SERVICES)), date=rnd.choice(DATES),
+                         start_time=dt.time(start // 60, start % 60))
+            stats['booked'] += 1
+        except booking.BookingError:
+            stats['rejected'] += 1
+    session.close()
+
+
+def check_overbooking(session_factory):
+    """Count slots with attendees over capacity or with different services at the same time."""
+    session = session_factory()
+    columns = (db_model.Reservation.trainer, db_model.Reservation.date, db_model.Reservation.time,
+               db_model.Reservation.service)
+    slots = {}
+    for trainer_id, date, start_time, service_id in session.query(*columns).all():
+        start = availability.time_minutes(start_time)
+        for minute in range(start, start + SERVICES[service_id][0], availability.DELTA):
+            slots.setdefault((trainer_id, date, minute), Counter())[service_id] += 1
+    session.close()
+    return [key for key, services in slots.items()
+            if len(services) > 1 or any(count > SERVICES[srv][1] for srv, count in services.items())]
+
+
+def main(threads=16, attempts=200):
+    """Run stress test."""
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_string = os.environ.get('STRESS_DB_STRING', f'sqlite:///{tmp_dir.name}/stress.sqlite')
+    # sqlite writers wait for database lock, default 5 sec is not enough for many threads
+    engine = db_orm.make_engine(db_string, connect_args={'timeout': 60} if db_string.startswith('sqlite') else {})
+    db_orm.Base.metadata.drop_all(bind=engine)
+    db_orm.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    seed(session_factory)
+
+    stats = Counter()
+    pool = [threading.Thread(target=worker, args=(session_factory, attempts, idx, stats)) for idx in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = stats['booked'] + stats['rejected']
+    print(f'{engine.dialect.name}: {threads} threads, {total} attempts in {elapsed:.2f} s -> {total / elapsed:.0f} '
+          f'attempts/sec, {stats["booked"]} booked ({stats["booked"] / elapsed:.0f} bookings/sec), '
+          f'{stats["rejected"]} rejected')
+    overbooked = check_overbooking(session_factory)
+    engine.dispose()
+    assert not overbooked, f'Overbooked slots: {overbooked}'
+    print('No overbooked slots')
+
+
+if __name__ == '__main__':
+    main(*[int(el) for el in sys.argv[1:3]])
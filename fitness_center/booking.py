@@ -0,0 +1,41 @@
+"""Reservation booking."""
+from sqlalchemy import update
+
+import availability
+import db_model
+
+
+class BookingError(Exception):
+    """Requested slot can't be reserved."""
+
+
+def book(session, user_id, trainer_id, service_id, date, start_time):
+    """Check that slot is free and create reservation in one transaction, return reservation id.
+
+    Trainer day schedule row is locked first (row lock in postgres, database write lock in sqlite),
+    so concurrent bookings of the same trainer day are serialized and other trainers are booked in parallel.
+    """
+    schedule = db_model.TrainerSchedule
+    try:
+        # no-op update takes the lock before availability is read
+        lock = (update(schedule).where(schedule.trainer == trainer_id, schedule.date == date)
+                .values(trainer=schedule.trainer).execution_options(synchronize_session=False))
+        if not session.execute(lock).rowcount:
+            raise BookingError('Trainer does not work on selected date')
+
+        rows = session.execute(availability.inputs_query(service_id, [date], trainer_id=trainer_id)).all()
+        duration, schedules, reservations, capacities = availability.collect_inputs(rows, service_id)
+        free_slots = availability.free_slots_bulk(schedules, reservations, capacities, service_id, duration)
+        if availability.time_minutes(start_time) not in free_slots.get((trainer_id, date), []):
+            raise BookingError('Selected time is not available')
+
+        reservation = db_model.Reservation(trainer=trainer_id, user=user_id, service=service_id, date=date,
+                                           time=start_time)
+        session.add(reservation)
+        session.flush()
+        reservation_id = reservation.id
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return reservation_id
@@ -0,0 +1,259 @@
+"""In-process and local disk caches."""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # memory | disk
+CACHE_DIR = os.environ.get('CACHE_DIR', '/tmp/fc_cache')
+# invalidation generation counters, keys are spread over counters by hash, the last one counts all invalidations
+GENERATION_SLOTS = 1024
+ALL_KEYS = GENERATION_SLOTS
+
+
+def generation_slot(key):
+    """Generation counter of key (the same in all processes), None gives counter of all keys."""
+    return ALL_KEYS if key is None else zlib.crc32(repr(key).encode()) % GENERATION_SLOTS
+
+
+class MemoryCache:
+    """Thread safe LRU cache with TTL for values of single process.
+
+    Value computed from data that can be invalidated meanwhile is stored with generation taken before computation:
+    set(key, value, generation=cache.generation(key)) is skipped if key was deleted after generation was taken.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        """Init."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._generations = [0] * (GENERATION_SLOTS + 1)
+        self._lock = threading.Lock()
+
+    def _account(self, found):
+        """Account hit/miss (called under lock)."""
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _get(self, key, account=False):
+        """Get (found, value) pair, expired values are removed."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                found, value = False, None
+            else:
+                self._data.move_to_end(key)
+                found, value = True, item[0]
+            if account:
+                self._account(found)
+            return found, value
+
+    def get(self, key, default=None):
+        """Get value and account hit/miss."""
+        found, value = self._get(key, account=True)
+        return value if found else default
+
+    def peek(self, key, default=None):
+        """Get value without hit/miss accounting."""
+        found, value = self._get(key)
+        return value if found else default
+
+    def generation(self, key=None):
+        """Invalidation generation of key (of all keys if None) to be passed to set()."""
+        slot = generation_slot(key)
+        with self._lock:
+            return slot, self._generations[slot]
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Set value unless generation has changed -> stored, least recently used values are evicted over max size."""
+        with self._lock:
+            if generation is not None and self._generations[generation[0]] != generation[1]:
+                return False
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        """Delete value, values computed before are not stored by set() with generation."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[generation_slot(key)] += 1
+            self._generations[ALL_KEYS] += 1
+
+    def clear(self):
+        """Delete all values."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        """Number of stored values (including not yet removed expired)."""
+        return len(self._data)
+
+    def stats(self):
+        """Cache statistics."""
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        total = hits + misses
+        hit_ratio = round(hits / total, 4) if total else 0.0
+        return {'backend': 'memory', 'size': len(self), 'max_size': self.max_size, 'hits': hits, 'misses': misses,
+                'evictions': evictions, 'hit_ratio': hit_ratio}
+
+
+class DiskCache(MemoryCache):
+    """Cache stored in local sqlite file, shared between processes of the same host (with invalidation generations).
+
+    Size is checked every evict_every writes, eviction over max size removes values with the earliest expiration.
+    """
+
+    def __init__(self, name, max_size=10000, ttl=300, cache_dir=CACHE_DIR):
+        """Init."""
+        super().__init__(max_size=max_size, ttl=ttl)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f'{name}.sqlite')
+        self.evict_every = max(1, min(100, max_size // 100))
+        self._writes = 0
+        self._pid = None
+        self._connection = None
+
+    @property
+    def _con(self):
+        """Sqlite connection, reopened in forked worker process."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            con = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            con.execute('pragma journal_mode=wal')
+            con.execute('create table if not exists cache (key text primary key, value blob, expires real)')
+            con.execute('create index if not exists cache_expires on cache (expires)')
+            con.execute('create table if not exists generations (slot integer primary key, value integer)')
+            self._connection = con
+        return self._connection
+
+    def _get(self, key, account=False):
+        """Get (found, value) pair, expired values are ignored."""
+        with self._lock:
+            row = self._con.execute('select value from cache where key = ? and expires >= ?',
+                                    (repr(key), time.time())).fetchone()
+            if account:
+                self._account(row is not None)
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def _generation(self, slot):
+        """Current generation of slot (called under lock)."""
+        row = self._con.execute('select value from generations where slot = ?', (slot,)).fetchone()
+        return row[0] if row else 0
+
+    def generation(self, key=None):
+        """Invalidation generation of key (of all keys if None) to be passed to set()."""
+        slot = generation_slot(key)
+        with self._lock:
+            return slot, self._generation(slot)
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Set value unless generation has changed -> stored."""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            con = self._con
+            # generation check and write are atomic for all processes
+            con.execute('begin immediate')
+            try:
+                if generation is not None and self._generation(generation[0]) != generation[1]:
+                    return False
+                con.execute('insert or replace into cache (key, value, expires) values (?, ?, ?)',
+                            (repr(key), data, expires))
+            finally:
+                con.execute('commit')
+            self._writes += 1
+            if self._writes % self.evict_every == 0 and (over := len(self) - self.max_size) > 0:
+                con.execute('delete from cache where key in (select key from cache order by expires limit ?)',
+                            (over,))
+                self.evictions += over
+            return True
+
+    def delete(self, key):
+        """Delete value, values computed before are not stored by set() with generation."""
+        with self._lock:
+            con = self._con
+            con.execute('begin immediate')
+            try:
+                con.execute('delete from cache where key = ?', (repr(key),))
+                con.executemany('insert into generations (slot, value) values (?, 1) '
+                                'on conflict (slot) do update set value = value + 1',
+                                [(generation_slot(key),), (ALL_KEYS,)])
+            finally:
+                con.execute('commit')
+
+    def clear(self):
+        """Delete all values."""
+        with self._lock:
+            self._con.execute('delete from cache')
+
+    def __len__(self):
+        """Number of stored values."""
+        return self._con.execute('select count(*) from cache').fetchone()[0]
+
+    def stats(self):
+        """Cache statistics."""
+        return {**super().stats(), 'backend': 'disk', 'path': self.path}
+
+
+class PageCache:
+    """Rendered pages cache on top of memory or disk cache, counts bytes served from cache."""
+
+    def __init__(self, backend):
+        """Init."""
+        self.backend = backend
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get page or None."""
+        item = self.backend.get(key)
+        if item is None:
+            return None
+        page, size = item
+        with self._lock:
+            self.bytes_served += size
+        return page
+
+    def set(self, key, page):
+        """Store page."""
+        self.backend.set(key, (page, len(page.encode())))
+
+    def get_or_render(self, key, render):
+        """Get page from cache or render and store it."""
+        if (page := self.get(key)) is None:
+            page = render()
+            self.set(key, page)
+        return page
+
+    def clear(self):
+        """Delete all pages."""
+        self.backend.clear()
+
+    def stats(self):
+        """Cache statistics."""
+        return {**self.backend.stats(), 'bytes_served': self.bytes_served}
+
+
+def make_cache(name, max_size=10000, ttl=300, backend=None):
+    """Create cache with configured backend."""
+    if (backend or CACHE_BACKEND) == 'disk':
+        return DiskCache(name, max_size=max_size, ttl=ttl)
+    return MemoryCache(max_size=max_size, ttl=ttl)
@@ -0,0 +1,39 @@
+"""Async db engine for ASGI app, the same database and pool settings as db_orm."""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+import db_orm
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_db_string(db_string):
+    """Db string with async driver of the same database."""
+    url = make_url(db_string)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def make_async_engine(db_string=db_orm.DB_STRING, **kwargs):
+    """Create async engine with configured connection pool, kwargs are passed to create_async_engine."""
+    db_string = async_db_string(db_string)
+    if db_string.startswith('sqlite') and ':memory:' in db_string:
+        return create_async_engine(db_string, **kwargs)
+    return create_async_engine(db_string, poolclass=AsyncAdaptedQueuePool, pool_size=db_orm.POOL_SIZE,
+                               max_overflow=db_orm.POOL_MAX_OVERFLOW, pool_recycle=db_orm.POOL_RECYCLE,
+                               pool_timeout=db_orm.POOL_TIMEOUT, pool_pre_ping=db_orm.POOL_PRE_PING, **kwargs)
+
+
+# process wide engine, sessions are created per request
+engine = make_async_engine()
+session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+def pool_stats():
+    """Connection pool statistics."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({'size': pool.size(), 'checked_in': pool.checkedin(), 'checked_out': pool.checkedout(),
+                      'overflow': pool.overflow(), 'max_overflow': pool._max_overflow})
+    return stats
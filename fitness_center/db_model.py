@@ -1,5 +1,6 @@
 """Db orm models."""
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, Time, UniqueConstraint,
+                        false)
 
 from db_orm import Base
 
@@ -18,6 +19,7 @@ class Rating(Base):
     """Table rating."""
 
     __tablename__ = 'rating'
+    __table_args__ = (UniqueConstraint('trainer', 'user', name='uq_rating_trainer_user'),)
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     trainer = Column(Integer, ForeignKey('trainer.id'), nullable=False)
     user = Column(Integer, ForeignKey('user.id'), nullable=False)
@@ -29,18 +31,23 @@ class Reservation(Base):
     """Table reservation."""
 
     __tablename__ = 'reservation'
+    __table_args__ = (Index('ix_reservation_trainer_date', 'trainer', 'date', 'time', 'service'),
+                      Index('ix_reservation_user_date_time', 'user', 'date', 'time', 'id'),
+                      Index('ix_reservation_reminder', 'reminded', 'date', 'time'))
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True)
     trainer = Column(Integer, ForeignKey('trainer.id'), nullable=False)
     user = Column(Integer, ForeignKey('user.id'), nullable=False)
     service = Column(Integer, ForeignKey('service.id'), nullable=False)
-    date = Column(String(10), nullable=False)
-    time = Column(String(10), nullable=False)
+    date = Column(Date, nullable=False)
+    time = Column(Time, nullable=False)
+    reminded = Column(Boolean, default=False, server_default=false(), nullable=False)
 
 
 class Service(Base):
     """Table service."""
 
     __tablename__ = 'service'
+    __table_args__ = (Index('ix_service_fitness_center', 'fitness_center'),)
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True, nullable=False)
     name = Column(String(50), nullable=False)
     duration = Column(Integer, default=0, nullable=False)
@@ -64,6 +71,7 @@ class Trainer(Base):
     """Table trainer."""
 
     __tablename__ = 'trainer'
+    __table_args__ = (Index('ix_trainer_fitness_center', 'fitness_center'),)
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True, nullable=False)
     name = Column(String(50), nullable=False)
     fitness_center = Column(Integer, ForeignKey('fitness_center.id'), nullable=False)
@@ -75,6 +83,8 @@ class TrainerCapacity(Base):
     """Table trainer_capacity."""
 
     __tablename__ = 'trainer_capacity'
+    __table_args__ = (Index('ix_trainer_capacity_trainer_service', 'trainer', 'service', 'max_attendees'),
+                      Index('ix_trainer_capacity_service_trainer', 'service', 'trainer'))
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True, nullable=False)
     service = Column(Integer, ForeignKey('service.id'), nullable=False)
     trainer = Column(Integer, ForeignKey('trainer.id'), nullable=False)
@@ -85,11 +95,29 @@ class TrainerSchedule(Base):
     """Table trainer_schedule."""
 
     __tablename__ = 'trainer_schedule'
+    __table_args__ = (Index('ix_trainer_schedule_trainer_date', 'trainer', 'date'),)
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True, nullable=False)
     trainer = Column(Integer, ForeignKey('trainer.id'), nullable=False)
-    date = Column(String(50), nullable=False)
-    start_time = Column(String(50), nullable=False)
-    end_time = Column(String(50), nullable=False)
+    date = Column(Date, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+
+
+class TrainerRating(Base):
+    """Table trainer_rating, aggregates of trainer ratings."""
+
+    __tablename__ = 'trainer_rating'
+    trainer = Column(Integer, ForeignKey('trainer.id'), primary_key=True)
+    points_count = Column(Integer, default=0, nullable=False)
+    points_sum = Column(Integer, default=0, nullable=False)
+    # histogram of points by 20 points buckets
+    hist_0 = Column(Integer, default=0, nullable=False)
+    hist_20 = Column(Integer, default=0, nullable=False)
+    hist_40 = Column(Integer, default=0, nullable=False)
+    hist_60 = Column(Integer, default=0, nullable=False)
+    hist_80 = Column(Integer, default=0, nullable=False)
+    # UTC time of the last aggregates change, Last-Modified of pages with ratings
+    updated = Column(DateTime)
 
 
 class User(Base):
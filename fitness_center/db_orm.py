@@ -1,27 +1,113 @@
 """Db init."""
 import os
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # DB_STRING = 'sqlite:///fc_db.sqlite'
 DB_STRING_TEMPLATE = 'postgresql+psycopg2://{0}:{1}@{2}:5432'
-DB_STRING = DB_STRING_TEMPLATE.format(os.environ.get('POSTGRES_USER'),
-                                      os.environ.get('POSTGRES_PASSWORD'),
-                                      os.environ.get('DB_HOST', 'localhost'))
+DB_STRING = os.environ.get('DB_STRING') or DB_STRING_TEMPLATE.format(os.environ.get('POSTGRES_USER'),
+                                                                     os.environ.get('POSTGRES_PASSWORD'),
+                                                                     os.environ.get('DB_HOST', 'localhost'))
+
+# connection pool settings, can be tuned per deployment via env
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 20))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds
+POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
 Base = declarative_base()
 
 
+class StatsQueuePool(QueuePool):
+    """Queue pool which counts checkouts that had to wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        """Init."""
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_time = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        """Get connection from pool, account wait if pool is exhausted."""
+        if self._max_overflow < 0 or self.checkedout() < self.size() + self._max_overflow:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+
+    def wait_stats(self):
+        """Consistent (waits, wait time) pair."""
+        with self._stats_lock:
+            return self.waits, self.wait_time
+
+    def recreate(self):
+        """Recreate pool, wait counters are kept in the new instance."""
+        pool = super().recreate()
+        pool.waits, pool.wait_time = self.wait_stats()
+        return pool
+
+
+def make_engine(db_string=DB_STRING, **kwargs):
+    """Create engine with configured connection pool, kwargs are passed to create_engine."""
+    if db_string.startswith('sqlite') and ':memory:' in db_string:
+        # in-memory sqlite lives inside single connection, pool sizing does not apply
+        return create_engine(db_string, **kwargs)
+    return create_engine(db_string, poolclass=StatsQueuePool, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                         pool_recycle=POOL_RECYCLE, pool_timeout=POOL_TIMEOUT, pool_pre_ping=POOL_PRE_PING, **kwargs)
+
+
+# process wide engine and thread/request scoped session registry
+engine = make_engine()
+session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+Base.query = session.query_property()
+
+
+def init_db():
+    """Create db schema if it does not exist, should be called once on startup (not per request)."""
+    Base.metadata.create_all(bind=engine)
+
+
+def remove_session(exc=None):
+    """Return request session connection back to pool."""
+    session.remove()
+
+
+def pool_stats():
+    """Connection pool statistics."""
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({'size': pool.size(), 'checked_in': pool.checkedin(), 'checked_out': pool.checkedout(),
+                      'overflow': pool.overflow(), 'max_overflow': pool._max_overflow})
+    if isinstance(pool, StatsQueuePool):
+        waits, wait_time = pool.wait_stats()
+        stats.update({'waits': waits, 'wait_time': round(wait_time, 6)})
+    return stats
+
+
+def dialect_insert(session, table):
+    """Insert construct of session db dialect, supports on_conflict_do_update (postgres and sqlite)."""
+    if session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
 class Db:
     """Db ORM class."""
 
     def __init__(self):
         """Init."""
-        self.engine = create_engine(DB_STRING)
-        self.session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
-        self._init_db()
-
-    def _init_db(self):
-        """Initialize db orm metadata."""
-        Base.query = self.session.query_property()
-        Base.metadata.create_all(bind=self.engine)
+        self.engine = engine
+        self.session = session
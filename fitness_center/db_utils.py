@@ -1,12 +1,44 @@
 """Module provides common db operations."""
+import os
 import sqlite3
+import threading
 
 SQLITE_DB_PATH = 'fc_db.sqlite'
+SQLITE_CACHED_STATEMENTS = 256  # prepared statements kept per connection
+SQLITE_PRAGMAS = (
+    'pragma journal_mode = wal',  # readers do not block writer and vice versa
+    'pragma synchronous = normal',  # wal is synced on checkpoint, not on every commit
+    'pragma busy_timeout = 5000',  # ms to wait for lock of other connection
+    'pragma cache_size = -16000',  # KiB of page cache
+    'pragma temp_store = memory',
+)
+
+_local = threading.local()
+
+
+def get_connection(db_path=SQLITE_DB_PATH):
+    """Persistent connection of current thread (and process) to db."""
+    connections = _local.__dict__.setdefault('connections', {})
+    pid, con = connections.get(db_path, (None, None))
+    if pid != os.getpid():
+        # connection inherited from parent process is not used
+        con = sqlite3.connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
+        for pragma in SQLITE_PRAGMAS:
+            con.execute(pragma)
+        connections[db_path] = (os.getpid(), con)
+    return con
+
+
+def close_connections():
+    """Close connections of current thread."""
+    for pid, con in _local.__dict__.pop('connections', {}).values():
+        if pid == os.getpid():
+            con.close()
 
 
 def exec_db_query(**kwargs):
     """Execute certain DB query."""
-    db = SqliteDb()
+    db = SqliteDb(kwargs.get('db_path', SQLITE_DB_PATH))
     if select_data := kwargs.get('select_data'):
         return db.select(select_data=select_data, join_data=kwargs.get('join_data'), single=kwargs.get('single', True),
                          where_data=kwargs.get('where_data'), join_type=kwargs.get('join_type', 'join'))
@@ -19,28 +51,45 @@ def exec_db_query(**kwargs):
 
 
 class SqliteDb:
-    """Sqlite3 db operations."""
+    """Sqlite3 db operations over persistent connection of current thread, values are bound as parameters."""
 
     def __init__(self, db_path=SQLITE_DB_PATH):
         """Init."""
-        con = sqlite3.connect(db_path)
-        con.row_factory = self.dict_factory
-        self.con = con
-        self.cur = con.cursor()
+        self.con = get_connection(db_path)
+        self.cur = self.con.cursor()
+        # factory does not refer to instance, so cursor is closed as soon as instance is released
+        self.cur.row_factory = self.dict_factory()
+
+    @staticmethod
+    def dict_factory():
+        """Row factory converting rows into dict, column names are taken once per executed query."""
+        cache = [None, ()]
+
+        def factory(cursor, row):
+            """Row as dict."""
+            if cursor.description is not cache[0]:
+                cache[0], cache[1] = cursor.description, tuple(col[0] for col in cursor.description)
+            return dict(zip(cache[1], row))
+
+        return factory
 
     @staticmethod
-    def dict_factory(cursor, row):
-        """Convert rows into dict."""
-        return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+    def where_clause(where_data):
+        """Where clause with placeholders -> (sql, params)."""
+        if where_data is None:
+            return '', ()
+        return f" where {' and '.join(f'{key} = ?' for key in where_data)}", tuple(where_data.values())
 
-    def exec_query(self, query, single=True, commit=False):
+    def exec_query(self, query, params=(), single=True, commit=False):
         """Execute DB query."""
         try:
-            self.cur.execute(query)
+            self.cur.execute(query, params)
             if commit:
                 self.con.commit()
             return self.cur.fetchone() if single else self.cur.fetchall()
         except Exception:
+            if self.con.in_transaction:
+                self.con.rollback()
             return {} if single else []
 
     def select(self, select_data, join_data=None, where_data=None, single=True, join_type='join'):
@@ -50,36 +99,30 @@ class SqliteDb:
         if join_data is not None:
             join_str = ' '.join([f'{join_type} {k} on {v}' for k, v in join_data.items()])
             select_str += f' {join_str}'
-        if where_data is not None:
-            select_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
-        return self.exec_query(query=select_str, single=single)
+        where_str, params = self.where_clause(where_data)
+        return self.exec_query(query=select_str + where_str, params=params, single=single)
 
     def insert(self, insert_data):
         """Create and execute insert query according provided insert data."""
-        insert_fields = ', '.join(list(insert_data.values())[0].keys())
-        values_str = ', '.join([f'"{itm}"' for itm in list(insert_data.values())[0].values()])
-        insert_str = f'insert into {list(insert_data.keys())[0]} ({insert_fields}) values ({values_str})'
-        return self.exec_query(query=insert_str, commit=True)
+        table, values = list(insert_data.items())[0]
+        insert_str = f"insert into {table} ({', '.join(values)}) values ({', '.join('?' * len(values))})"
+        return self.exec_query(query=insert_str, params=tuple(values.values()), commit=True)
 
     def update(self, update_data, where_data=None):
         """Create and execute update query according provided update data."""
-        update_str = f'update {list(update_data.keys())[0]} set '
-        set_pairs = ', '.join([f'{column}="{value}"' for column, value in list(update_data.values())[0].items()])
-        update_str += set_pairs
-        if where_data is not None:
-            update_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
-        return self.exec_query(query=update_str, commit=True)
+        table, values = list(update_data.items())[0]
+        where_str, params = self.where_clause(where_data)
+        update_str = f"update {table} set {', '.join(f'{column} = ?' for column in values)}{where_str}"
+        return self.exec_query(query=update_str, params=tuple(values.values()) + params, commit=True)
 
     def delete(self, delete_data, where_data=None):
         """Create and execute delete query according provided delete data."""
-        delete_str = f'delete from {delete_data}'
-        if where_data is not None:
-            delete_str += f""" where {' and '.join([f'{key}="{val}"' for key, val in where_data.items()])}"""
-        return self.exec_query(query=delete_str, commit=True)
+        where_str, params = self.where_clause(where_data)
+        return self.exec_query(query=f'delete from {delete_data}{where_str}', params=params, commit=True)
 
     def close(self):
-        """Close db."""
-        self.con.close()
+        """Close cursor (connection stays open for next queries of thread)."""
+        self.cur.close()
 
     def __del__(self):
         """Teardown."""
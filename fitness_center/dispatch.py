@@ -0,0 +1,238 @@
+"""Background publishing of celery tasks after db transaction commit.
+
+Requests only put tasks into a bounded in-memory buffer. A publisher thread sends them to the broker in batches
+over one connection and retries with backoff. Tasks which can not be published (broker is unreachable, buffer is
+full, process exits) are spooled to local disk and published again once the broker is reachable.
+Spool file is claimed for replay by rename and removed after its tasks are published or spooled again, files claimed
+by exited process are claimed again, so spooled tasks are published at least once.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from glob import glob
+
+from kombu.exceptions import OperationalError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import utils
+
+DISPATCH_BUFFER_SIZE = int(os.environ.get('DISPATCH_BUFFER_SIZE', 10000))  # tasks
+DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', 100))  # tasks per broker connection checkout
+DISPATCH_RETRIES = int(os.environ.get('DISPATCH_RETRIES', 3))
+DISPATCH_RETRY_DELAY = float(os.environ.get('DISPATCH_RETRY_DELAY', 0.5))  # seconds, doubled on every retry
+DISPATCH_REPLAY_INTERVAL = float(os.environ.get('DISPATCH_REPLAY_INTERVAL', 30))  # seconds
+DISPATCH_SPOOL_DIR = os.environ.get('DISPATCH_SPOOL_DIR', '/tmp/fc_dispatch')
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher:
+    """Bounded buffer of (task name, args, kwargs) with background publisher and disk spool."""
+
+    def __init__(self, app, buffer_size=DISPATCH_BUFFER_SIZE, batch_size=DISPATCH_BATCH_SIZE,
+                 retries=DISPATCH_RETRIES, retry_delay=DISPATCH_RETRY_DELAY, replay_interval=DISPATCH_REPLAY_INTERVAL,
+                 spool_dir=DISPATCH_SPOOL_DIR):
+        """Init."""
+        self.app = app
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.replay_interval = replay_interval
+        self.spool_dir = spool_dir
+        self.published = 0
+        self.spooled = 0
+        self.errors = 0
+        self._buffer = queue.Queue(buffer_size)
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, name, args=(), kwargs=None):
+        """Queue task for publishing, never blocks (task is spooled if buffer is full)."""
+        item = (name, list(args), kwargs or {})
+        if self.app.conf.task_always_eager:
+            self.app.tasks[name].apply_async(item[1], item[2])
+            return
+        self._start()
+        try:
+            self._buffer.put_nowait(item)
+        except queue.Full:
+            self._spool([item])
+
+    def _start(self):
+        """Start publisher thread (again in forked process)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='dispatch', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        """Publisher loop, spool files (of exited processes too) are replayed at start and periodically."""
+        next_replay = time.monotonic()
+        while True:
+            if time.monotonic() >= next_replay:
+                self.replay()
+                next_replay = time.monotonic() + self.replay_interval
+            try:
+                items = [self._buffer.get(timeout=self.replay_interval)]
+            except queue.Empty:
+                items = []
+            while items and len(items) < self.batch_size:
+                try:
+                    items.append(self._buffer.get_nowait())
+                except queue.Empty:
+                    break
+            if items:
+                self._publish(items)
+                for _ in items:
+                    self._buffer.task_done()
+
+    def _publish(self, items):
+        """Publish tasks over one broker connection with retries -> whether all were published.
+
+        Not published tasks are spooled, while broker is down tasks are spooled without publishing attempt.
+        """
+        if time.monotonic() < self._down_until:
+            self._spool(items)
+            return False
+        done = 0
+        for attempt in range(self.retries + 1):
+            try:
+                with self.app.producer_or_acquire() as producer:
+                    while done < len(items):
+                        name, args, kwargs = items[done]
+                        self.app.tasks[name].apply_async(args, kwargs, producer=producer, retry=False)
+                        done += 1
+                        with self._lock:
+                            self.published += 1
+                return True
+            except (OperationalError, OSError) as exc:
+                with self._lock:
+                    self.errors += 1
+                logger.warning(f'Task publishing failed (attempt {attempt + 1}): {exc}')
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        # broker is considered down until the next replay
+        self._down_until = time.monotonic() + self.replay_interval
+        self._spool(items[done:])
+        return False
+
+    def _spool(self, items):
+        """Write tasks to new spool file."""
+        if not items:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f'spool-{os.getpid()}-{uuid.uuid4().hex}.jsonl')
+        # written under temporary name, complete file appears atomically
+        with open(f'{path}.tmp', 'w') as f:
+            f.writelines(json.dumps(item) + '\n' for item in items)
+        os.rename(f'{path}.tmp', path)
+        with self._lock:
+            self.spooled += len(items)
+        logger.warning(f'{len(items)} tasks spooled to {path}')
+
+    @staticmethod
+    def _owner_alive(path):
+        """Whether process which claimed replay file (spool-*.jsonl.<pid>.replay) is running."""
+        try:
+            os.kill(int(path.rsplit('.', 2)[-2]), 0)
+        except (ProcessLookupError, ValueError):
+            return False
+        except PermissionError:
+            # process of other user
+            pass
+        return True
+
+    def _claim(self, path):
+        """Claim spool file (or replay file of exited process) for replay -> claimed path or None."""
+        claimed = f'{path.split(".jsonl", 1)[0]}.jsonl.{os.getpid()}.replay'
+        try:
+            # rename is atomic, file is replayed by single process
+            os.rename(path, claimed)
+        except OSError:
+            return None
+        return claimed
+
+    def replay(self):
+        """Publish spooled tasks of all processes -> number of published tasks."""
+        self._down_until = 0.0
+        published = 0
+        paths = glob(os.path.join(self.spool_dir, 'spool-*.jsonl'))
+        paths.extend(el for el in glob(os.path.join(self.spool_dir, 'spool-*.jsonl.*.replay'))
+                     if not self._owner_alive(el))
+        for path in sorted(paths):
+            if (claimed := self._claim(path)) is None:
+                continue
+            with open(claimed) as f:
+                items = [tuple(json.loads(line)) for line in f if line.strip()]
+            for idx in range(0, len(items), self.batch_size):
+                if not self._publish(items[idx:idx + self.batch_size]):
+                    # not published tasks of batch are spooled already, the rest of file is spooled with them
+                    self._spool(items[idx + self.batch_size:])
+                    os.remove(claimed)
+                    return published
+                published += len(items[idx:idx + self.batch_size])
+            os.remove(claimed)
+        return published
+
+    def flush(self, timeout=None):
+        """Wait until buffered tasks are published or spooled -> whether buffer was drained in time."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._buffer.all_tasks_done:
+            while self._buffer.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._buffer.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """Spool tasks left in buffer (process exit)."""
+        items = []
+        while True:
+            try:
+                items.append(self._buffer.get_nowait())
+                self._buffer.task_done()
+            except queue.Empty:
+                break
+        self._spool(items)
+
+    def stats(self):
+        """Dispatcher statistics."""
+        with self._lock:
+            return {'buffered': self._buffer.qsize(), 'published': self.published, 'spooled': self.spooled,
+                    'errors': self.errors}
+
+
+# process wide dispatcher, publisher thread is started on first task
+dispatcher = Dispatcher(utils.app)
+atexit.register(dispatcher.close)
+
+
+def delay_on_commit(db_session, task, *args, **kwargs):
+    """Publish task in background after db session transaction commits, task is dropped on rollback."""
+    db_session.info.setdefault('dispatch_tasks', []).append((task.name, args, kwargs))
+
+
+@event.listens_for(Session, 'after_commit')
+def after_commit(db_session):
+    """Queue tasks of committed transaction."""
+    for name, args, kwargs in db_session.info.pop('dispatch_tasks', ()):
+        dispatcher.submit(name, args, kwargs)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def after_transaction_end(db_session, transaction):
+    """Drop tasks of rolled back transaction (tasks of committed one were queued already)."""
+    if transaction.parent is None:
+        db_session.info.pop('dispatch_tasks', None)
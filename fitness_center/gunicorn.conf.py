@@ -0,0 +1,55 @@
+"""Gunicorn settings: pre-forked workers with threads, app and reference data preloaded in master.
+
+Workers start with reference data snapshot of master, every worker reloads it after REFDATA_TTL and keeps own copy
+when data was changed (bench/bench_refdata_rss.py: +13 MiB per worker after reload of unchanged and +34 MiB after
+reload of changed snapshot of 20000 trainers), kill -HUP forks workers with actual snapshot of master again.
+Memory caches are per worker, so with more than one worker CACHE_BACKEND and PAGE_CACHE_BACKEND have to be disk
+(invalidation of free slots by one worker is seen by all).
+Settings are taken from env: WEB_BIND, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT, WEB_MAX_REQUESTS.
+Reload without downtime:
+    kill -HUP <master pid> - reference data is reloaded in master, workers are replaced one by one gracefully
+    kill -USR2 <master pid>, then kill -TERM <old master pid> - new master with new code is started
+        next to the old one, old master finishes requests in progress and exits
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# workers are restarted after max requests to limit memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+pidfile = os.environ.get('WEB_PIDFILE')
+accesslog = '-'
+
+
+def when_ready(server):
+    """Freeze preloaded objects, so gc of workers does not touch (and copy) memory pages of app modules."""
+    gc.freeze()
+    cache_backend = os.environ.get('CACHE_BACKEND', 'memory')
+    if workers > 1 and 'memory' in (cache_backend, os.environ.get('PAGE_CACHE_BACKEND') or cache_backend):
+        server.log.warning('Memory caches are not shared by workers, set CACHE_BACKEND and PAGE_CACHE_BACKEND to disk')
+
+
+def on_reload(server):
+    """Reload reference data in master before new workers are forked."""
+    import db_orm
+    import refdata
+
+    refdata.refresh(db_orm.session)
+    db_orm.remove_session()
+    db_orm.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Drop db connections inherited from master, worker opens its own pool connections."""
+    import db_orm
+
+    db_orm.engine.dispose(close=False)
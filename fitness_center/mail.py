@@ -0,0 +1,225 @@
+"""Email delivery over pooled persistent SMTP sessions.
+
+Sessions are opened lazily per process (per celery worker) and kept open between messages. A session is
+reopened after an error, after SMTP_IDLE_TIMEOUT without a successful NOOP, or after SMTP_MAX_MESSAGES messages.
+"""
+import atexit
+import os
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))  # seconds
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))  # sessions per process
+SMTP_MAX_MESSAGES = int(os.environ.get('SMTP_MAX_MESSAGES', 100))  # per session, servers limit session length
+SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', 60))  # seconds
+SMTP_SENDER = os.environ.get('smtp_sender')
+SMTP_PASSWORD = os.environ.get('smtp_password')
+
+MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 100))  # messages per bulk task
+MAIL_CONCURRENCY = int(os.environ.get('MAIL_CONCURRENCY', 4))  # sessions used by one bulk task
+
+# message is rejected by server, session stays usable
+REJECTED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def make_message(receiver_email, subject, text, sender_email=SMTP_SENDER):
+    """Email message."""
+    message = EmailMessage()
+    message.set_content(text)
+    message['Subject'] = subject
+    message['From'] = sender_email
+    message['To'] = receiver_email
+    return message
+
+
+def is_temporary(exc):
+    """Whether delivery failure can be retried later (4xx response, connection error)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return any(code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code < 500
+    return True
+
+
+class SmtpSession:
+    """Open SMTP client with usage accounting."""
+
+    __slots__ = ('client', 'sent', 'last_used')
+
+    def __init__(self, client):
+        """Init."""
+        self.client = client
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SmtpPool:
+    """Thread safe pool of persistent SMTP sessions."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_SENDER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, size=SMTP_POOL_SIZE, max_messages=SMTP_MAX_MESSAGES,
+                 idle_timeout=SMTP_IDLE_TIMEOUT, timeout=SMTP_TIMEOUT):
+        """Init."""
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connects = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.failed = 0
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        """Open new session: EHLO, STARTTLS, LOGIN."""
+        client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            client.ehlo()
+            if self.starttls:
+                client.starttls(context=ssl.create_default_context())
+                client.ehlo()
+            if self.user and self.password:
+                client.login(self.user, self.password)
+        except BaseException:
+            client.close()
+            raise
+        with self._lock:
+            self.connects += 1
+        return SmtpSession(client)
+
+    @staticmethod
+    def _close(session):
+        """Close session, errors of already broken connection are ignored."""
+        try:
+            session.client.quit()
+        except (smtplib.SMTPException, OSError):
+            session.client.close()
+
+    def _usable(self, session):
+        """Whether idle session can be reused."""
+        if session.sent >= self.max_messages:
+            return False
+        if time.monotonic() - session.last_used < self.idle_timeout:
+            return True
+        try:
+            return session.client.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _acquire(self):
+        """Take idle session (or None if new one should be opened), blocks if all sessions are busy."""
+        if self._pid != os.getpid():
+            # forked process, sockets of parent are not shared
+            with self._lock:
+                self._idle, self._pid = [], os.getpid()
+        self._slots.acquire()
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is not None and not self._usable(session):
+            self._close(session)
+            session = None
+        return session
+
+    def _release(self, session):
+        """Return session to pool."""
+        if session is not None:
+            session.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(session)
+        self._slots.release()
+
+    def _send(self, session, message):
+        """Send message in session."""
+        session.client.send_message(message)
+        session.sent += 1
+        with self._lock:
+            self.sent += 1
+
+    def _deliver(self, session, message):
+        """Send message -> (session, rejection error or None).
+
+        Broken session (closed by server on timeout or messages limit, network error) is reopened and the message
+        is resent once, error is raised if server is unreachable.
+        """
+        if session is not None and session.sent >= self.max_messages:
+            self._close(session)
+            session = None
+        for attempt in range(2):
+            if session is None:
+                session = self._connect()
+            try:
+                self._send(session, message)
+                return session, None
+            except REJECTED as exc:
+                # session is still usable
+                return session, exc
+            except (smtplib.SMTPException, OSError):
+                self._close(session)
+                session = None
+                if attempt:
+                    raise
+                with self._lock:
+                    self.reconnects += 1
+
+    def send_messages(self, messages):
+        """Send messages over one session -> list of (message, error) which were not sent."""
+        failed = []
+        session = self._acquire()
+        try:
+            for idx, message in enumerate(messages):
+                try:
+                    session, error = self._deliver(session, message)
+                except (smtplib.SMTPException, OSError) as exc:
+                    # server is unreachable, the rest is not sent
+                    session = None
+                    failed.extend((el, exc) for el in messages[idx:])
+                    break
+                if error is not None:
+                    failed.append((message, error))
+        finally:
+            self._release(session)
+        with self._lock:
+            self.failed += len(failed)
+        return failed
+
+    def send_bulk(self, messages, concurrency=MAIL_CONCURRENCY):
+        """Send messages over up to concurrency sessions in parallel -> list of (message, error) not sent."""
+        messages = list(messages)
+        concurrency = max(1, min(concurrency, self.size, len(messages)))
+        if concurrency == 1:
+            return self.send_messages(messages)
+        chunks = [messages[idx::concurrency] for idx in range(concurrency)]
+        with ThreadPoolExecutor(concurrency) as executor:
+            return [el for failed in executor.map(self.send_messages, chunks) for el in failed]
+
+    def close(self):
+        """Close idle sessions."""
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._close(session)
+
+    def stats(self):
+        """Pool statistics."""
+        return {'size': self.size, 'idle': len(self._idle), 'connects': self.connects,
+                'reconnects': self.reconnects, 'sent': self.sent, 'failed': self.failed}
+
+
+# process wide pool, sessions are opened on first send
+pool = SmtpPool()
+atexit.register(pool.close)
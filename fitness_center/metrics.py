@@ -0,0 +1,220 @@
+"""Request metrics: latency histograms, SQL statements count and time, slow queries and N+1 detection.
+
+Metrics are kept per process (per gunicorn worker) and exposed in Prometheus text format on /metrics.
+Requests with ?profile=1 are profiled with cProfile and dumped to PROFILE_DIR if it is set.
+"""
+import contextvars
+import cProfile
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))  # executions of the same statement
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class Metric:
+    """Prometheus metric with values per labels."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, doc, label_names):
+        """Init."""
+        self.name = name
+        self.doc = doc
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels, extra=()):
+        """Labels in Prometheus format."""
+        pairs = list(zip(self.label_names, labels)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{str(value)}"' for key, value in pairs) + '}'
+
+    def expose(self):
+        """Metric lines in Prometheus text format."""
+        return [f'# HELP {self.name} {self.doc}', f'# TYPE {self.name} {self.kind}']
+
+
+class CounterMetric(Metric):
+    """Monotonic counter."""
+
+    kind = 'counter'
+
+    def inc(self, labels, value=1):
+        """Increase counter."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def expose(self):
+        """Metric lines in Prometheus text format."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return super().expose() + [f'{self.name}{self._labels(labels)} {value}' for labels, value in values]
+
+
+class Histogram(Metric):
+    """Histogram with cumulative buckets, sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, doc, label_names, buckets):
+        """Init."""
+        super().__init__(name, doc, label_names)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        """Add observation."""
+        with self._lock:
+            # per bucket counts (the last one is +Inf), sum
+            data = self._values.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            data[bisect_left(self.buckets, value)] += 1
+            data[-1] += value
+
+    def expose(self):
+        """Metric lines in Prometheus text format."""
+        with self._lock:
+            values = sorted((labels, list(data)) for labels, data in self._values.items())
+        lines = super().expose()
+        for labels, data in values:
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), data[:-1]):
+                total += count
+                lines.append(f'{self.name}_bucket{self._labels(labels, [("le", bound)])} {total}')
+            lines.append(f'{self.name}_sum{self._labels(labels)} {round(data[-1], 6)}')
+            lines.append(f'{self.name}_count{self._labels(labels)} {total}')
+        return lines
+
+
+REQUESTS = CounterMetric('fc_http_requests_total', 'Requests by endpoint, method and status.',
+                         ('endpoint', 'method', 'status'))
+LATENCY = Histogram('fc_http_request_duration_seconds', 'Request duration.', ('endpoint',), LATENCY_BUCKETS)
+SQL_COUNT = Histogram('fc_request_sql_statements', 'SQL statements per request.', ('endpoint',), SQL_COUNT_BUCKETS)
+SQL_TIME = Histogram('fc_request_sql_duration_seconds', 'SQL time per request.', ('endpoint',), LATENCY_BUCKETS)
+SLOW_QUERIES = CounterMetric('fc_sql_slow_queries_total', f'SQL statements slower than {SLOW_QUERY_MS} ms.',
+                             ('endpoint',))
+N_PLUS_ONE = CounterMetric('fc_sql_n_plus_one_total',
+                           f'Requests with the same statement executed {N_PLUS_ONE_THRESHOLD}+ times.', ('endpoint',))
+METRICS = (REQUESTS, LATENCY, SQL_COUNT, SQL_TIME, SLOW_QUERIES, N_PLUS_ONE)
+
+
+class RequestSql:
+    """SQL statistics of current request."""
+
+    __slots__ = ('endpoint', 'count', 'time', 'statements')
+
+    def __init__(self, endpoint):
+        """Init."""
+        self.endpoint = endpoint
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+
+_request_sql = contextvars.ContextVar('request_sql', default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Remember statement start time."""
+    context.metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Account statement of current request."""
+    if (stats := _request_sql.get()) is None:
+        # statements outside of requests (startup, scripts)
+        return
+    elapsed = time.perf_counter() - context.metrics_start
+    stats.count += 1
+    stats.time += elapsed
+    stats.statements[statement] += 1
+    if elapsed * 1000 > SLOW_QUERY_MS:
+        SLOW_QUERIES.inc((stats.endpoint,))
+        logger.warning(f'Slow query {elapsed * 1000:.1f} ms in {stats.endpoint}: {statement[:500]}')
+
+
+def start_request():
+    """Start request timer, SQL accounting and optional profiler."""
+    g.metrics_start = time.perf_counter()
+    _request_sql.set(RequestSql(request.endpoint or 'unknown'))
+    if PROFILE_DIR and request.args.get('profile'):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+        except ValueError:
+            # another profiler is active in this process
+            pass
+
+
+def add_timing_headers(response):
+    """Add Server-Timing header with SQL statistics and keep status for metrics."""
+    g.metrics_status = response.status_code
+    if (stats := _request_sql.get()) is not None:
+        response.headers['Server-Timing'] = f'sql;dur={stats.time * 1000:.2f};desc="{stats.count} queries"'
+    return response
+
+
+def finish_request(exc=None):
+    """Record request metrics, called after response is sent (streamed responses included)."""
+    if 'metrics_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.pop('metrics_start')
+    stats = _request_sql.get()
+    _request_sql.set(None)
+    endpoint = stats.endpoint
+    REQUESTS.inc((endpoint, request.method, g.pop('metrics_status', 500)))
+    LATENCY.observe((endpoint,), elapsed)
+    SQL_COUNT.observe((endpoint,), stats.count)
+    SQL_TIME.observe((endpoint,), stats.time)
+    repeated = {key: value for key, value in stats.statements.items() if value >= N_PLUS_ONE_THRESHOLD}
+    if repeated:
+        N_PLUS_ONE.inc((endpoint,))
+        statement, count = max(repeated.items(), key=lambda el: el[1])
+        logger.warning(f'Possible N+1 in {endpoint}: statement executed {count} times: {statement[:500]}')
+    if (profiler := g.pop('profiler', None)) is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f'{endpoint}-{time.time_ns()}.prof'))
+
+
+def expose(gauges=None):
+    """All metrics in Prometheus text format, gauges - extra {name: value}."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    for name, value in (gauges or {}).items():
+        lines.extend([f'# TYPE {name} gauge', f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app, engine, gauges=None):
+    """Instrument Flask app and SQLAlchemy engine, add /metrics endpoint.
+
+    gauges - function returning extra {name: value} gauges for /metrics.
+    """
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(start_request)
+    app.after_request(add_timing_headers)
+    app.teardown_request(finish_request)
+
+    def metrics_view():
+        """Metrics in Prometheus text format."""
+        return Response(expose(gauges() if gauges else None), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,253 @@
+"""Framework independent parts of application pages shared by sync (app.py) and async (app_async.py) apps.
+
+Request parameters validation, page data, page versions (ETag, Last-Modified) and application caches,
+apps only run queries (queries.py) and build responses.
+"""
+import datetime as dt
+import os
+
+import availability
+import cache
+import db_model
+import queries
+import refdata
+
+delta = availability.DELTA  # 15 min delta to divide schedule according services duration into slots
+max_availability_days = 31  # max date range for availability search
+reservations_page_size = 50  # default and max page size of reservations list
+max_reservations_page_size = 200
+stream_batch_size = 100  # rows fetched from db at once for streamed pages
+registration_subject = 'Registration completed successfully!'
+registration_text = '\nSuccessful registration in our fitness center.'
+
+# trainer day free slots cache: (trainer_id, date) -> {service_id: free slots}
+availability_cache = cache.make_cache('availability', max_size=int(os.environ.get('AVAILABILITY_CACHE_SIZE', 10000)),
+                                      ttl=int(os.environ.get('AVAILABILITY_CACHE_TTL', 300)))
+
+# rendered catalog pages for anonymous users: (path, query string, data version) -> page
+page_cache = cache.PageCache(cache.make_cache('pages', max_size=int(os.environ.get('PAGE_CACHE_SIZE', 1000)),
+                                              ttl=int(os.environ.get('PAGE_CACHE_TTL', 600)),
+                                              backend=os.environ.get('PAGE_CACHE_BACKEND')))
+
+
+def page_key(path, query_string, etag):
+    """Page cache key of page version."""
+    return path, query_string, etag
+
+
+def not_modified(if_none_match, if_modified_since, etag, last_modified):
+    """Check that client has actual page version (If-None-Match has priority over If-Modified-Since)."""
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def set_version_headers(response, etag, last_modified):
+    """Set ETag, Last-Modified and revalidation headers."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # clients and proxies may store page but have to revalidate it
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def trainers_version(ref, rating):
+    """ETag of pages with trainers ratings, ratings are changed often and are part of page version."""
+    return refdata.make_etag(ref.etag, sorted(rating.items()))
+
+
+def trainers_modified(ref, rating):
+    """Last-Modified of pages with trainers ratings, the latest of reference data and ratings changes."""
+    updated = [el[2] for el in rating.values() if el[2] is not None]
+    if not updated:
+        return ref.modified
+    return max(ref.modified, max(updated).replace(tzinfo=dt.timezone.utc, microsecond=0))
+
+
+def rating_map(rows):
+    """Trainer ratings rows -> {trainer_id: (count, avg, updated)}."""
+    return {el[0]: (el[1], el[2], el[3]) for el in rows}
+
+
+def fitness_centers_data(ref):
+    """Fitness centers list page data."""
+    return [el._asdict() for el in ref.fitness_centers.values()]
+
+
+def fitness_center_data(ref, fc_id):
+    """Fitness center page data."""
+    fc = ref.fitness_centers.get(fc_id)
+    return fc._asdict() if fc else {}
+
+
+def fc_trainer(ref, fc_id, trainer_id):
+    """Trainer of fitness center or None."""
+    if (trainer := ref.trainers.get(trainer_id)) and trainer.fitness_center == fc_id:
+        return trainer
+    return None
+
+
+def trainers_data(ref, fc_id, rating):
+    """Trainers list page data."""
+    data = []
+    for trainer_id in ref.trainers_by_fc.get(fc_id, ()):
+        trainer = ref.trainers[trainer_id]
+        count, avg, _ = rating.get(trainer_id, (None, None, None))
+        data.append({'trainer.id': trainer.id, 'fitness_center.name': ref.fitness_centers[fc_id].name,
+                     'trainer.name': trainer.name, 'trainer.age': trainer.age, 'trainer.sex': trainer.sex,
+                     'rating.count': count, 'rating.avg': avg})
+    return data
+
+
+def trainer_data(ref, fc_id, trainer, rating):
+    """Trainer page data and services for reservation -> (data, service data)."""
+    if trainer is None:
+        return {}, []
+    count, avg, _ = rating.get(trainer.id, (None, None, None))
+    data = {'fitness_center.name': ref.fitness_centers[fc_id].name, 'trainer.name': trainer.name,
+            'trainer.age': trainer.age, 'trainer.sex': trainer.sex, 'rating.count': count, 'rating.avg': avg}
+    # service selection for reservation
+    service_data = [{'service.id': el, 'service.name': ref.services[el].name}
+                    for el in ref.trainer_services.get(trainer.id, ())]
+    return data, service_data
+
+
+def services_data(ref, fc_id):
+    """Services list page data."""
+    data = []
+    for service_id in ref.services_by_fc.get(fc_id, ()):
+        service = ref.services[service_id]
+        data.append({'service.id': service.id, 'service.name': service.name,
+                     'description': service.description, 'duration': service.duration, 'price': service.price,
+                     'fitness_center.name': ref.fitness_centers[fc_id].name})
+    return data
+
+
+def service_data(ref, fc_id, service_id):
+    """Service page data and trainers for reservation -> (data, trainer data)."""
+    if not ((service := ref.services.get(service_id)) and service.fitness_center == fc_id):
+        return {}, []
+    data = {'service.name': service.name, 'description': service.description, 'duration': service.duration,
+            'price': service.price, 'fitness_center.name': ref.fitness_centers[fc_id].name}
+    # trainer selection for reservation
+    trainer_data = [{'trainer.id': el, 'trainer.name': ref.trainers[el].name}
+                    for el in ref.service_trainers.get(service_id, ()) if ref.trainers[el].fitness_center == fc_id]
+    return data, trainer_data
+
+
+def rating_defaults(fc_id, trainer_id, current=None):
+    """Rating form values, current user rating (points, text) if it exists."""
+    points, text = current or (100, '')
+    return {'points': points, 'text': text, 'fc_id': fc_id, 'trainer_id': trainer_id}
+
+
+def login_user_id(user, password):
+    """Id of user if password matches, unknown login (user is None) gives None."""
+    if user is not None and user.password == password:
+        return user.id
+    return None
+
+
+def new_user(form_dict):
+    """User of registration form."""
+    return db_model.User(name=form_dict['name'], login=form_dict['login'], password=form_dict['password'],
+                         birth_date=form_dict['birth_date'], phone=form_dict['phone'], email=form_dict['email'])
+
+
+def reservations_params(args):
+    """Reservations list parameters -> (when, limit, page), page['next'] is set when next page exists."""
+    when = args.get('when', 'all')
+    if when not in ('all', 'upcoming', 'past'):
+        when = 'all'
+    limit = min(max(args.get('limit', reservations_page_size, type=int), 1), max_reservations_page_size)
+    return when, limit, {'url': f'/user/reservations?when={when}&limit={limit}&after=', 'next': None}
+
+
+def split_page(rows, limit):
+    """Rows fetched with one extra row -> (page rows, next page cursor or None)."""
+    next_cursor = queries.encode_reservation_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def paginate_reservations(rows, limit, page):
+    """Yield first limit rows, page['next'] is set to cursor of the last yielded row if there are more rows."""
+    last = None
+    for idx, row in enumerate(rows):
+        if idx == limit:
+            page['next'] = queries.encode_reservation_cursor(last)
+            return
+        last = row
+        yield row
+
+
+def reservations_json(rows, page):
+    """JSON data of reservations page."""
+    result = [{'id': el.id, 'date': el.date.isoformat(), 'time': el.time.strftime('%H-%M'),
+               'trainer': el._mapping['trainer.name'], 'service': el._mapping['service.name']} for el in rows]
+    return {'result': result, 'next': page['next'] and f'{page["url"]}{page["next"]}&format=json'}
+
+
+def availability_dates(args):
+    """Dates of availability search (date_from, date_to query args, one week by default), errors raise ValueError."""
+    if 'date_from' not in args:
+        raise ValueError('date_from is required')
+    try:
+        date_from = dt.date.fromisoformat(args['date_from'])
+        date_to = dt.date.fromisoformat(args.get('date_to', str(date_from + dt.timedelta(days=6))))
+    except ValueError as exc:
+        raise ValueError(f'Wrong date range: {exc}') from exc
+    days = (date_to - date_from).days + 1
+    if not 0 < days <= max_availability_days:
+        raise ValueError(f'Date range should be from 1 to {max_availability_days} days')
+    return [date_from + dt.timedelta(days=idx) for idx in range(days)]
+
+
+def cached_free_slots(trainer_id, date, service_id):
+    """Cached trainer day free slots for service or None."""
+    return availability_cache.get((trainer_id, date), {}).get(service_id)
+
+
+def free_slots_generation(trainer_id=None, date=None):
+    """Invalidation generation of trainer day (of all trainer days if trainer is None), taken before inputs query."""
+    return availability_cache.generation(None if trainer_id is None else (trainer_id, date))
+
+
+def cache_free_slots(trainer_id, date, service_id, free_slots, generation=None):
+    """Store trainer day free slots for certain service into cache unless day was invalidated after generation."""
+    key = (trainer_id, date)
+    availability_cache.set(key, {**availability_cache.peek(key, {}), service_id: free_slots}, generation=generation)
+
+
+def invalidate_free_slots(trainer_id, date):
+    """Drop cached free slots of trainer day for all services, should be called when reservations are changed."""
+    availability_cache.delete((int(trainer_id), date))
+
+
+def trainer_free_slots(rows, trainer_id, date, service_id, generation=None):
+    """Free slots of trainer day from availability.inputs_query rows, result is cached.
+
+    generation - free_slots_generation() taken before inputs query, so slots of changed reservations are not cached.
+    """
+    duration, schedules, reservations, capacities = availability.collect_inputs(rows, service_id)
+    free_slots = []
+    if schedules:
+        slots = availability.free_slots_bulk(schedules, reservations, capacities, service_id, duration, delta=delta)
+        free_slots = [availability.from_minutes(el) for el in slots[(trainer_id, date)]]
+    cache_free_slots(trainer_id, date, service_id, free_slots, generation)
+    return free_slots
+
+
+def service_free_slots(rows, service_id, generation=None):
+    """Free slots of all service trainers from availability.inputs_query rows -> {trainer: {date: [slots]}}.
+
+    generation - free_slots_generation() of all trainer days taken before inputs query.
+    """
+    duration, schedules, reservations, capacities = availability.collect_inputs(rows, service_id)
+    slots = availability.free_slots_bulk(schedules, reservations, capacities, service_id, duration, delta=delta)
+    result = {}
+    for (trainer_id, date), trainer_slots in sorted(slots.items()):
+        free_slots = [availability.from_minutes(el) for el in trainer_slots]
+        result.setdefault(trainer_id, {})[date.isoformat()] = free_slots
+        cache_free_slots(trainer_id, date, service_id, free_slots, generation)
+    return result
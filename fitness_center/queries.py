@@ -0,0 +1,128 @@
+"""Queries of application pages, the same statements are executed by sync (app.py) and async (app_async.py) apps."""
+import datetime as dt
+
+from sqlalchemy import delete, func, select, tuple_, update
+
+import db_model
+
+rating_avg = func.round(db_model.TrainerRating.points_sum * 1.0 / db_model.TrainerRating.points_count, 2)
+reservation_columns = (db_model.Reservation.id, db_model.Reservation.date, db_model.Reservation.time,
+                       db_model.Trainer.name.label('trainer.name'),
+                       db_model.Service.name.label('service.name'),
+                       db_model.User.name.label('user.name'))
+
+
+def encode_reservation_cursor(row):
+    """Keyset pagination cursor of reservation row -> 'date_time_id'."""
+    return f'{row.date.isoformat()}_{row.time.isoformat()}_{row.id}'
+
+
+def decode_reservation_cursor(cursor):
+    """Keyset pagination cursor -> (date, time, id), wrong cursor raises ValueError."""
+    date_str, time_str, id_str = cursor.split('_')
+    return dt.date.fromisoformat(date_str), dt.time.fromisoformat(time_str), int(id_str)
+
+
+def user_by_login(login):
+    """User with login."""
+    return select(db_model.User).where(db_model.User.login == login)
+
+
+def user_profile(user_id):
+    """User data shown on user page."""
+    return select(db_model.User.name, db_model.User.login, db_model.User.birth_date, db_model.User.phone,
+                  db_model.User.email).where(db_model.User.id == user_id)
+
+
+def update_user(user_id, form_dict):
+    """Update user data from user page form."""
+    return update(db_model.User).where(db_model.User.id == user_id).values(
+        {key: form_dict.get(key) for key in ('name', 'login', 'birth_date', 'phone', 'email')})
+
+
+def user_funds(user_id):
+    """User funds."""
+    return select(db_model.User.id, db_model.User.name, db_model.User.funds).where(db_model.User.id == user_id)
+
+
+def user_reservation(user_id, reservation_id):
+    """Certain reservation of user."""
+    return (select(*reservation_columns).join(db_model.User).join(db_model.Service).join(db_model.Trainer)
+            .where(db_model.User.id == user_id, db_model.Reservation.id == reservation_id))
+
+
+def user_reservations(user_id, when='all', after=None):
+    """User reservations ordered by (date, time, id), wrong cursor raises ValueError.
+
+    when - 'upcoming', 'past' (newest first) or 'all', after - cursor of the last row of previous page.
+    """
+    reservation = db_model.Reservation
+    keyset = tuple_(reservation.date, reservation.time, reservation.id)
+    query = (select(*reservation_columns).join(db_model.User).join(db_model.Service).join(db_model.Trainer)
+             .where(reservation.user == user_id))
+    now = dt.datetime.now()
+    if when == 'upcoming':
+        query = query.where(tuple_(reservation.date, reservation.time) >= tuple_(now.date(), now.time()))
+    elif when == 'past':
+        query = query.where(tuple_(reservation.date, reservation.time) < tuple_(now.date(), now.time()))
+    if after:
+        after_key = tuple_(*decode_reservation_cursor(after))
+        query = query.where(keyset < after_key if when == 'past' else keyset > after_key)
+    if when == 'past':
+        return query.order_by(reservation.date.desc(), reservation.time.desc(), reservation.id.desc())
+    return query.order_by(reservation.date, reservation.time, reservation.id)
+
+
+def reservation_slot(user_id, reservation_id):
+    """Trainer and date of user reservation (free slots of trainer day are changed by its deletion)."""
+    return select(db_model.Reservation.trainer, db_model.Reservation.date).where(
+        db_model.Reservation.id == reservation_id, db_model.Reservation.user == user_id)
+
+
+def delete_reservation(user_id, reservation_id):
+    """Delete user reservation."""
+    return delete(db_model.Reservation).where(db_model.Reservation.id == reservation_id,
+                                              db_model.Reservation.user == user_id)
+
+
+def user_checkout(user_id):
+    """Services balance of user."""
+    return (select(db_model.User.id, db_model.User.name, db_model.Service.name.label('service.name'),
+                   db_model.ServicesBalance.amount)
+            .join(db_model.User).join(db_model.Service).where(db_model.User.id == user_id))
+
+
+def trainer_ratings(trainer_ids):
+    """Rating count, average and update time of trainers."""
+    return select(db_model.TrainerRating.trainer, db_model.TrainerRating.points_count, rating_avg,
+                  db_model.TrainerRating.updated).where(db_model.TrainerRating.trainer.in_(trainer_ids))
+
+
+def trainer_rating_list(fc_id, trainer_id):
+    """Ratings of trainer with user names."""
+    return (select(db_model.Rating.points.label('rating.points'),
+                   db_model.Trainer.name.label('trainer.name'),
+                   db_model.Rating.text.label('rating.text'),
+                   db_model.User.name.label('user.name'),
+                   db_model.User.id.label('user.id'))
+            .join(db_model.User, db_model.User.id == db_model.Rating.user, isouter=True)
+            .join(db_model.Trainer, db_model.Trainer.id == db_model.Rating.trainer, isouter=True)
+            .where(db_model.Trainer.fitness_center == fc_id, db_model.Trainer.id == trainer_id))
+
+
+def user_trainer_rating(fc_id, trainer_id, user_id):
+    """Points and text of user rating of trainer."""
+    return (select(db_model.Rating.points, db_model.Rating.text).join(db_model.Trainer)
+            .where(db_model.Trainer.fitness_center == fc_id, db_model.Rating.trainer == trainer_id,
+                   db_model.Rating.user == user_id))
+
+
+def trainer_rating_summary(fc_id, trainer_id):
+    """Rating aggregates of trainer."""
+    return (select(db_model.TrainerRating).join(db_model.Trainer)
+            .where(db_model.Trainer.fitness_center == fc_id, db_model.TrainerRating.trainer == trainer_id))
+
+
+def login_exists(login):
+    """Id of user with login."""
+    return select(db_model.User.id).where(db_model.User.login == login)
@@ -0,0 +1,67 @@
+"""Trainer ratings and their aggregates."""
+import datetime as dt
+
+from sqlalchemy import and_, case, func, select, update
+
+import db_model
+import db_orm
+
+HIST_BUCKETS = (0, 20, 40, 60, 80)  # lower bounds of 20 points buckets, last one includes 100
+AGGREGATE_COLUMNS = ('trainer', 'points_count', 'points_sum') + tuple(f'hist_{el}' for el in HIST_BUCKETS)
+
+
+def aggregate_query(trainer_id=None):
+    """Select with rating aggregates per trainer calculated from ratings, columns match AGGREGATE_COLUMNS."""
+    rating = db_model.Rating
+    columns = [rating.trainer, func.count(rating.id), func.sum(rating.points)]
+    for bucket in HIST_BUCKETS[:-1]:
+        columns.append(func.sum(case((rating.points.between(bucket, bucket + 19), 1), else_=0)))
+    columns.append(func.sum(case((rating.points >= HIST_BUCKETS[-1], 1), else_=0)))
+    query = select(*columns).group_by(rating.trainer)
+    if trainer_id is not None:
+        query = query.where(rating.trainer == trainer_id)
+    return query
+
+
+def hist_column(points):
+    """Histogram column name of points."""
+    return f'hist_{min(max(points, 0) // 20 * 20, HIST_BUCKETS[-1])}'
+
+
+def upsert_rating(session, trainer_id, user_id, points, text):
+    """Insert or update user rating of trainer and apply its change to trainer aggregates in one transaction."""
+    rating, aggregate = db_model.Rating, db_model.TrainerRating
+    # aggregate row is created if missing and locked with reading of previous points, so rating writes of trainer
+    # are serialized and previous points are current (sqlite takes database write lock with the insert)
+    session.execute(db_orm.dialect_insert(session, aggregate).values(trainer=trainer_id)
+                    .on_conflict_do_nothing(index_elements=['trainer']))
+    previous = session.execute(
+        select(rating.points).select_from(aggregate)
+        .outerjoin(rating, and_(rating.trainer == aggregate.trainer, rating.user == user_id))
+        .where(aggregate.trainer == trainer_id).with_for_update(of=aggregate)).scalar()
+    # insert or update rating in one statement, backed by unique (trainer, user) constraint
+    query = db_orm.dialect_insert(session, rating).values(trainer=trainer_id, user=user_id, points=points, text=text)
+    session.execute(query.on_conflict_do_update(index_elements=['trainer', 'user'],
+                                                set_={'points': query.excluded.points, 'text': query.excluded.text}))
+
+    delta = dict.fromkeys(AGGREGATE_COLUMNS[1:], 0)
+    if previous is None:
+        delta['points_count'] = 1
+    else:
+        delta[hist_column(previous)] -= 1
+    delta['points_sum'] = points - (previous or 0)
+    delta[hist_column(points)] += 1
+    # aggregates are changed by delta, other ratings of trainer are not read
+    if changes := {column: getattr(aggregate, column) + value for column, value in delta.items() if value}:
+        changes['updated'] = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+        session.execute(update(aggregate).where(aggregate.trainer == trainer_id).values(changes))
+    session.commit()
+
+
+def summary(row):
+    """Convert trainer_rating row into dict with count, average and histogram."""
+    if row is None:
+        return {'count': 0, 'sum': 0, 'avg': None, 'histogram': {str(el): 0 for el in HIST_BUCKETS}}
+    return {'count': row.points_count, 'sum': row.points_sum,
+            'avg': round(row.points_sum / row.points_count, 2) if row.points_count else None,
+            'histogram': {str(el): getattr(row, f'hist_{el}') for el in HIST_BUCKETS}}
@@ -0,0 +1,132 @@
+"""Lightweight records of query results for templates.
+
+Rows are not copied into dicts: record keeps query row and key -> position index shared by all rows of result,
+records are created lazily on access. Records support read only dict interface used by templates
+(record['trainer.name'], keys(), values(), items()).
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=256)
+def key_index(keys):
+    """Key -> position index for tuple of keys, shared by results with the same columns."""
+    return {key: idx for idx, key in enumerate(keys)}
+
+
+class Record:
+    """Read only mapping view of query row."""
+
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index, values):
+        """Init."""
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        """Value by key."""
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        """Value by key or default."""
+        idx = self._index.get(key)
+        return default if idx is None else self._values[idx]
+
+    def keys(self):
+        """Keys in columns order."""
+        return self._index.keys()
+
+    def values(self):
+        """Values in columns order."""
+        return self._values
+
+    def items(self):
+        """(key, value) pairs in columns order."""
+        return zip(self._index, self._values)
+
+    def __iter__(self):
+        """Iterate over keys."""
+        return iter(self._index)
+
+    def __len__(self):
+        """Number of columns."""
+        return len(self._index)
+
+    def __contains__(self, key):
+        """Check key."""
+        return key in self._index
+
+    def __eq__(self, other):
+        """Compare with record or dict."""
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, Record) else other)
+
+    def __repr__(self):
+        """Repr."""
+        return f'Record({dict(self.items())})'
+
+    def _asdict(self):
+        """Record as dict."""
+        return dict(self.items())
+
+
+class Records:
+    """Lazy sequence of records over list of query rows."""
+
+    __slots__ = ('_rows', '_index')
+
+    def __init__(self, rows, keys=None):
+        """Init, keys are taken from the first row if not set."""
+        self._rows = rows
+        if keys is None:
+            keys = rows[0]._fields if rows else ()
+        self._index = key_index(tuple(keys))
+
+    def __getitem__(self, idx):
+        """Record by position, slice gives records of rows slice."""
+        if isinstance(idx, slice):
+            return Records(self._rows[idx], keys=tuple(self._index))
+        return Record(self._index, self._rows[idx])
+
+    def __iter__(self):
+        """Iterate over records."""
+        index = self._index
+        for row in self._rows:
+            yield Record(index, row)
+
+    def __len__(self):
+        """Number of rows."""
+        return len(self._rows)
+
+    def __bool__(self):
+        """Check that result is not empty."""
+        return bool(self._rows)
+
+
+def iter_records(rows, keys):
+    """Lazy records over any iterable of rows (e.g. streamed query result)."""
+    index = key_index(tuple(keys))
+    for row in rows:
+        yield Record(index, row)
+
+
+def query_keys(query):
+    """Keys of ORM query or select rows."""
+    return [el['name'] for el in query.column_descriptions]
+
+
+def stream(query, batch_size=100, session=None):
+    """Lazy records of ORM query (or select executed in session) rows fetched by batches (server side cursor)."""
+    if session is None:
+        rows = query.yield_per(batch_size)
+    else:
+        rows = session.execute(query, execution_options={'yield_per': batch_size})
+    return iter_records(rows, query_keys(query))
+
+
+def convert(query_data):
+    """Convert query row/rows into record or records, None gives empty dict."""
+    if query_data is None:
+        return {}
+    elif type(query_data) is list:
+        return Records(query_data)
+    return Record(key_index(query_data._fields), query_data)
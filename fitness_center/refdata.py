@@ -0,0 +1,99 @@
+"""Reference data (fitness centers, services, trainers) kept in memory.
+
+Data changes a few times a month, so whole snapshot is loaded at once and replaced on refresh.
+Snapshot is reloaded after REFDATA_TTL seconds, invalidate()/refresh() can be called after data changes.
+Snapshot loaded before fork (gunicorn preload) is shared with workers until data is changed, then every worker
+keeps its own copy until workers are forked again (kill -HUP reloads snapshot in master).
+"""
+import datetime as dt
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+import db_model
+
+REFDATA_TTL = int(os.environ.get('REFDATA_TTL', 3600))  # seconds
+
+FitnessCenter = namedtuple('FitnessCenter', 'id address name contacts')
+Service = namedtuple('Service', 'id name description duration price fitness_center max_attendees')
+Trainer = namedtuple('Trainer', 'id name fitness_center age sex')
+
+
+class ReferenceData:
+    """Immutable snapshot of reference data indexed by id and by fitness center."""
+
+    def __init__(self, fitness_centers, services, trainers, capacities):
+        """Init."""
+        self.fitness_centers = {el.id: el for el in sorted(fitness_centers)}
+        self.services = {el.id: el for el in sorted(services)}
+        self.trainers = {el.id: el for el in sorted(trainers)}
+        self.services_by_fc = self._group([(el.fitness_center, el.id) for el in services])
+        self.trainers_by_fc = self._group([(el.fitness_center, el.id) for el in trainers])
+        # trainers offering service and services of trainer from trainer capacities
+        self.service_trainers = self._group(capacities)
+        self.trainer_services = self._group([(trainer_id, service_id) for service_id, trainer_id in capacities])
+        self.etag = make_etag(sorted(fitness_centers), sorted(services), sorted(trainers), sorted(capacities))
+        self.modified = dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+        self.loaded = time.monotonic()
+
+    @staticmethod
+    def _group(pairs):
+        """Group (key, value) pairs -> {key: sorted values}."""
+        result = {}
+        for key, value in sorted(pairs):
+            result.setdefault(key, []).append(value)
+        return {key: tuple(val) for key, val in result.items()}
+
+
+def make_etag(*parts):
+    """Version of data parts for ETag header."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def load(session, previous=None):
+    """Load reference data snapshot, modification time is kept if data was not changed."""
+    fitness_centers = [FitnessCenter(*row)
+                       for row in session.query(*[getattr(db_model.FitnessCenter, el) for el in FitnessCenter._fields])]
+    services = [Service(*row) for row in session.query(*[getattr(db_model.Service, el) for el in Service._fields])]
+    trainers = [Trainer(*row) for row in session.query(*[getattr(db_model.Trainer, el) for el in Trainer._fields])]
+    capacities = [tuple(row) for row in session.query(db_model.TrainerCapacity.service,
+                                                      db_model.TrainerCapacity.trainer)]
+    snapshot = ReferenceData(fitness_centers, services, trainers, capacities)
+    if previous is not None and previous.etag == snapshot.etag:
+        snapshot.modified = previous.modified
+    return snapshot
+
+
+def refresh(session):
+    """Reload snapshot from db, snapshot is replaced only if data was changed."""
+    global _snapshot
+    previous = _snapshot
+    snapshot = load(session, previous=previous)
+    if previous is not None and previous.etag == snapshot.etag:
+        # unchanged snapshot preloaded by master stays shared with forked workers, new copy is dropped
+        previous.loaded = snapshot.loaded
+        return previous
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def invalidate():
+    """Drop snapshot, it will be loaded on next get."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def get(session):
+    """Get actual snapshot, (re)load it if needed."""
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded > REFDATA_TTL:
+        snapshot = refresh(session)
+    return snapshot
@@ -0,0 +1,102 @@
+"""Reminder emails for upcoming reservations, scan is run periodically by celery beat.
+
+Not reminded reservations starting within REMINDER_LEAD are taken in batches by ix_reservation_reminder index
+(reminded, date, time), so already reminded and past rows are never scanned. Every batch is marked as reminded and
+its emails are queued as one bulk email task in the same transaction (published after commit), so a reservation
+is reminded at most once even if scans overlap.
+
+Delivery is at most once too: committed batch is marked as reminded while its task is only buffered in dispatcher
+memory. Scan task waits until buffered tasks are published or spooled to disk (REMINDER_FLUSH_TIMEOUT), reminders
+of worker killed before that are lost and not sent by the next scan.
+"""
+import datetime as dt
+import logging
+import os
+
+from sqlalchemy import false, select, true, tuple_, update
+
+import db_model
+import db_orm
+import dispatch
+import mail
+import utils
+
+REMINDER_LEAD = int(os.environ.get('REMINDER_LEAD', 24 * 60))  # minutes before reservation start
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', mail.MAIL_BATCH_SIZE))  # reservations per task
+REMINDER_FLUSH_TIMEOUT = float(os.environ.get('REMINDER_FLUSH_TIMEOUT', 60))  # seconds to wait for publishing
+REMINDER_SUBJECT = 'Reminder: upcoming training'
+
+logger = logging.getLogger(__name__)
+
+
+def due_query(now, lead=REMINDER_LEAD, limit=REMINDER_BATCH_SIZE):
+    """Ids of not reminded reservations starting within lead minutes from now, earliest first."""
+    reservation = db_model.Reservation
+    end = now + dt.timedelta(minutes=lead)
+    start_key = tuple_(reservation.date, reservation.time)
+    return (select(reservation.id)
+            .where(reservation.reminded == false(), start_key >= tuple_(now.date(), now.time()),
+                   start_key <= tuple_(end.date(), end.time()))
+            .order_by(reservation.date, reservation.time).limit(limit))
+
+
+def reminder_text(row):
+    """Reminder email text."""
+    return (f'\nDear {row.user_name}, your training "{row.service_name}" with {row.trainer_name} starts '
+            f'on {row.date.isoformat()} at {row.time.strftime("%H:%M")}.')
+
+
+def remind_batch(session, now, lead=REMINDER_LEAD, batch_size=REMINDER_BATCH_SIZE):
+    """Mark next batch of due reservations as reminded and queue its emails.
+
+    Returns number of reservations reminded by this scan (taken by concurrent scan are not counted),
+    None if there are no due reservations.
+    """
+    reservation = db_model.Reservation
+    ids = session.execute(due_query(now, lead, batch_size)).scalars().all()
+    if not ids:
+        return None
+    # reservations taken by concurrent scan are skipped, "is not" keeps primary key lookup (reminder index with
+    # reminded = false prefix matches all not reminded rows)
+    claim = (update(reservation).where(reservation.id.in_(ids), reservation.reminded.is_not(True))
+             .values(reminded=true()).returning(reservation.id))
+    claimed = session.execute(claim, execution_options={'synchronize_session': False}).scalars().all()
+    rows = session.execute(
+        select(reservation.date, reservation.time, db_model.User.email, db_model.User.name.label('user_name'),
+               db_model.Service.name.label('service_name'), db_model.Trainer.name.label('trainer_name'))
+        .join(db_model.User, db_model.User.id == reservation.user)
+        .join(db_model.Service, db_model.Service.id == reservation.service)
+        .join(db_model.Trainer, db_model.Trainer.id == reservation.trainer)
+        .where(reservation.id.in_(claimed))).all()
+    emails = [(row.email, REMINDER_SUBJECT, reminder_text(row)) for row in rows if row.email]
+    if emails:
+        dispatch.delay_on_commit(session, utils.send_bulk_email, emails)
+    session.commit()
+    return len(claimed)
+
+
+def remind_due(session, now, lead=REMINDER_LEAD, batch_size=REMINDER_BATCH_SIZE):
+    """Remind all due reservations batch by batch -> number of reminded reservations."""
+    total = 0
+    try:
+        while (count := remind_batch(session, now, lead, batch_size)) is not None:
+            total += count
+    except Exception:
+        session.rollback()
+        raise
+    return total
+
+
+# scan is idempotent (reminded reservations are skipped), so it is acknowledged when done and scan of killed worker
+# is delivered again
+@utils.app.task(name='reminders.send_reminders', ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def send_reminders(now=None):
+    """Send reminders for reservations starting within REMINDER_LEAD (now - iso datetime, current by default)."""
+    now = dt.datetime.fromisoformat(now) if now else dt.datetime.now().replace(microsecond=0)
+    try:
+        return remind_due(db_orm.session, now)
+    finally:
+        db_orm.remove_session()
+        # task is acknowledged when emails are published or spooled
+        if not dispatch.dispatcher.flush(REMINDER_FLUSH_TIMEOUT):
+            logger.warning(f'Reminder emails are not published in {REMINDER_FLUSH_TIMEOUT} s')
@@ -0,0 +1,198 @@
+"""Celery task metrics: queue wait, run time, retries, failures and queue backlog in Prometheus text format.
+
+Usage: python task_metrics.py (metrics on http://0.0.0.0:TASK_METRICS_PORT/metrics)
+Metrics are collected from task events of all workers (worker_send_task_events) and publishers
+(task_send_sent_event), queue lengths are polled from the broker.
+"""
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from kombu.exceptions import OperationalError
+
+import metrics
+import utils
+
+TASK_METRICS_PORT = int(os.environ.get('TASK_METRICS_PORT', 9808))
+QUEUE_POLL_INTERVAL = float(os.environ.get('QUEUE_POLL_INTERVAL', 15))  # seconds
+MAX_TRACKED_TASKS = 100000  # published but not finished tasks kept for wait and name lookup
+
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)  # seconds
+RUNTIME_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)  # seconds
+
+TASKS = metrics.CounterMetric('fc_celery_tasks_total', 'Finished tasks by name and state.', ('task', 'state'))
+QUEUE_WAIT = metrics.Histogram('fc_celery_task_queue_wait_seconds',
+                               'Time from publishing (eta of delayed task) to start of task.', ('task',), WAIT_BUCKETS)
+RUNTIME = metrics.Histogram('fc_celery_task_runtime_seconds', 'Task run time.', ('task',), RUNTIME_BUCKETS)
+RETRIES = metrics.CounterMetric('fc_celery_task_retries_total', 'Task retries.', ('task',))
+TASK_METRICS = (TASKS, QUEUE_WAIT, RUNTIME, RETRIES)
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEvents:
+    """Task metrics from celery events."""
+
+    def __init__(self, max_tracked=MAX_TRACKED_TASKS):
+        """Init."""
+        self.max_tracked = max_tracked
+        self.queue_lengths = {}
+        self.in_progress = 0
+        # task id -> [name, timestamp task can be started from, started]
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ready_time(event):
+        """Timestamp task can be started from: eta of delayed task (retry countdown) or event time."""
+        if eta := event.get('eta'):
+            try:
+                return max(dt.datetime.fromisoformat(eta).timestamp(), event['timestamp'])
+            except (TypeError, ValueError):
+                pass
+        return event['timestamp']
+
+    def _track(self, event, replace, start=False):
+        """Remember task name and publish (or receive) timestamp, mark started task -> [name, timestamp, started]."""
+        with self._lock:
+            entry = self._tasks.get(event['uuid'])
+            if entry is None:
+                entry = self._tasks[event['uuid']] = [event.get('name', 'unknown'), self.ready_time(event), False]
+                while len(self._tasks) > self.max_tracked:
+                    self.in_progress -= self._tasks.popitem(last=False)[1][2]
+            elif replace:
+                # retry is published again with the same task id
+                entry[1] = self.ready_time(event)
+            if start and not entry[2]:
+                entry[2] = True
+                self.in_progress += 1
+            return entry
+
+    def _finish(self, event):
+        """Forget task -> name."""
+        with self._lock:
+            entry = self._tasks.pop(event['uuid'], None)
+            if entry is None:
+                return 'unknown'
+            self.in_progress -= entry[2]
+        return entry[0]
+
+    def on_sent(self, event):
+        """Task is published."""
+        self._track(event, replace=True)
+
+    def on_received(self, event):
+        """Task is received by worker (publish time is unknown if publisher does not send events)."""
+        self._track(event, replace=False)
+
+    def on_started(self, event):
+        """Task is started."""
+        name, ready, _ = self._track(event, replace=False, start=True)
+        QUEUE_WAIT.observe((name,), max(event['timestamp'] - ready, 0.0))
+
+    def on_succeeded(self, event):
+        """Task is done."""
+        name = self._finish(event)
+        TASKS.inc((name, 'succeeded'))
+        RUNTIME.observe((name,), event.get('runtime', 0.0))
+
+    def on_failed(self, event):
+        """Task failed."""
+        TASKS.inc((self._finish(event), 'failed'))
+
+    def on_retried(self, event):
+        """Task will be retried, it waits in queue again."""
+        with self._lock:
+            if entry := self._tasks.get(event['uuid']):
+                self.in_progress -= entry[2]
+                entry[2] = False
+        RETRIES.inc((entry[0] if entry else 'unknown',))
+
+    def on_rejected(self, event):
+        """Task is rejected or revoked."""
+        TASKS.inc((self._finish(event), 'rejected'))
+
+    def handlers(self):
+        """Event handlers for celery events receiver."""
+        return {'task-sent': self.on_sent, 'task-received': self.on_received, 'task-started': self.on_started,
+                'task-succeeded': self.on_succeeded, 'task-failed': self.on_failed,
+                'task-retried': self.on_retried, 'task-rejected': self.on_rejected,
+                'task-revoked': self.on_rejected}
+
+    def expose(self):
+        """Metrics in Prometheus text format."""
+        lines = []
+        for metric in TASK_METRICS:
+            lines.extend(metric.expose())
+        lines.append('# TYPE fc_celery_queue_length gauge')
+        lines.extend(f'fc_celery_queue_length{{queue="{name}"}} {length}'
+                     for name, length in sorted(self.queue_lengths.items()))
+        with self._lock:
+            lines.extend(['# TYPE fc_celery_tasks_in_progress gauge', f'fc_celery_tasks_in_progress {self.in_progress}',
+                          '# TYPE fc_celery_tasks_tracked gauge', f'fc_celery_tasks_tracked {len(self._tasks)}'])
+        return '\n'.join(lines) + '\n'
+
+
+def poll_queues(state, interval=QUEUE_POLL_INTERVAL):
+    """Update queue lengths (messages waiting in broker) periodically."""
+    while True:
+        try:
+            with utils.app.connection_for_read() as conn:
+                for queue in utils.app.conf.task_queues:
+                    state.queue_lengths[queue.name] = conn.default_channel.queue_declare(
+                        queue=queue.name, passive=True).message_count
+        except Exception as exc:
+            # broker is unreachable or queue is not declared yet
+            logger.warning(f'Queue length poll failed: {exc}')
+        time.sleep(interval)
+
+
+def serve(state, port=TASK_METRICS_PORT):
+    """Serve /metrics in background thread -> server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        """Metrics request handler."""
+
+        def do_GET(self):
+            """Metrics in Prometheus text format."""
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = state.expose().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """No access log."""
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Collect task events and serve metrics."""
+    logging.basicConfig(level=logging.INFO)
+    state = TaskEvents()
+    serve(state)
+    threading.Thread(target=poll_queues, args=(state,), daemon=True).start()
+    logger.info(f'Task metrics on port {TASK_METRICS_PORT}')
+    while True:
+        try:
+            with utils.app.connection() as conn:
+                receiver = utils.app.events.Receiver(conn, handlers=state.handlers())
+                receiver.capture(limit=None, timeout=None, wakeup=True)
+        except (OperationalError, OSError) as exc:
+            logger.warning(f'Events connection failed: {exc}')
+            time.sleep(5)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,89 @@
 """Different application utils."""
 import os
-import smtplib
-import ssl
 
 from celery import Celery
-from email.message import EmailMessage
+from kombu import Queue
+
+import mail
 
 BROKER_TEMPLATE = 'pyamqp://{0}:{1}@{2}'
 BROKER = BROKER_TEMPLATE.format(os.environ.get('RABBITMQ_DEFAULT_USER', 'guest'),
                                 os.environ.get('RABBITMQ_DEFAULT_PASS', 'guest'),
                                 os.environ.get('RABBITMQ_HOST', 'localhost'))
-app = Celery('tasks', broker=BROKER)
-
-GMAIL_SMTP_PORT = 587
-GMAIL_SMTP = 'smtp.gmail.com'
-
-
-@app.task
-def send_email(receiver_email, subject, text):
-    """Sent email via gmail smtp."""
-    sender_email = os.environ.get('smtp_sender')
-    smtp_password = os.environ.get('smtp_password')
-
-    # create email message with related fields
-    emsg = EmailMessage()
-    emsg.set_content(text)
-    emsg['Subject'] = subject
-    emsg['From'] = sender_email
-    emsg['To'] = receiver_email
-
-    # communicate with server and send meaage
-    with smtplib.SMTP(GMAIL_SMTP, GMAIL_SMTP_PORT) as smtp_client:
-        smtp_client.ehlo()
-        smtp_client.starttls(context=ssl.SSLContext(ssl.PROTOCOL_TLS))
-        smtp_client.ehlo()
-        smtp_client.login(sender_email, smtp_password)
-        smtp_client.send_message(emsg)
+# reminders module is imported by worker, it depends on this module
+app = Celery('tasks', broker=BROKER, include=['reminders'])
+# tasks are executed in the caller process, no broker and worker needed (tests, local runs)
+app.conf.task_always_eager = os.environ.get('CELERY_ALWAYS_EAGER') == '1'
+app.conf.task_eager_propagates = app.conf.task_always_eager
+
+# transactional mail (registration) and bulk work (mailouts, reminder scans) are consumed by separate workers
+app.conf.task_queues = (Queue('mail'), Queue('bulk'))
+app.conf.task_default_queue = 'mail'
+app.conf.task_routes = {'utils.send_bulk_email': {'queue': 'bulk'}, 'reminders.send_reminders': {'queue': 'bulk'}}
+# messages are acknowledged before execution, so emails are not sent again when task is redelivered,
+# only idempotent tasks are acknowledged after they are done (acks_late option of task)
+# no result backend, results are not stored
+app.conf.task_ignore_result = True
+app.conf.result_expires = 3600
+app.conf.task_soft_time_limit = int(os.environ.get('CELERY_TASK_SOFT_TIME_LIMIT', 540))  # seconds
+app.conf.task_time_limit = int(os.environ.get('CELERY_TASK_TIME_LIMIT', 600))  # seconds
+app.conf.task_compression = os.environ.get('CELERY_COMPRESSION') or None
+# events for task metrics monitor (task_metrics.py)
+app.conf.worker_send_task_events = True
+app.conf.task_send_sent_event = True
+
+# worker tuning profiles, a worker is started per profile: CELERY_WORKER_PROFILE=bulk celery -A utils worker -Q bulk
+WORKER_PROFILES = {
+    # short IO bound tasks: threads share smtp session pool, prefetch saves broker round trips
+    # (time limits are enforced only by prefork pool, smtp calls are limited by SMTP_TIMEOUT)
+    'mail': {'worker_pool': 'threads', 'worker_concurrency': 16, 'worker_prefetch_multiplier': 4},
+    # long tasks: processes with time limits, no prefetch so long tasks are spread over free workers
+    'bulk': {'worker_pool': 'prefork', 'worker_concurrency': 2, 'worker_prefetch_multiplier': 1,
+             'worker_max_tasks_per_child': 1000},
+}
+WORKER_PROFILE = os.environ.get('CELERY_WORKER_PROFILE', 'mail')
+if WORKER_PROFILE not in WORKER_PROFILES:
+    raise ValueError(f'Unknown CELERY_WORKER_PROFILE {WORKER_PROFILE!r}, expected one of: {", ".join(WORKER_PROFILES)}')
+app.conf.update(WORKER_PROFILES[WORKER_PROFILE])
+for setting, env_name in (('worker_pool', 'CELERY_POOL'), ('worker_concurrency', 'CELERY_CONCURRENCY'),
+                          ('worker_prefetch_multiplier', 'CELERY_PREFETCH_MULTIPLIER')):
+    if value := os.environ.get(env_name):
+        app.conf[setting] = value if setting == 'worker_pool' else int(value)
+
+# periodic tasks of celery beat
+REMINDER_INTERVAL = float(os.environ.get('REMINDER_INTERVAL', 300))  # seconds between upcoming reservations scans
+app.conf.beat_schedule = {
+    'send-reminders': {'task': 'reminders.send_reminders', 'schedule': REMINDER_INTERVAL,
+                       # late scan is dropped, the next one covers the same reservations
+                       'options': {'expires': REMINDER_INTERVAL}},
+}
+
+
+@app.task(bind=True, max_retries=3, default_retry_delay=60, soft_time_limit=30, time_limit=60)
+def send_email(self, receiver_email, subject, text):
+    """Send email over pooled smtp session, temporary failures are retried."""
+    if failed := mail.pool.send_messages([mail.make_message(receiver_email, subject, text)]):
+        exc = failed[0][1]
+        if mail.is_temporary(exc):
+            raise self.retry(exc=exc)
+        raise exc
+
+
+@app.task(bind=True, max_retries=3, default_retry_delay=60, compression='gzip')
+def send_bulk_email(self, emails, concurrency=mail.MAIL_CONCURRENCY):
+    """Send [(receiver, subject, text), ...] over pooled smtp sessions, temporary failures are retried."""
+    messages = [mail.make_message(*el) for el in emails]
+    failed = mail.pool.send_bulk(messages, concurrency)
+    by_message = {id(message): email for message, email in zip(messages, emails)}
+    retry = [by_message[id(message)] for message, exc in failed if mail.is_temporary(exc)]
+    if retry:
+        raise self.retry(args=(retry,), kwargs={'concurrency': concurrency})
+    return {'sent': len(emails) - len(failed), 'rejected': len(failed)}
+
+
+def bulk_email(emails, batch_size=mail.MAIL_BATCH_SIZE):
+    """Queue emails [(receiver, subject, text), ...] as bulk tasks of batch size -> number of tasks."""
+    emails = [tuple(el) for el in emails]
+    for idx in range(0, len(emails), batch_size):
+        send_bulk_email.delay(emails[idx:idx + batch_size])
+    return (len(emails) + batch_size - 1) // batch_size
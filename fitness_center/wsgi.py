@@ -0,0 +1,8 @@
+"""WSGI entry point for production server: gunicorn -c gunicorn.conf.py wsgi:app."""
+import db_orm
+import refdata
+from app import app  # noqa: F401
+
+# with preload workers start with reference data loaded in master process (reloaded by worker after REFDATA_TTL)
+refdata.refresh(db_orm.session)
+db_orm.remove_session()
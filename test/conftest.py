@@ -0,0 +1,115 @@
+"""Common pytest settings.
+
+test_app.py runs in-process with Flask test client on seeded SQLite database (one per xdist worker, so the suite
+can be run in parallel with pytest -n auto), celery tasks are executed eagerly.
+Set FC_BASE_URL (e.g. http://127.0.0.1:8080) to run it against live server instead.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+FC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fitness_center')
+# fitness center modules are imported directly (app is started from its own folder)
+sys.path.insert(0, FC_DIR)
+
+BASE_URL = os.environ.get('FC_BASE_URL', '')
+SEED_DB = os.path.join(FC_DIR, 'fc_db.sqlite')
+SEED_REVISION = 'bef0c0fd6f24'  # schema of fc_db.sqlite data, later migrations convert it
+SEED_TABLES = ('fitness_center', 'user', 'service', 'trainer', 'rating', 'reservation', 'services_balance',
+               'trainer_capacity', 'trainer_schedule')
+TEST_DB = os.path.join(tempfile.gettempdir(),
+                       f'fc_test_{os.environ.get("PYTEST_XDIST_WORKER", "main")}_{os.getpid()}.sqlite')
+
+if not BASE_URL:
+    # app modules read settings on import
+    os.environ['DB_STRING'] = f'sqlite:///{TEST_DB}'
+    os.environ['CELERY_ALWAYS_EAGER'] = '1'
+
+
+def make_test_db(path):
+    """Create SQLite database at alembic head with fc_db.sqlite data."""
+    from alembic import command
+    from alembic.config import Config
+
+    if os.path.exists(path):
+        os.remove(path)
+    # no ini file: alembic logging config would disable loggers of already imported modules
+    config = Config()
+    config.set_main_option('script_location', os.path.join(FC_DIR, 'alembic'))
+    command.upgrade(config, SEED_REVISION)
+    src, dst = sqlite3.connect(SEED_DB), sqlite3.connect(path)
+    try:
+        for table in SEED_TABLES:
+            cursor = src.execute(f'SELECT * FROM "{table}"')
+            columns = ', '.join(f'"{el[0]}"' for el in cursor.description)
+            params = ', '.join('?' * len(cursor.description))
+            dst.executemany(f'INSERT INTO "{table}" ({columns}) VALUES ({params})', cursor.fetchall())
+        dst.commit()
+    finally:
+        src.close()
+        dst.close()
+    command.upgrade(config, 'head')
+
+
+class AppResponse:
+    """Response of Flask test client with requests like interface."""
+
+    def __init__(self, response):
+        """Init."""
+        self.status_code = response.status_code
+        self.text = response.get_data(as_text=True)
+        self.headers = response.headers
+        self._response = response
+
+    def json(self):
+        """Response json."""
+        return self._response.get_json()
+
+
+class AppClient:
+    """Flask test client with requests.Session like interface, cookies are kept between requests."""
+
+    def __init__(self, client):
+        """Init."""
+        self.client = client
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, allow_redirects=True,
+                timeout=None):
+        """Send request to app."""
+        return AppResponse(self.client.open(url, method=method, query_string=params, data=data, json=json,
+                                            headers=headers, follow_redirects=allow_redirects))
+
+    def get(self, url, **kwargs):
+        """GET request."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """POST request."""
+        return self.request('POST', url, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    """Fitness center app on test database."""
+    make_test_db(TEST_DB)
+    import app
+    import db_orm
+
+    yield app.app
+    db_orm.engine.dispose()
+    os.remove(TEST_DB)
+
+
+@pytest.fixture()
+def client(request):
+    """HTTP client of live server (FC_BASE_URL) or of in-process app."""
+    if BASE_URL:
+        import requests
+
+        with requests.Session() as session:
+            yield session
+        return
+    yield AppClient(request.getfixturevalue('flask_app').test_client())
@@ -0,0 +1,100 @@
+"""Local SMTP stand-in for tests (bench/bench_smtp.py uses it too), accepted messages are kept in memory.
+
+Latency of real server can be emulated: connect_delay (TCP and TLS handshake, auth) and rtt (per command reply).
+"""
+import socketserver
+import threading
+import time
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """SMTP session: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line):
+        """Send reply line."""
+        time.sleep(self.server.rtt)
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def read_data(self):
+        """Read message until single dot line."""
+        lines = []
+        while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+    def handle(self):
+        """Serve session."""
+        server = self.server
+        time.sleep(server.connect_delay)
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost SMTP sink')
+        sender, recipients, messages = None, [], 0
+        while line := self.rfile.readline():
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(' <>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip(' <>')
+                if recipient in server.reject:
+                    self.reply('550 No such user')
+                    continue
+                recipients.append(recipient)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self.read_data()
+                with server.lock:
+                    server.messages.append((sender, recipients, data))
+                self.reply('250 OK')
+                messages += 1
+                if server.drop_after and messages >= server.drop_after:
+                    # server side session limit, connection is closed without reply
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Threaded SMTP server on free local port.
+
+    drop_after - close connection after so many messages, reject - recipients refused with 550.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, connect_delay=0.0, rtt=0.0, drop_after=None, reject=()):
+        """Init."""
+        super().__init__((host, port), SmtpHandler)
+        self.connect_delay = connect_delay
+        self.rtt = rtt
+        self.drop_after = drop_after
+        self.reject = set(reject)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        """Listening port."""
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        self.shutdown()
+        self.server_close()
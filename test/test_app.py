@@ -1,8 +1,10 @@
 """Flask app test scenarios."""
 import logging
+import os
+import time
+import uuid
 
 import pytest
-import requests
 
 _log = logging.getLogger('Main')
 log_formatter = logging.Formatter('%(asctime)s [%(levelname)s]  %(message)s')
@@ -11,7 +13,8 @@ console_handler.setFormatter(log_formatter)
 _log.addHandler(console_handler)
 _log.setLevel(logging.DEBUG)
 
-base_url = 'http://127.0.0.1:8080'
+# live server url, in-process app (test client) if empty
+base_url = os.environ.get('FC_BASE_URL', '')
 auth = {'username': 'user', 'password': 'user'}
 request_timeout = 5
 
@@ -23,10 +26,16 @@ class TestFitnessCenter:
     """Endpoints check."""
 
     @pytest.fixture()
-    def session(self):
+    def user(self, client):
+        """Registered test user fixture, registration is rejected if user exists already."""
+        client.post(f'{base_url}/register', data=USER_DATA, timeout=request_timeout)
+        return USER_DATA
+
+    @pytest.fixture()
+    def session(self, client, user):
         """Session fixture."""
         _log.info('Session login')
-        session = requests.Session()
+        session = client
         content = {'login': USER_DATA['login'], 'password': USER_DATA['password']}
         response = session.post(f'{base_url}/login', data=content)
         if response.status_code != 200:
@@ -37,42 +46,51 @@ class TestFitnessCenter:
             pytest.fail('Unsuccessful logout')
         _log.info('Session end')
 
-    def test_get_root(self):
+    def test_get_root(self, client):
         """Get entry point."""
         _log.info('Entry point GET check...')
-        response_data = requests.get(f'{base_url}/', timeout=request_timeout)
+        response_data = client.get(f'{base_url}/', timeout=request_timeout)
         assert response_data.status_code == 200, 'Error during context get'
         assert 'Fitness Centers' in response_data.text
 
-    def test_register_get(self):
+    def test_register_get(self, client):
         """Registration get check."""
         _log.info('Register GET check...')
-        response_data = requests.get(f'{base_url}/register', timeout=request_timeout)
+        response_data = client.get(f'{base_url}/register', timeout=request_timeout)
         assert response_data.status_code == 200, 'Error during context get'
         assert 'Register for Free' in response_data.text
 
-    def test_register_post(self):
+    def test_register_post(self, client):
         """Registration post check."""
         _log.info('Register POST check...')
-        response_data = requests.post(f'{base_url}/register', data=USER_DATA, timeout=request_timeout)
+        content = {**USER_DATA, 'login': f'pytest_{uuid.uuid4().hex[:8]}'}
+        response_data = client.post(f'{base_url}/register', data=content, timeout=request_timeout)
         assert response_data.status_code == 200, f'Content was not created {response_data.text}'
         assert 'Congratulations' in response_data.text
 
-    def test_login_get(self):
+    def test_login_get(self, client):
         """Login get check."""
         _log.info('Login GET check...')
-        rd = requests.get(f'{base_url}/login', timeout=request_timeout)
+        rd = client.get(f'{base_url}/login', timeout=request_timeout)
         assert rd.status_code == 200, 'Error during login get'
         assert 'Welcome to Fitness center!' in rd.text
 
-    def test_login_post(self):
+    def test_login_post(self, client, user):
         """Login post check."""
         _log.info('Login POST check...')
         content = {'login': USER_DATA['login'], 'password': USER_DATA['password']}
-        rd = requests.post(f'{base_url}/login', data=content, timeout=request_timeout)
+        rd = client.post(f'{base_url}/login', data=content, timeout=request_timeout)
         assert rd.status_code == 200, 'Content was not created'
         assert USER_DATA['name'] in rd.text, 'Username not fount on html page after login'
 
+    def test_login_post_unknown(self, client):
+        """Login post check with unknown login."""
+        _log.info('Login POST with unknown login check...')
+        content = {'login': f'unknown_{uuid.uuid4().hex}', 'password': 'password'}
+        rd = client.post(f'{base_url}/login', data=content, timeout=request_timeout)
+        assert rd.status_code == 200, 'Error during login with unknown login'
+        assert 'Login unsuccessful' in rd.text
+
     def test_logout(self, session):
         """Logout get check."""
         _log.info('Logout GET check...')
@@ -80,10 +98,10 @@ class TestFitnessCenter:
         assert rd.status_code == 200, 'Error during logout'
         assert 'Welcome to Fitness center!' in rd.text
 
-    def test_user_get_not_authenticated(self):
+    def test_user_get_not_authenticated(self, client):
         """User get check."""
         _log.info('User info GET check without auth...')
-        response_data = requests.get(f'{base_url}/user', timeout=request_timeout)
+        response_data = client.get(f'{base_url}/user', timeout=request_timeout)
         assert response_data.status_code == 200, 'User able access restricted context'
         assert 'Welcome to Fitness center!' in response_data.text
 
@@ -133,6 +151,14 @@ class TestFitnessCenter:
         assert response_data.status_code == 200, 'Error during context get'
         assert 'Reservations:' in response_data.text
 
+    def test_user_reservations_json_get(self, session):
+        """User reservations json page get check."""
+        _log.info('User reservations JSON GET check...')
+        response_data = session.get(f'{base_url}/user/reservations', params={'format': 'json', 'limit': 1})
+        assert response_data.status_code == 200, 'Error during context get'
+        assert len(response_data.json()['result']) <= 1
+        assert 'next' in response_data.json()
+
     def test_user_reservations_post(self, session):
         """User reservations post check."""
         _log.info('User reservations POST check...')
@@ -221,6 +247,29 @@ class TestFitnessCenter:
         assert response_data.status_code == 200, 'Content was not created'
         assert 'Congratulations' in response_data.text
 
+    def test_fitness_center_trainer_modified_by_rating(self, session):
+        """Trainer page is not reported as not modified by If-Modified-Since after rating change."""
+        _log.info('Fitness center trainer If-Modified-Since check after rating change...')
+        url = f'{base_url}/fitness_center/1/trainer/1'
+        last_modified = session.get(url).headers['Last-Modified']
+        # Last-Modified has seconds precision
+        time.sleep(1.1)
+        for points in ('1', '2'):
+            session.post(f'{url}/rating', data={'trainer': 1, 'user': 1, 'points': points, 'text': 'Changed'})
+        rd = session.get(url, headers={'If-Modified-Since': last_modified})
+        assert rd.status_code == 200, 'Stale page reported as not modified'
+        assert rd.headers['Last-Modified'] != last_modified
+
+    def test_fitness_center_trainer_rating_summary_get(self, client):
+        """Fitness center trainer rating summary get check."""
+        _log.info('Fitness center trainer rating summary GET check...')
+        fc_id = 1
+        t_id = 1
+        rd = client.get(f'{base_url}/fitness_center/{fc_id}/trainer/{t_id}/rating/summary', timeout=request_timeout)
+        assert rd.status_code == 200, 'Error during context get'
+        assert rd.json()['count'] >= 1
+        assert sum(rd.json()['histogram'].values()) == rd.json()['count']
+
     def test_fitness_center_services_get(self, session):
         """Fitness center services get check."""
         _log.info('Fitness center services GET check...')
@@ -238,6 +287,18 @@ class TestFitnessCenter:
         assert response_data.status_code == 200, 'Error during context get'
         assert 'Service:' in response_data.text
 
+    def test_fitness_center_service_availability_get(self, client):
+        """Fitness center service availability get check."""
+        _log.info('Fitness center service availability GET check...')
+        center_id = 1
+        service_id = 4
+        params = {'date_from': '2024-06-10', 'date_to': '2024-06-16'}
+        rd = client.get(f'{base_url}/fitness_center/{center_id}/services/{service_id}/availability', params=params,
+                        timeout=request_timeout)
+        assert rd.status_code == 200, 'Error during context get'
+        assert rd.json()['date_to'] == '2024-06-16'
+        assert 'trainers' in rd.json()
+
     def test_fitness_center_loyalty_programs_get(self, session):
         """Loyalty get check."""
         _log.info('Fitness center loyalty programs GET check...')
@@ -245,3 +306,62 @@ class TestFitnessCenter:
         response_data = session.get(f'{base_url}/fitness_center/{center_id}/loyalty_programs')
         assert response_data.status_code == 200, 'Error during context get'
         assert response_data.text == f'fitness_center "{center_id}" loyalty endpoint'
+
+    def test_db_pool_get(self, client):
+        """Db pool stats are not available without auth."""
+        _log.info('Db pool GET check without auth...')
+        rd = client.get(f'{base_url}/db/pool', timeout=request_timeout)
+        assert rd.status_code == 200, 'Error during context get'
+        assert 'Welcome to Fitness center!' in rd.text
+
+    def test_db_pool_get_authenticated(self, session):
+        """Db pool stats get check."""
+        _log.info('Db pool GET check...')
+        rd = session.get(f'{base_url}/db/pool')
+        assert rd.status_code == 200, 'Error during context get'
+        assert 'pool' in rd.json()
+
+    def count_reservations(self, session, date, start_time):
+        """Number of user reservations at date and start time."""
+        rd = session.get(f'{base_url}/user/reservations', params={'format': 'json', 'limit': 100})
+        assert rd.status_code == 200, 'Error during context get'
+        return sum(el['date'] == date and el['time'] == start_time for el in rd.json()['result'])
+
+    def test_user_reservations_post_full_slot(self, session):
+        """Slot is booked until it is full, next reservation is rejected."""
+        _log.info('User reservations POST of full slot check...')
+        # trainer 1 takes 5 attendees of swimming pool (service 3)
+        content = {'date': '2024-06-10', 'service': 3, 'trainer': 1, 'start_time': '10-00'}
+        for _ in range(5):
+            rd = session.post(f'{base_url}/user/reservations', data=content)
+            assert rd.status_code == 200, f'Content was not created\n {rd.text}'
+            assert 'Congratulations' in rd.text
+        reserved = self.count_reservations(session, content['date'], content['start_time'])
+        assert reserved == 5
+        rd = session.post(f'{base_url}/user/reservations', data=content)
+        assert rd.status_code == 409, 'Reservation of full slot was created'
+        assert 'Selected time is not available' in rd.text
+        assert self.count_reservations(session, content['date'], content['start_time']) == reserved
+
+    def test_user_reservations_post_day_off(self, session):
+        """Reservation on date without trainer schedule is rejected."""
+        _log.info('User reservations POST of day off check...')
+        content = {'date': '2024-06-11', 'service': 3, 'trainer': 1, 'start_time': '10-00'}
+        rd = session.post(f'{base_url}/user/reservations', data=content)
+        assert rd.status_code == 409, 'Reservation on day off was created'
+        assert 'Trainer does not work on selected date' in rd.text
+        assert self.count_reservations(session, content['date'], content['start_time']) == 0
+
+    def test_cache_stats_get(self, client):
+        """Cache stats are not available without auth."""
+        _log.info('Cache stats GET check without auth...')
+        rd = client.get(f'{base_url}/cache/stats', timeout=request_timeout)
+        assert rd.status_code == 200, 'Error during context get'
+        assert 'Welcome to Fitness center!' in rd.text
+
+    def test_cache_stats_get_authenticated(self, session):
+        """Cache stats get check."""
+        _log.info('Cache stats GET check...')
+        rd = session.get(f'{base_url}/cache/stats')
+        assert rd.status_code == 200, 'Error during context get'
+        assert {'availability', 'pages'} <= rd.json().keys()
@@ -0,0 +1,90 @@
+"""Async (Quart) app test scenarios, in-process test client on the same test database as test_app.py."""
+import asyncio
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(bool(os.environ.get('FC_BASE_URL')), reason='in-process app only')
+
+USER_DATA = {'name': 'Test async', 'funds': 100, 'login': 'pytest_async_usr', 'password': 'pytest_async_pwd',
+             'birth_date': '2005-01-01', 'phone': '123', 'email': ''}
+
+
+class TestFitnessCenterAsync:
+    """Endpoints check of app_async, sync booking and rating code runs through run_sync."""
+
+    @pytest.fixture()
+    def run(self, flask_app):
+        """Run scenario coroutine with test client of async app, database is created by flask_app fixture."""
+        import app_async
+        import db_async
+
+        async def main(scenario):
+            try:
+                async with app_async.app.test_app() as test_app:
+                    client = test_app.test_client()
+                    await client.post('/register', form=USER_DATA)
+                    await scenario(client)
+            finally:
+                # pooled aiosqlite connections belong to the event loop of the test
+                await db_async.engine.dispose()
+
+        return lambda scenario: asyncio.run(main(scenario))
+
+    @staticmethod
+    async def login(client, password=USER_DATA['password']):
+        """Login of test user, redirect location is returned."""
+        response = await client.post('/login', form={'login': USER_DATA['login'], 'password': password})
+        assert response.status_code == 302
+        return response.headers['Location']
+
+    def test_login(self, run):
+        """Login post check."""
+
+        async def scenario(client):
+            assert await self.login(client, password='wrong') == '/login'
+            assert await self.login(client) == '/user'
+            response = await client.get('/user')
+            assert response.status_code == 200, 'Error during context get'
+            assert USER_DATA['name'] in await response.get_data(as_text=True)
+
+        run(scenario)
+
+    def test_user_reservations(self, run):
+        """Reservation post until slot is full, reservations list check."""
+
+        async def scenario(client):
+            await self.login(client)
+            # trainer 1 takes one attendee of massage (service 4)
+            content = {'date': '2024-06-10', 'service': '4', 'trainer': '1', 'start_time': '09-00'}
+            response = await client.post('/user/reservations', form=content)
+            assert response.status_code == 200, 'Content was not created'
+            assert 'Congratulations' in await response.get_data(as_text=True)
+            response = await client.post('/user/reservations', form=content)
+            assert response.status_code == 409, 'Reservation of full slot was created'
+            assert 'Selected time is not available' in await response.get_data(as_text=True)
+            response = await client.get('/user/reservations', query_string={'format': 'json'})
+            assert response.status_code == 200, 'Error during context get'
+            result = (await response.get_json())['result']
+            assert [(el['date'], el['time'], el['service']) for el in result] == [('2024-06-10', '09-00', 'Massage')]
+
+        run(scenario)
+
+    def test_fitness_center_trainer_rating_post(self, run):
+        """Rating post check, rating of the same user is updated."""
+
+        async def scenario(client):
+            await self.login(client)
+            url = '/fitness_center/1/trainer/1/rating'
+            count = (await (await client.get(f'{url}/summary')).get_json())['count']
+            for points in ('40', '80'):
+                response = await client.post(url, form={'points': points, 'text': 'Async'})
+                assert response.status_code == 200, 'Content was not created'
+                assert 'Congratulations' in await response.get_data(as_text=True)
+            summary = await (await client.get(f'{url}/summary')).get_json()
+            assert summary['count'] == count + 1
+            response = await client.get(url)
+            assert response.status_code == 200, 'Error during context get'
+            assert 'Async' in await response.get_data(as_text=True)
+
+        run(scenario)
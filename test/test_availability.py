@@ -0,0 +1,65 @@
+"""Availability engine checks."""
+import datetime as dt
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import availability
+import db_model
+import db_orm
+
+
+class TestAvailability:
+    """Free slots calculation."""
+
+    def test_time_conversion(self):
+        """Time string to minutes and back."""
+        assert availability.to_minutes('17-30') == 1050
+        assert availability.to_minutes('09:15') == 555
+        assert availability.from_minutes(1050) == '17-30'
+
+    def test_empty_day(self):
+        """Whole schedule is free, service must fit before end time."""
+        slots = availability.free_slots((9 * 60, 11 * 60), [], {}, service_id=1, duration=60)
+        assert [availability.from_minutes(el) for el in slots] == ['09-00', '09-15', '09-30', '09-45', '10-00']
+
+    def test_other_service_blocks_slots(self):
+        """Slots used by other service are not available."""
+        reservations = [(9 * 60 + 30, 2, 30)]
+        slots = availability.free_slots((9 * 60, 11 * 60), reservations, {1: 5, 2: 1}, service_id=1, duration=30)
+        assert [availability.from_minutes(el) for el in slots] == ['09-00', '10-00', '10-15', '10-30']
+
+    def test_capacity(self):
+        """Same service slots are available until capacity is reached."""
+        reservations = [(9 * 60, 1, 30)] * 2
+        slots = availability.free_slots((9 * 60, 10 * 60), reservations, {1: 3}, service_id=1, duration=30)
+        assert slots == [540, 555, 570]
+        slots = availability.free_slots((9 * 60, 10 * 60), reservations * 2, {1: 3}, service_id=1, duration=30)
+        assert slots == [570]
+
+    def test_bulk(self):
+        """Many trainers and days in one call."""
+        schedules = {(1, '2024-06-10'): (540, 600), (2, '2024-06-10'): (540, 570), (1, '2024-06-11'): (540, 555)}
+        reservations = {(1, '2024-06-10'): [(540, 2, 30)]}
+        result = availability.free_slots_bulk(schedules, reservations, {1: {1: 1}}, service_id=1, duration=30)
+        assert result == {(1, '2024-06-10'): [570], (2, '2024-06-10'): [540], (1, '2024-06-11'): []}
+
+    def test_inputs_query_first_schedule(self):
+        """The earliest schedule of trainer day is used whatever order schedules are stored in."""
+        engine = create_engine('sqlite://')
+        db_orm.Base.metadata.create_all(engine)
+        date = dt.date(2024, 6, 10)
+        with Session(engine) as session:
+            session.add_all([db_model.FitnessCenter(id=1, address='Street 1', name='FC', contacts='123'),
+                             db_model.Service(id=1, name='Yoga', duration=30, description='Yoga', price=10,
+                                              fitness_center=1, max_attendees=10),
+                             db_model.Trainer(id=1, name='Anna', fitness_center=1, age=30, sex='female'),
+                             db_model.TrainerCapacity(trainer=1, service=1, max_attendees=1),
+                             db_model.TrainerSchedule(trainer=1, date=date, start_time=dt.time(14),
+                                                      end_time=dt.time(15)),
+                             db_model.TrainerSchedule(trainer=1, date=date, start_time=dt.time(9),
+                                                      end_time=dt.time(10))])
+            session.commit()
+            rows = session.execute(availability.inputs_query(1, [date], trainer_id=1)).all()
+        _, schedules, _, _ = availability.collect_inputs(rows, 1)
+        assert schedules == {(1, date): (9 * 60, 10 * 60)}
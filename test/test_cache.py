@@ -0,0 +1,61 @@
+"""Cache checks."""
+import cache
+
+
+class TestCache:
+    """Memory and disk cache backends."""
+
+    def test_memory_lru(self):
+        """Least recently used value is evicted."""
+        mem_cache = cache.MemoryCache(max_size=2, ttl=60)
+        mem_cache.set('a', 1)
+        mem_cache.set('b', 2)
+        assert mem_cache.get('a') == 1
+        mem_cache.set('c', 3)
+        assert mem_cache.get('b') is None
+        assert mem_cache.stats()['evictions'] == 1
+        assert (mem_cache.hits, mem_cache.misses) == (1, 1)
+
+    def test_memory_ttl(self):
+        """Expired value is not returned."""
+        mem_cache = cache.MemoryCache(ttl=60)
+        mem_cache.set('a', 1, ttl=-1)
+        assert mem_cache.get('a', 'default') == 'default'
+        assert len(mem_cache) == 0
+
+    def test_disk(self, tmp_path):
+        """Disk cache values are shared between instances."""
+        disk_cache = cache.DiskCache('test', max_size=2, cache_dir=str(tmp_path))
+        disk_cache.set((1, '2024-06-10'), {4: ['09-00']}, ttl=10)
+        assert cache.DiskCache('test', cache_dir=str(tmp_path)).get((1, '2024-06-10')) == {4: ['09-00']}
+        disk_cache.set('b', 2, ttl=20)
+        disk_cache.set('c', 3, ttl=30)
+        assert len(disk_cache) == 2
+        assert disk_cache.get((1, '2024-06-10')) is None
+        disk_cache.delete('b')
+        assert disk_cache.peek('b') is None
+        assert disk_cache.get('c') == 3
+        disk_cache.set('d', 4, ttl=-1)
+        assert disk_cache.get('d') is None
+
+    def test_generation(self, tmp_path):
+        """Value computed before invalidation of its key is not stored."""
+        for backend in (cache.MemoryCache(), cache.DiskCache('generation', cache_dir=str(tmp_path))):
+            generation, all_generation = backend.generation((1, '2024-06-10')), backend.generation()
+            other_generation = backend.generation((2, '2024-06-10'))
+            backend.delete((1, '2024-06-10'))
+            assert not backend.set((1, '2024-06-10'), 'stale', generation=generation)
+            assert not backend.set((2, '2024-06-10'), 'stale', generation=all_generation)
+            assert backend.peek((1, '2024-06-10')) is None and backend.peek((2, '2024-06-10')) is None
+            assert backend.set((2, '2024-06-10'), 'fresh', generation=other_generation)
+            assert backend.set((1, '2024-06-10'), 'fresh', generation=backend.generation((1, '2024-06-10')))
+            assert backend.get((1, '2024-06-10')) == 'fresh'
+
+    def test_pages(self):
+        """Page is rendered once and served bytes are counted."""
+        pages = cache.PageCache(cache.MemoryCache())
+        rendered = []
+        for _ in range(3):
+            assert pages.get_or_render(('/fitness_center', ''), lambda: rendered.append(1) or 'page') == 'page'
+        assert len(rendered) == 1
+        assert pages.stats()['bytes_served'] == 8
@@ -0,0 +1,12 @@
+"""Async db settings checks."""
+import db_async
+
+
+class TestDbAsync:
+    """Async engine settings."""
+
+    def test_async_db_string(self):
+        """Sync driver is replaced by async one of the same database."""
+        db_string = db_async.async_db_string('postgresql+psycopg2://user:pwd@db:5432')
+        assert db_string == 'postgresql+asyncpg://user:pwd@db:5432'
+        assert db_async.async_db_string('sqlite:///fc_db.sqlite') == 'sqlite+aiosqlite:///fc_db.sqlite'
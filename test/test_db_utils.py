@@ -0,0 +1,25 @@
+"""Sqlite db operations checks."""
+import db_utils
+
+
+class TestSqliteDb:
+    """Operations with bound parameters over persistent connection."""
+
+    def test_operations(self, tmp_path):
+        """Values with quotes are stored as is, rows are converted to dicts of selected columns."""
+        path = str(tmp_path / 'db.sqlite')
+        db_utils.get_connection(path).execute('create table note (id integer primary key, text text, points integer)')
+        text = 'it\'s "quoted"'
+        db_utils.exec_db_query(db_path=path, insert_data={'note': {'text': text, 'points': 1}})
+        db_utils.exec_db_query(db_path=path, insert_data={'note': {'text': 'other', 'points': 2}})
+        assert db_utils.exec_db_query(db_path=path, select_data={'note': ('id', 'text')},
+                                      where_data={'text': text}) == {'id': 1, 'text': text}
+        db_utils.exec_db_query(db_path=path, update_data={'note': {'points': 5}}, where_data={'id': 2})
+        assert db_utils.exec_db_query(db_path=path, select_data={'note': ('points',)}, single=False) == [
+            {'points': 1}, {'points': 5}]
+        db_utils.exec_db_query(db_path=path, delete_data='note', where_data={'text': text})
+        assert db_utils.exec_db_query(db_path=path, select_data={'note': ('id', 'points')}, single=False) == [
+            {'id': 2, 'points': 5}]
+        assert db_utils.exec_db_query(db_path=path, select_data={'missing': ('id',)}) == {}
+        assert db_utils.get_connection(path).execute('pragma journal_mode').fetchone()[0] == 'wal'
+        db_utils.close_connections()
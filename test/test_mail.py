@@ -0,0 +1,48 @@
+"""Pooled SMTP delivery checks."""
+import pytest
+
+import mail
+import utils
+from smtp_sink import SmtpSink
+
+
+@pytest.fixture()
+def sink():
+    """Local SMTP server."""
+    server = SmtpSink(drop_after=3, reject=('bad@example.com',)).start()
+    yield server
+    server.stop()
+
+
+def make_pool(server, **kwargs):
+    """Pool of local server sessions."""
+    return mail.SmtpPool(host='127.0.0.1', port=server.port, user=None, starttls=False, **kwargs)
+
+
+class TestMail:
+    """SMTP session pool and bulk task."""
+
+    def test_session_reused_and_reopened(self, sink):
+        """Messages share session, session closed by server is reopened and the message is resent."""
+        pool = make_pool(sink)
+        messages = [mail.make_message(f'user{idx}@example.com', 'Subject', 'Text', 'fc@example.com')
+                    for idx in range(7)]
+        assert pool.send_messages(messages) == []
+        assert len(sink.messages) == 7
+        # server closes session after every 3 messages
+        assert pool.connects == 3
+        assert pool.reconnects == 2
+        pool.close()
+
+    def test_bulk_task(self, sink, monkeypatch):
+        """Bulk task sends over pooled sessions, rejected recipient is not retried."""
+        sink.drop_after = None
+        pool = make_pool(sink, size=2)
+        monkeypatch.setattr(mail, 'pool', pool)
+        emails = [(f'user{idx}@example.com', 'Subject', 'Text') for idx in range(20)] + [
+            ('bad@example.com', 'Subject', 'Text')]
+        result = utils.send_bulk_email.apply(args=(emails,), kwargs={'concurrency': 4}).get()
+        assert result == {'sent': 20, 'rejected': 1}
+        assert len(sink.messages) == 20
+        assert sink.connections == 2
+        pool.close()
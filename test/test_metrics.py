@@ -0,0 +1,40 @@
+"""Metrics checks."""
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+import metrics
+
+
+class TestMetrics:
+    """Request and SQL metrics."""
+
+    def test_request_sql_and_n_plus_one(self):
+        """Statements are counted per request, repeated statement is flagged as N+1."""
+        app = Flask(__name__)
+        engine = create_engine('sqlite://')
+        metrics.init_app(app, engine)
+
+        @app.get('/loop')
+        def loop():
+            with engine.connect() as conn:
+                for idx in range(metrics.N_PLUS_ONE_THRESHOLD):
+                    conn.execute(text('select :idx'), {'idx': idx})
+            return 'ok'
+
+        response = app.test_client().get('/loop')
+        assert f'{metrics.N_PLUS_ONE_THRESHOLD} queries' in response.headers['Server-Timing']
+        text_metrics = app.test_client().get('/metrics').get_data(as_text=True)
+        assert 'fc_sql_n_plus_one_total{endpoint="loop"} 1' in text_metrics
+        assert 'fc_http_requests_total{endpoint="loop",method="GET",status="200"} 1' in text_metrics
+        assert f'fc_request_sql_statements_sum{{endpoint="loop"}} {float(metrics.N_PLUS_ONE_THRESHOLD)}' in text_metrics
+
+    def test_histogram(self):
+        """Buckets are cumulative."""
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('endpoint',), (0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(('x',), value)
+        lines = histogram.expose()
+        assert 'test_seconds_bucket{endpoint="x",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{endpoint="x",le="1"} 2' in lines
+        assert 'test_seconds_bucket{endpoint="x",le="+Inf"} 3' in lines
+        assert 'test_seconds_count{endpoint="x"} 3' in lines
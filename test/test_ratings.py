@@ -0,0 +1,75 @@
+"""Trainer rating aggregates checks."""
+import random
+import threading
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+import db_model
+import db_orm
+import ratings
+
+TRAINERS = 2
+USERS = 12
+
+
+def aggregates(session):
+    """Stored and recalculated from ratings aggregates per trainer."""
+    stored = session.execute(select(*[getattr(db_model.TrainerRating, el) for el in ratings.AGGREGATE_COLUMNS])
+                             .order_by(db_model.TrainerRating.trainer)).all()
+    calculated = session.execute(ratings.aggregate_query().order_by(db_model.Rating.trainer)).all()
+    return [tuple(el) for el in stored], [tuple(el) for el in calculated]
+
+
+class TestRatings:
+    """Aggregates are changed by rating deltas."""
+
+    def test_concurrent_ratings(self, tmp_path):
+        """Concurrent new and changed ratings of the same trainers keep count, sum and histogram exact."""
+        engine = create_engine(f'sqlite:///{tmp_path / "ratings.sqlite"}', connect_args={'timeout': 30})
+        db_orm.Base.metadata.create_all(engine)
+        errors = []
+
+        def rate(user_id):
+            rnd = random.Random(user_id)
+            try:
+                with Session(engine) as session:
+                    for _ in range(10):
+                        ratings.upsert_rating(session, trainer_id=rnd.randint(1, TRAINERS), user_id=user_id,
+                                              points=rnd.randint(0, 100), text='text')
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=rate, args=(user_id,)) for user_id in range(1, USERS + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        with Session(engine) as session:
+            stored, calculated = aggregates(session)
+            assert stored == calculated
+            assert sum(el[1] for el in stored) == session.query(db_model.Rating).count()
+            ratings.upsert_rating(session, trainer_id=1, user_id=1, points=100, text='same')
+            ratings.upsert_rating(session, trainer_id=1, user_id=1, points=100, text='again')
+            assert aggregates(session)[0] == aggregates(session)[1]
+        engine.dispose()
+
+    def test_same_rating_twice(self, tmp_path):
+        """Repeated rating of trainer by user updates its single row, aggregates count it once."""
+        engine = create_engine(f'sqlite:///{tmp_path / "ratings.sqlite"}')
+        db_orm.Base.metadata.create_all(engine)
+        statements = []
+        event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        with Session(engine) as session:
+            ratings.upsert_rating(session, trainer_id=1, user_id=1, points=50, text='good')
+            statements.clear()
+            ratings.upsert_rating(session, trainer_id=1, user_id=1, points=90, text='better')
+            # aggregate row, lock with previous points, rating upsert, aggregate delta
+            assert len(statements) == 4
+            assert any('ON CONFLICT (trainer, user) DO UPDATE' in el for el in statements)
+            rows = session.execute(select(db_model.Rating.points, db_model.Rating.text)).all()
+            assert [tuple(el) for el in rows] == [(90, 'better')]
+            stored, calculated = aggregates(session)
+            assert stored == calculated == [(1, 1, 90, 0, 0, 0, 0, 1)]
+        engine.dispose()
@@ -0,0 +1,29 @@
+"""Records checks."""
+from sqlalchemy import create_engine, text
+
+import records
+
+
+class TestRecords:
+    """Query rows as records."""
+
+    @staticmethod
+    def rows():
+        """Rows with dotted labels."""
+        with create_engine('sqlite://').connect() as conn:
+            return conn.execute(text('select 1 as id, \'Bob\' as "trainer.name" union all select 2, \'Ann\'')).all()
+
+    def test_dict_interface(self):
+        """Records have the same keys, values and items as dicts of previous conversion."""
+        data = self.rows()
+        result = records.convert(data)
+        assert len(result) == 2 and result
+        assert list(result[0].keys()) == ['id', 'trainer.name']
+        assert [dict(el.items()) for el in result] == [el._asdict() for el in data]
+        assert result[1]['trainer.name'] == 'Ann' and list(result[1].values()) == [2, 'Ann']
+        assert records.convert(data[0]) == {'id': 1, 'trainer.name': 'Bob'}
+
+    def test_empty(self):
+        """Empty results are falsy."""
+        assert not records.convert([])
+        assert records.convert(None) == {}
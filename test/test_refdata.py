@@ -0,0 +1,39 @@
+"""Reference data checks."""
+import refdata
+
+
+class TestReferenceData:
+    """Reference data snapshot."""
+
+    fitness_centers = [refdata.FitnessCenter(2, 'Street 2', 'FC2', '2'),
+                       refdata.FitnessCenter(1, 'Street 1', 'FC1', '1')]
+    services = [refdata.Service(3, 'Yoga', '', 60, 100, 1, 5), refdata.Service(4, 'Box', '', 30, 200, 2, 1)]
+    trainers = [refdata.Trainer(7, 'Ann', 1, 30, 'F'), refdata.Trainer(5, 'Bob', 1, 40, 'M')]
+    capacities = [(3, 7), (3, 5)]
+
+    def test_indexes(self):
+        """Items are indexed by id and by fitness center."""
+        ref = refdata.ReferenceData(self.fitness_centers, self.services, self.trainers, self.capacities)
+        assert list(ref.fitness_centers) == [1, 2]
+        assert ref.trainers_by_fc == {1: (5, 7)}
+        assert ref.services_by_fc == {1: (3,), 2: (4,)}
+        assert ref.service_trainers == {3: (5, 7)}
+        assert ref.trainer_services == {5: (3,), 7: (3,)}
+
+    def test_etag(self):
+        """ETag depends on data only."""
+        ref = refdata.ReferenceData(self.fitness_centers, self.services, self.trainers, self.capacities)
+        same = refdata.ReferenceData(self.fitness_centers[::-1], self.services, self.trainers, self.capacities[::-1])
+        changed = refdata.ReferenceData(self.fitness_centers, self.services[:1], self.trainers, self.capacities)
+        assert ref.etag == same.etag != changed.etag
+
+    def test_refresh_keeps_unchanged(self, monkeypatch):
+        """Unchanged snapshot is kept (stays shared with forked workers), changed one is replaced."""
+        data = [self.fitness_centers, self.services, self.trainers, self.capacities]
+        monkeypatch.setattr(refdata, 'load', lambda session, previous=None: refdata.ReferenceData(*data))
+        monkeypatch.setattr(refdata, '_snapshot', None)
+        first = refdata.refresh(None)
+        assert refdata.refresh(None) is first
+        data[1] = self.services[:1]
+        assert refdata.refresh(None) is not first
+        assert refdata.get(None) is not first
@@ -0,0 +1,73 @@
+"""Upcoming reservation reminders checks."""
+import datetime as dt
+
+from sqlalchemy import create_engine, select, true
+from sqlalchemy.orm import Session
+
+import db_model
+import db_orm
+import dispatch
+import reminders
+
+NOW = dt.datetime(2024, 6, 10, 8, 0)
+
+
+def make_db():
+    """Session of in-memory db with one trainer and service."""
+    engine = create_engine('sqlite://')
+    db_orm.Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add_all([db_model.FitnessCenter(id=1, address='Street 1', name='FC', contacts='123'),
+                     db_model.Service(id=1, name='Yoga', duration=60, description='Yoga', price=10, fitness_center=1,
+                                      max_attendees=10),
+                     db_model.Trainer(id=1, name='Anna', fitness_center=1, age=30, sex='female'),
+                     db_model.User(id=1, name='Bob', login='bob', password='bob', birth_date='2000-01-01',
+                                   phone='1', email='bob@example.com', funds=0),
+                     db_model.User(id=2, name='Ann', login='ann', password='ann', birth_date='2000-01-01',
+                                   phone='2', email='', funds=0)])
+    session.commit()
+    return session
+
+
+def reserve(session, user, date, time):
+    """Add reservation."""
+    session.add(db_model.Reservation(trainer=1, user=user, service=1, date=date, time=time))
+    session.commit()
+
+
+class TestReminders:
+    """Reminders are sent once for reservations within lead time."""
+
+    def test_remind_due(self, monkeypatch):
+        """Due reservations are reminded in batches, reminded and not due ones are skipped."""
+        submitted = []
+        monkeypatch.setattr(dispatch.dispatcher, 'submit',
+                            lambda name, args=(), kwargs=None: submitted.append((name, args)))
+        session = make_db()
+        today, tomorrow = NOW.date(), NOW.date() + dt.timedelta(days=1)
+        for user, date, time in ((1, today, dt.time(7)), (1, today, dt.time(9)), (2, today, dt.time(10)),
+                                 (1, today, dt.time(18)), (1, tomorrow, dt.time(7, 30)), (1, tomorrow, dt.time(9))):
+            reserve(session, user, date, time)
+        assert reminders.remind_due(session, NOW, lead=24 * 60, batch_size=2) == 4
+        # user 2 has no email, one bulk task per batch
+        assert [len(args[0]) for _, args in submitted] == [1, 2]
+        assert submitted[0][0] == 'utils.send_bulk_email'
+        assert 'starts on 2024-06-10 at 09:00' in submitted[0][1][0][0][2]
+        assert reminders.remind_due(session, NOW, lead=24 * 60, batch_size=2) == 0
+        reserve(session, 1, today, dt.time(12))
+        assert reminders.remind_due(session, NOW, lead=24 * 60, batch_size=2) == 1
+        assert len(submitted) == 3
+        session.close()
+
+    def test_remind_batch_claimed(self, monkeypatch):
+        """Reservations taken by concurrent scan are not counted, no due reservations end the scan."""
+        monkeypatch.setattr(dispatch.dispatcher, 'submit', lambda name, args=(), kwargs=None: None)
+        session = make_db()
+        reserve(session, 1, NOW.date(), dt.time(9))
+        assert reminders.remind_batch(session, NOW) == 1
+        assert reminders.remind_batch(session, NOW) is None
+        # due ids of concurrent scan which are reminded already
+        monkeypatch.setattr(reminders, 'due_query', lambda *args: select(db_model.Reservation.id).where(
+            db_model.Reservation.reminded == true()))
+        assert reminders.remind_batch(session, NOW) == 0
+        session.close()
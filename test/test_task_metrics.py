@@ -0,0 +1,50 @@
+"""Celery task metrics checks."""
+import datetime as dt
+
+import task_metrics
+
+
+def event(kind, uuid, timestamp, **fields):
+    """Celery task event."""
+    return dict(type=kind, uuid=uuid, timestamp=timestamp, **fields)
+
+
+class TestTaskEvents:
+    """Task events are turned into queue wait, run time, retry and failure metrics."""
+
+    def test_events(self):
+        """Queue wait is measured from publishing (receiving if publish is not seen, eta of retry).
+
+        Tasks are counted by state.
+        """
+        state = task_metrics.TaskEvents(max_tracked=10)
+        handlers = state.handlers()
+        name = 'test.metrics_task'
+        handlers['task-sent'](event('task-sent', 'a', 100.0, name=name))
+        handlers['task-received'](event('task-received', 'a', 101.0, name=name))
+        handlers['task-started'](event('task-started', 'a', 102.0))
+        handlers['task-retried'](event('task-retried', 'a', 103.0))
+        # retry countdown is not queue wait
+        eta = dt.datetime.fromtimestamp(160.0, dt.timezone.utc).isoformat()
+        handlers['task-sent'](event('task-sent', 'a', 103.1, name=name, eta=eta))
+        handlers['task-started'](event('task-started', 'a', 160.2))
+        handlers['task-succeeded'](event('task-succeeded', 'a', 161.0, runtime=0.9))
+        handlers['task-received'](event('task-received', 'b', 200.0, name=name))
+        handlers['task-started'](event('task-started', 'b', 200.5))
+        handlers['task-failed'](event('task-failed', 'b', 201.0))
+        handlers['task-received'](event('task-received', 'c', 300.0, name=name))
+        handlers['task-received'](event('task-received', 'd', 300.0, name=name))
+        handlers['task-started'](event('task-started', 'd', 301.0))
+        state.queue_lengths.update(mail=3, bulk=0)
+        lines = state.expose().splitlines()
+        label = f'task="{name}"'
+        assert f'fc_celery_tasks_total{{{label},state="succeeded"}} 1' in lines
+        assert f'fc_celery_tasks_total{{{label},state="failed"}} 1' in lines
+        assert f'fc_celery_task_retries_total{{{label}}} 1' in lines
+        assert f'fc_celery_task_queue_wait_seconds_bucket{{{label},le="0.5"}} 2' in lines
+        assert f'fc_celery_task_queue_wait_seconds_bucket{{{label},le="5"}} 4' in lines
+        assert f'fc_celery_task_queue_wait_seconds_count{{{label}}} 4' in lines
+        assert f'fc_celery_task_runtime_seconds_sum{{{label}}} 0.9' in lines
+        assert 'fc_celery_queue_length{queue="mail"} 3' in lines
+        assert 'fc_celery_tasks_in_progress 1' in lines
+        assert 'fc_celery_tasks_tracked 2' in lines